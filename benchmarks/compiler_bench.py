@@ -0,0 +1,231 @@
+"""Compiler benchmark for synthetic Potion programs.
+
+Times each compiler phase separately and records peak memory:
+
+    python -m benchmarks.compiler_bench --preset medium --output results.json
+    python -m benchmarks.compiler_bench --preset medium --compare results.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from cli import potionc
+from cli.artifact_cache import CACHE_DIR_ENV
+from cli.module_loader import build_external_function_map, load_module_graph
+from codegen.potion_codegen import ErlangCodegen
+from lexer.potion_lexer import tokenize
+from parser.potion_parser import Parser
+
+from benchmarks.synthetic import PRESETS, ProgramShape, write_program
+
+PHASES = ("tokenize", "parse", "load_module_graph", "codegen", "potionc")
+
+
+class CompilerBenchmark:
+    def __init__(self, entry_path, outdir):
+        self.entry_path = entry_path
+        self.outdir = outdir
+        directory = os.path.dirname(entry_path)
+        self.sources = []
+        for file_name in sorted(os.listdir(directory)):
+            if file_name.endswith(".potion"):
+                with open(os.path.join(directory, file_name), "r", encoding="utf-8") as f:
+                    self.sources.append(f.read())
+        self.tokens = [tokenize(source) for source in self.sources]
+        _, self.loaded_modules = load_module_graph(entry_path)
+
+    def phase(self, name):
+        return getattr(self, f"run_{name}")
+
+    def run_tokenize(self):
+        for source in self.sources:
+            tokenize(source)
+
+    def run_parse(self):
+        for tokens in self.tokens:
+            Parser(tokens).parse()
+
+    def run_load_module_graph(self):
+        load_module_graph(self.entry_path)
+
+    def run_codegen(self):
+        # Codegen mutates nothing on the AST, so the loaded graph is reused.
+        modules_by_source_name = {module.source_name: module for module in self.loaded_modules}
+        for loaded_module in self.loaded_modules:
+            ErlangCodegen(
+                loaded_module.ast,
+                module_name=loaded_module.module_name,
+                external_functions=build_external_function_map(loaded_module, modules_by_source_name),
+            ).generate()
+
+    def run_potionc(self):
+        # Every repetition is a full build: no reuse from the previous one and
+        # no shared artifact cache.
+        argv = ["potionc", self.entry_path, "--no-beam", "--no-incremental", "--outdir", self.outdir]
+        saved_argv = sys.argv
+        saved_cache_dir = os.environ.pop(CACHE_DIR_ENV, None)
+        sys.argv = argv
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                potionc.main()
+        except SystemExit as exc:
+            raise RuntimeError(f"potionc failed with exit code {exc.code}") from exc
+        finally:
+            sys.argv = saved_argv
+            if saved_cache_dir is not None:
+                os.environ[CACHE_DIR_ENV] = saved_cache_dir
+
+    def size(self):
+        return {
+            "modules": len(self.sources),
+            "lines": sum(source.count("\n") + 1 for source in self.sources),
+            "tokens": sum(len(tokens) for tokens in self.tokens),
+        }
+
+
+def measure(run, repeat, warmup):
+    for _ in range(warmup):
+        run()
+
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        samples.append(time.perf_counter() - started)
+
+    # Memory is traced in a separate run so tracemalloc overhead never
+    # leaks into the timings.
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "min_s": min(samples),
+        "median_s": statistics.median(samples),
+        "mean_s": statistics.fmean(samples),
+        "stdev_s": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "peak_kib": round(peak / 1024, 1),
+        "samples": len(samples),
+    }
+
+
+def run_benchmark(shape, phases=PHASES, repeat=5, warmup=1):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        entry_path = write_program(os.path.join(tmpdir, "src"), shape)
+        bench = CompilerBenchmark(entry_path, os.path.join(tmpdir, "out"))
+        results = {name: measure(bench.phase(name), repeat, warmup) for name in phases}
+        return {
+            "shape": shape.as_dict(),
+            "size": bench.size(),
+            "python": platform.python_version(),
+            "phases": results,
+        }
+
+
+def compare_results(current, baseline, threshold_percent):
+    """Return per-phase comparison rows; a row regresses when the median
+    time or peak memory grew by more than `threshold_percent`."""
+    rows = []
+    for name, phase in current["phases"].items():
+        base = baseline.get("phases", {}).get(name)
+        if base is None:
+            continue
+        row = {"phase": name}
+        for metric in ("median_s", "peak_kib"):
+            before = base[metric]
+            after = phase[metric]
+            change = ((after - before) / before * 100) if before else 0.0
+            row[metric] = {"baseline": before, "current": after, "change_percent": round(change, 1)}
+        row["regression"] = any(row[metric]["change_percent"] > threshold_percent for metric in ("median_s", "peak_kib"))
+        rows.append(row)
+    return rows
+
+
+def print_results(result):
+    size = result["size"]
+    print(f"📊 {size['modules']} modules, {size['lines']} lines, {size['tokens']} tokens")
+    print(f"{'phase':<20}{'median ms':>12}{'min ms':>12}{'peak KiB':>12}")
+    for name, phase in result["phases"].items():
+        print(f"{name:<20}{phase['median_s'] * 1000:>12.2f}{phase['min_s'] * 1000:>12.2f}{phase['peak_kib']:>12.1f}")
+
+
+def print_comparison(rows, threshold_percent):
+    print(f"\n🔍 Comparison against baseline (threshold {threshold_percent}%)")
+    print(f"{'phase':<20}{'time Δ%':>10}{'memory Δ%':>12}  status")
+    for row in rows:
+        status = "❌ regression" if row["regression"] else "✅ ok"
+        print(
+            f"{row['phase']:<20}{row['median_s']['change_percent']:>10.1f}"
+            f"{row['peak_kib']['change_percent']:>12.1f}  {status}"
+        )
+
+
+def build_shape(args):
+    shape = PRESETS[args.preset] if args.preset else ProgramShape()
+    overrides = {
+        "modules": args.modules,
+        "functions_per_module": args.functions,
+        "nesting_depth": args.depth,
+        "fanout": args.fanout,
+        "match_density": args.match_density,
+        "receive_density": args.receive_density,
+        "seed": args.seed,
+    }
+    values = shape.as_dict()
+    values.update({key: value for key, value in overrides.items() if value is not None})
+    return ProgramShape(**values)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Potion compiler on synthetic programs")
+    parser.add_argument("--preset", choices=sorted(PRESETS), help="Base program shape")
+    parser.add_argument("--modules", type=int, help="Number of modules")
+    parser.add_argument("--functions", type=int, help="Functions per module")
+    parser.add_argument("--depth", type=int, help="Nesting depth of if blocks")
+    parser.add_argument("--fanout", type=int, help="Call-graph fan-out (local calls and imported modules)")
+    parser.add_argument("--match-density", type=float, help="Fraction of functions with a match expression")
+    parser.add_argument("--receive-density", type=float, help="Fraction of functions with a receive block")
+    parser.add_argument("--seed", type=int, help="Generator seed")
+    parser.add_argument("--phase", action="append", choices=PHASES, help="Only run these phases")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per phase [default: 5]")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed runs per phase [default: 1]")
+    parser.add_argument("--output", help="Write results as JSON")
+    parser.add_argument("--compare", help="Baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Regression threshold in percent [default: 10]")
+    args = parser.parse_args(argv)
+
+    shape = build_shape(args)
+    result = run_benchmark(shape, phases=args.phase or PHASES, repeat=args.repeat, warmup=args.warmup)
+    print_results(result)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"\n✅ Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("shape") != result["shape"]:
+            print("⚠️ Baseline was recorded with a different program shape")
+        rows = compare_results(result, baseline, args.threshold)
+        print_comparison(rows, args.threshold)
+        if any(row["regression"] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
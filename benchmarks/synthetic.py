@@ -0,0 +1,156 @@
+import os
+import random
+from dataclasses import asdict, dataclass
+
+
+@dataclass
+class ProgramShape:
+    modules: int = 4
+    functions_per_module: int = 10
+    nesting_depth: int = 2
+    fanout: int = 2
+    match_density: float = 0.3
+    receive_density: float = 0.2
+    seed: int = 1
+
+    def as_dict(self):
+        return asdict(self)
+
+
+PRESETS = {
+    "small": ProgramShape(modules=2, functions_per_module=5, nesting_depth=1, fanout=1),
+    "medium": ProgramShape(modules=8, functions_per_module=20, nesting_depth=3, fanout=2),
+    "large": ProgramShape(
+        modules=32,
+        functions_per_module=40,
+        nesting_depth=4,
+        fanout=3,
+        match_density=0.4,
+        receive_density=0.3,
+    ),
+}
+
+ENTRY_MODULE = "synth_main"
+
+
+def module_name(index):
+    return f"synth_mod_{index}"
+
+
+def function_name(module_index, function_index):
+    return f"m{module_index}_f{function_index}"
+
+
+def generate_program(shape):
+    """Return {file name: source} for a synthetic multi-module Potion program.
+
+    Module `i` imports the next `fanout` modules and each function calls up to
+    `fanout` earlier local functions plus `fanout` functions from imported
+    modules. Calls to local functions are emitted as statements so the
+    semantic pass never has to evaluate a whole call tree.
+    """
+    rng = random.Random(shape.seed)
+    files = {}
+    for module_index in range(shape.modules):
+        files[f"{module_name(module_index)}.potion"] = generate_module(shape, module_index, rng)
+    files[f"{ENTRY_MODULE}.potion"] = generate_entry(shape)
+    return files
+
+
+def imported_modules(shape, module_index):
+    last = min(shape.modules, module_index + 1 + shape.fanout)
+    return list(range(module_index + 1, last))
+
+
+def generate_module(shape, module_index, rng):
+    lines = [f"import {module_name(index)}" for index in imported_modules(shape, module_index)]
+    lines.append("")
+    for function_index in range(shape.functions_per_module):
+        lines.extend(generate_function(shape, module_index, function_index, rng))
+        lines.append("")
+    return "\n".join(lines)
+
+
+def generate_function(shape, module_index, function_index, rng):
+    body = [
+        "val base = value * 2 + 1",
+        "var total: int = base",
+    ]
+
+    local_candidates = list(range(function_index))
+    for callee in rng.sample(local_candidates, min(shape.fanout, len(local_candidates))):
+        body.append(f"{function_name(module_index, callee)}(value + {callee}, label)")
+
+    for call_index, imported in enumerate(imported_modules(shape, module_index)):
+        callee = rng.randrange(shape.functions_per_module)
+        body.append(f"val remote_{call_index} = {function_name(imported, callee)}(value, label)")
+
+    body.extend(nested_if(shape.nesting_depth, 1))
+
+    if rng.random() < shape.match_density:
+        body.extend([
+            "val outcome = match {:ok, total} {",
+            "    {:ok, amount} => amount",
+            "    {:error, reason} => 0",
+            "    _ => 0",
+            "}",
+            "print(outcome)",
+        ])
+
+    if rng.random() < shape.receive_density:
+        body.extend([
+            "receive {",
+            "    on ping(payload, caller) {",
+            "        send(caller, {pong: payload})",
+            "    }",
+            "",
+            "    on any {",
+            '        print("unexpected " + label)',
+            "    }",
+            "}",
+        ])
+
+    body.append("return total")
+    header = f"fn {function_name(module_index, function_index)}(value: int, label: str) {{"
+    return [header, *indent(body), "}"]
+
+
+def nested_if(depth, level):
+    if depth <= 0:
+        return []
+    inner = [f"total = total + {level}"]
+    inner.extend(nested_if(depth - 1, level + 1))
+    return [
+        f"if value > {level} {{",
+        *indent(inner),
+        "} else {",
+        f"    total = total - {level}",
+        "}",
+    ]
+
+
+def generate_entry(shape):
+    lines = []
+    if shape.modules:
+        lines.append(f"import {module_name(0)}")
+        lines.append("")
+    lines.append("fn main() {")
+    if shape.modules and shape.functions_per_module:
+        last = function_name(0, shape.functions_per_module - 1)
+        lines.append(f'    val result = {last}(1, "synthetic")')
+        lines.append("    print(result)")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def indent(lines, prefix="    "):
+    return [f"{prefix}{line}" if line else line for line in lines]
+
+
+def write_program(directory, shape):
+    """Write the synthetic program to `directory` and return the entry path."""
+    os.makedirs(directory, exist_ok=True)
+    for file_name, source in generate_program(shape).items():
+        with open(os.path.join(directory, file_name), "w", encoding="utf-8") as f:
+            f.write(source)
+    return os.path.join(directory, f"{ENTRY_MODULE}.potion")
@@ -0,0 +1,214 @@
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+
+CACHE_DIR_ENV = "POTION_CACHE_DIR"
+CACHE_SIZE_ENV = "POTION_CACHE_SIZE"
+DEFAULT_MAX_SIZE = 1024 ** 3
+COMPILER_SOURCE_DIRS = ("cli", "codegen", "lexer", "parser", "semantic")
+SIZE_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+# Diretórios temporários de um store interrompido são apagados depois disso.
+STALE_TEMP_SECONDS = 3600
+
+
+@lru_cache(maxsize=None)
+def compiler_fingerprint():
+    """Hash do código do próprio compilador (Python e runtime Erlang), usado como versão nos carimbos."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    digest = hashlib.sha256()
+    for directory in COMPILER_SOURCE_DIRS:
+        for dirpath, dirnames, filenames in os.walk(os.path.join(root, directory)):
+            dirnames[:] = sorted(name for name in dirnames if name != "__pycache__")
+            for file_name in sorted(filenames):
+                if not file_name.endswith((".py", ".erl")):
+                    continue
+                path = os.path.join(dirpath, file_name)
+                digest.update(os.path.relpath(path, root).encode("utf-8"))
+                with open(path, "rb") as f:
+                    digest.update(f.read())
+    return digest.hexdigest()
+
+
+def parse_size(value):
+    """Converte 1048576, "512K", "500M" ou "2G" (sufixo B opcional) em bytes."""
+    match = re.fullmatch(r"(\d+)\s*([KMG]?)I?B?", str(value).strip().upper())
+    if match is None:
+        raise Exception(f"Tamanho de cache inválido: {value}")
+    return int(match.group(1)) * SIZE_UNITS[match.group(2)]
+
+
+def format_size(size):
+    for unit in ("G", "M", "K"):
+        if size >= SIZE_UNITS[unit]:
+            return f"{size / SIZE_UNITS[unit]:.1f} {unit}B"
+    return f"{size} B"
+
+
+@dataclass
+class CacheEntry:
+    path: str
+    size: int
+    last_used: float
+
+
+class ArtifactCache:
+    """Cache de artefatos endereçado por conteúdo, que pode ser compartilhado entre builds e máquinas.
+
+    Cada entrada fica em objects/<chave[:2]>/<chave>/ com os artefatos de um
+    módulo: .erl e/ou .beam e a interface .potioni, que guarda também os
+    diagnósticos. A chave é o hash do nome do módulo e do carimbo da
+    interface (código, opções de codegen, versão do compilador e interfaces
+    importadas). Entradas são gravadas num diretório temporário e renomeadas,
+    então builds concorrentes nunca leem uma entrada pela metade. O mtime da
+    entrada marca o último uso; passando de max_size, as menos usadas saem.
+    """
+
+    def __init__(self, directory, max_size=DEFAULT_MAX_SIZE):
+        self.directory = os.path.abspath(directory)
+        self.max_size = max_size
+
+    @classmethod
+    def configured(cls, directory=None, max_size=None, environ=None):
+        """Cache de --cache-dir/--cache-size ou de POTION_CACHE_DIR/POTION_CACHE_SIZE; None se nenhum diretório foi dado."""
+        environ = os.environ if environ is None else environ
+        directory = directory or environ.get(CACHE_DIR_ENV)
+        if not directory:
+            return None
+        if max_size is None:
+            max_size = environ.get(CACHE_SIZE_ENV, DEFAULT_MAX_SIZE)
+        return cls(directory, parse_size(max_size))
+
+    @staticmethod
+    def key(module_name, stamp):
+        payload = json.dumps({"module_name": module_name, "stamp": stamp}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def objects_dir(self):
+        return os.path.join(self.directory, "objects")
+
+    def entry_path(self, key):
+        return os.path.join(self.objects_dir(), key[:2], key)
+
+    def fetch(self, key, outdir):
+        """Copia os arquivos da entrada para outdir; devolve os caminhos copiados, ou None se a chave não está no cache."""
+        entry = self.entry_path(key)
+        try:
+            file_names = sorted(os.listdir(entry))
+            os.makedirs(outdir, exist_ok=True)
+            copied = []
+            for file_name in file_names:
+                output_path = os.path.join(outdir, file_name)
+                shutil.copyfile(os.path.join(entry, file_name), output_path)
+                copied.append(output_path)
+            os.utime(entry)
+        except OSError:
+            # Entrada ausente ou removida por um prune concorrente.
+            return None
+        return copied
+
+    def store(self, key, paths):
+        """Grava os arquivos em paths sob a chave; devolve False se ela já existia."""
+        entry = self.entry_path(key)
+        if os.path.isdir(entry):
+            with contextlib.suppress(OSError):
+                os.utime(entry)
+            return False
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        temp_dir = tempfile.mkdtemp(prefix=f".{key}.", dir=os.path.dirname(entry))
+        try:
+            for path in paths:
+                shutil.copyfile(path, os.path.join(temp_dir, os.path.basename(path)))
+            os.rename(temp_dir, entry)
+        except OSError:
+            # Outro build gravou a mesma chave antes, ou o volume recusou a escrita.
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            return False
+        return True
+
+    def entries(self):
+        entries = []
+        objects_dir = self.objects_dir()
+        for shard in sorted(os.listdir(objects_dir)) if os.path.isdir(objects_dir) else []:
+            shard_dir = os.path.join(objects_dir, shard)
+            for name in sorted(os.listdir(shard_dir)):
+                path = os.path.join(shard_dir, name)
+                if name.startswith("."):
+                    if time.time() - os.path.getmtime(path) > STALE_TEMP_SECONDS:
+                        shutil.rmtree(path, ignore_errors=True)
+                    continue
+                try:
+                    size = sum(os.path.getsize(os.path.join(path, file_name)) for file_name in os.listdir(path))
+                    entries.append(CacheEntry(path, size, os.path.getmtime(path)))
+                except OSError:
+                    continue
+        return entries
+
+    def stats(self):
+        entries = self.entries()
+        return {
+            "directory": self.directory,
+            "entries": len(entries),
+            "size": sum(entry.size for entry in entries),
+            "max_size": self.max_size,
+        }
+
+    def prune(self, max_size=None):
+        """Remove as entradas usadas há mais tempo até o cache caber em max_size; devolve (entradas, bytes) removidos."""
+        max_size = self.max_size if max_size is None else max_size
+        entries = sorted(self.entries(), key=lambda entry: entry.last_used)
+        total = sum(entry.size for entry in entries)
+        removed, freed = 0, 0
+        for entry in entries:
+            if total <= max_size:
+                break
+            shutil.rmtree(entry.path, ignore_errors=True)
+            total -= entry.size
+            removed += 1
+            freed += entry.size
+        return removed, freed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="potionc cache",
+        description="Inspect or prune the shared build artifact cache",
+    )
+    parser.add_argument("action", choices=("stats", "prune"))
+    parser.add_argument("--cache-dir", metavar="DIR", help=f"Cache directory [default: ${CACHE_DIR_ENV}]")
+    parser.add_argument(
+        "--max-size",
+        metavar="SIZE",
+        help=f"Size cap such as 500M or 2G [default: ${CACHE_SIZE_ENV} or {format_size(DEFAULT_MAX_SIZE)}]",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        cache = ArtifactCache.configured(args.cache_dir, args.max_size)
+        if cache is None:
+            print(f"Error: no cache directory; pass --cache-dir or set {CACHE_DIR_ENV}")
+            return 1
+        if args.action == "stats":
+            stats = cache.stats()
+            print(f"📦 Cache {stats['directory']}")
+            print(f"   entries: {stats['entries']}")
+            print(f"   size:    {format_size(stats['size'])} of {format_size(stats['max_size'])}")
+        else:
+            removed, freed = cache.prune()
+            print(f"🧹 Removed {removed} cache entries ({format_size(freed)}) from {cache.directory}")
+    except Exception as e:
+        print(f"Error: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+from codegen.potion_codegen import INSTRUMENT_IMPL_SUFFIX
+
+PROFILERS = ("eprof", "fprof", "tprof")
+RUNTIME_MODULES = {"potion_instrument", "potion_mailbox", "potion_profile", "potion_bench"}
+
+EPROF_LINE_RE = re.compile(
+    r"^\s*(?P<module>[^\s:]+):(?P<function>.+)/(?P<arity>\d+)\s+(?P<calls>\d+)\s+"
+    r"(?P<percent>[\d.]+)\s+(?P<time>\d+)\s+\[\s*[\d.]+\]\s*$"
+)
+FUN_NAME_RE = re.compile(r"^-(?P<name>.+)/(?P<arity>\d+)-fun-(?P<index>\d+)-$")
+BUILTIN_NAME_RE = re.compile(r"^potion_(?P<name>.+)_builtin$")
+
+
+def parse_eprof_output(text):
+    """Parse the `eprof:analyze(total)` log into (module, function, arity, calls, own_us) rows."""
+    rows = []
+    for line in text.splitlines():
+        match = EPROF_LINE_RE.match(line)
+        if match is None:
+            continue
+        rows.append((
+            match["module"].strip("'"),
+            match["function"].strip("'"),
+            int(match["arity"]),
+            int(match["calls"]),
+            int(match["time"]),
+        ))
+    return rows
+
+
+def parse_profile_rows(text):
+    """Parse the tab-separated rows written by potion_profile for fprof and tprof."""
+    rows = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        module, function, arity, calls, own_us = line.split("\t")
+        rows.append((module, function, int(arity), int(calls), int(own_us)))
+    return rows
+
+
+def demangle_function(function, arity):
+    """Map a generated Erlang function name back to the Potion name it came from."""
+    fun_match = FUN_NAME_RE.match(function)
+    if fun_match is not None:
+        parent = demangle_function(fun_match["name"], int(fun_match["arity"]))
+        return f"fun #{fun_match['index']} in {parent}"
+
+    if function.endswith(INSTRUMENT_IMPL_SUFFIX):
+        function = function[: -len(INSTRUMENT_IMPL_SUFFIX)]
+    elif function == "potion_instrument_init":
+        return "(instrumentation init)"
+    else:
+        builtin_match = BUILTIN_NAME_RE.match(function)
+        if builtin_match is not None:
+            return f"{builtin_match['name']}/{arity} (builtin)"
+    return f"{function}/{arity}"
+
+
+def demangle_module(module, source_names):
+    if module in source_names:
+        return source_names[module]
+    if module in RUNTIME_MODULES:
+        return f"{module} (potion runtime)"
+    return f"{module} (erlang)"
+
+
+def summarize(rows, source_names, top=20, potion_only=False):
+    """Merge rows by demangled Potion module/function and return the `top` by own time.
+
+    An instrumented wrapper and its `_impl` merge into a single entry.
+    """
+    merged = {}
+    for module, function, arity, calls, own_us in rows:
+        if potion_only and module not in source_names:
+            continue
+        key = (demangle_module(module, source_names), demangle_function(function, arity))
+        entry = merged.setdefault(key, {"calls": 0, "own_us": 0})
+        entry["calls"] += calls
+        entry["own_us"] += own_us
+
+    total = sum(entry["own_us"] for entry in merged.values()) or 1
+    ranked = sorted(merged.items(), key=lambda item: item[1]["own_us"], reverse=True)
+    return [
+        {
+            "module": module,
+            "function": function,
+            "calls": entry["calls"],
+            "own_us": entry["own_us"],
+            "percent": round(entry["own_us"] / total * 100, 2),
+        }
+        for (module, function), entry in ranked[:top]
+    ]
+
+
+def format_summary(summary):
+    lines = [f"{'function':<50}{'calls':>12}{'own ms':>12}{'%':>8}"]
+    for entry in summary:
+        label = f"{entry['module']}.{entry['function']}"
+        lines.append(f"{label:<50}{entry['calls']:>12}{entry['own_us'] / 1000:>12.2f}{entry['percent']:>8.2f}")
+    return "\n".join(lines)
+
+
+def build_profile_command(outdir, profiler, module_name, entry, calls, duration_ms, output_path):
+    escaped_path = output_path.replace("\\", "\\\\").replace('"', '\\"')
+    eval_code = (
+        f'potion_profile:run({profiler}, {module_name}, {entry}, {calls}, {duration_ms}, "{escaped_path}"), '
+        "halt()."
+    )
+    return ["erl", "-noshell", "-pa", outdir, "-eval", eval_code]
+
+
+def main(argv=None):
+    # Importado aqui para evitar import circular com cli.potionc.
+    from cli.potionc import ErlcError, compile_file, compile_runtime_module
+
+    parser = argparse.ArgumentParser(
+        prog="potionc profile",
+        description="Compile a Potion program and run an entry function under a BEAM profiler",
+    )
+    parser.add_argument("source", help="Path to the .potion file")
+    parser.add_argument("--profiler", choices=PROFILERS, default="eprof", help="BEAM profiler [default: eprof]")
+    parser.add_argument("--entry", default="main", help="Zero-arity function to run [default: main]")
+    parser.add_argument("--calls", type=int, default=1, help="Run the entry function N times [default: 1]")
+    parser.add_argument("--duration", type=float, default=0, help="Stop profiling after N seconds (0 = no limit)")
+    parser.add_argument("--top", type=int, default=20, help="Functions to report [default: 20]")
+    parser.add_argument("--potion-only", action="store_true", help="Only report functions from Potion modules")
+    parser.add_argument("--outdir", default="target", help="Output directory [default: target/]")
+    args = parser.parse_args(argv)
+
+    if not os.path.isfile(args.source) or not args.source.endswith(".potion"):
+        print(f"Error: '{args.source}' is not a .potion file.")
+        return 1
+    if args.calls < 1:
+        print("Error: --calls must be at least 1")
+        return 1
+
+    try:
+        result = compile_file(args.source, outdir=args.outdir)
+        compile_runtime_module("potion_profile", args.outdir)
+    except ErlcError as e:
+        print("❌ erlc compilation failed:")
+        print(e.stderr)
+        return 1
+    except Exception as e:
+        print(f"Error compiling file: {e}")
+        return 1
+
+    module_name = result.entry_module.module_name
+    output_path = os.path.abspath(os.path.join(args.outdir, f"profile.{args.profiler}.txt"))
+    command = build_profile_command(
+        args.outdir,
+        args.profiler,
+        module_name,
+        args.entry,
+        args.calls,
+        int(args.duration * 1000),
+        output_path,
+    )
+    if os.path.exists(output_path):
+        os.remove(output_path)
+    print(f"🔬 Profiling {module_name}:{args.entry}/0 with {args.profiler}...")
+    run = subprocess.run(command, capture_output=True, text=True)
+    if run.returncode != 0 or not os.path.isfile(output_path):
+        print("❌ Profiling run failed:")
+        print(run.stdout)
+        print(run.stderr)
+        return 1
+
+    with open(output_path, "r", encoding="utf-8") as f:
+        text = f.read()
+    rows = parse_eprof_output(text) if args.profiler == "eprof" else parse_profile_rows(text)
+    source_names = {module.module_name: module.source_name for module in result.modules}
+    print(f"📝 Raw profile written to {output_path}\n")
+    print(format_summary(summarize(rows, source_names, top=args.top, potion_only=args.potion_only)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from parser.potion_parser import FunctionDef
+
+BENCH_PREFIX = "bench_"
+
+
+def collect_benchmarks(modules, name_filter=None):
+    """Return [(erlang module, function)] for every zero-arity `fn bench_*()` in the program."""
+    benchmarks = []
+    for module in modules:
+        for stmt in module.ast.statements:
+            if not isinstance(stmt, FunctionDef) or not stmt.name.startswith(BENCH_PREFIX):
+                continue
+            if stmt.params:
+                raise Exception(
+                    f"Benchmark '{stmt.name}' em '{module.source_name}' não pode ter parâmetros."
+                )
+            if name_filter and name_filter not in stmt.name:
+                continue
+            benchmarks.append((module.module_name, stmt.name))
+    return benchmarks
+
+
+def parse_bench_rows(text):
+    """Parse potion_bench output into {"module.function": [(iterations, elapsed_us), ...]}."""
+    rounds = {}
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        module, function, _, iterations, elapsed_us = line.split("\t")
+        rounds.setdefault(f"{module}.{function}", []).append((int(iterations), int(elapsed_us)))
+    return rounds
+
+
+def summarize_rounds(rounds):
+    results = {}
+    for name, samples in rounds.items():
+        rates = [iterations / (elapsed_us / 1_000_000) for iterations, elapsed_us in samples if elapsed_us > 0]
+        if not rates:
+            continue
+        mean = statistics.fmean(rates)
+        stdev = statistics.stdev(rates) if len(rates) > 1 else 0.0
+        results[name] = {
+            "ops_per_sec": mean,
+            "stdev": stdev,
+            "rsd_percent": stdev / mean * 100 if mean else 0.0,
+            "min": min(rates),
+            "max": max(rates),
+            "iterations": sum(iterations for iterations, _ in samples),
+            "rounds": len(rates),
+        }
+    return results
+
+
+def compare_to_baseline(results, baseline, threshold_percent):
+    """Compare mean ops/sec; a benchmark regresses when it got slower than `threshold_percent`."""
+    rows = []
+    for name, current in results.items():
+        previous = baseline.get("benchmarks", {}).get(name)
+        if previous is None:
+            continue
+        change = (current["ops_per_sec"] - previous["ops_per_sec"]) / previous["ops_per_sec"] * 100
+        rows.append({
+            "benchmark": name,
+            "baseline": previous["ops_per_sec"],
+            "current": current["ops_per_sec"],
+            "change_percent": round(change, 1),
+            "regression": change < -threshold_percent,
+        })
+    return rows
+
+
+def format_results(results):
+    lines = [f"{'benchmark':<40}{'ops/sec':>14}{'± %':>8}{'min':>14}{'max':>14}"]
+    for name, result in results.items():
+        lines.append(
+            f"{name:<40}{result['ops_per_sec']:>14.1f}{result['rsd_percent']:>8.1f}"
+            f"{result['min']:>14.1f}{result['max']:>14.1f}"
+        )
+    return "\n".join(lines)
+
+
+def format_comparison(rows, threshold_percent):
+    lines = [f"🔍 Comparison against baseline (threshold {threshold_percent}%)"]
+    for row in rows:
+        status = "❌ regression" if row["regression"] else "✅ ok"
+        lines.append(f"{row['benchmark']:<40}{row['change_percent']:>+8.1f}%  {status}")
+    return "\n".join(lines)
+
+
+def build_bench_command(outdir, benchmarks, warmup_ms, duration_ms, rounds, output_path):
+    bench_list = ", ".join(f"{{{module}, {function}}}" for module, function in benchmarks)
+    escaped_path = output_path.replace("\\", "\\\\").replace('"', '\\"')
+    eval_code = (
+        f'potion_bench:run([{bench_list}], {warmup_ms}, {duration_ms}, {rounds}, "{escaped_path}"), '
+        "halt()."
+    )
+    return ["erl", "-noshell", "-pa", outdir, "-eval", eval_code]
+
+
+def main(argv=None):
+    # Importado aqui para evitar import circular com cli.potionc.
+    from cli.potionc import ErlcError, compile_file, compile_runtime_module
+
+    parser = argparse.ArgumentParser(
+        prog="potionc bench",
+        description="Compile a Potion program and run its `fn bench_*()` functions on the BEAM",
+    )
+    parser.add_argument("source", help="Path to the .potion file")
+    parser.add_argument("--duration", type=float, default=2.0, help="Timed seconds per benchmark [default: 2]")
+    parser.add_argument("--warmup", type=float, default=0.5, help="Warmup seconds per benchmark [default: 0.5]")
+    parser.add_argument("--rounds", type=int, default=5, help="Timed rounds per benchmark [default: 5]")
+    parser.add_argument("--filter", help="Only run benchmarks whose name contains this text")
+    parser.add_argument("--save-baseline", metavar="PATH", help="Write results as a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="Compare against a saved baseline")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Regression threshold in percent [default: 10]")
+    parser.add_argument("--outdir", default="target", help="Output directory [default: target/]")
+    args = parser.parse_args(argv)
+
+    if not os.path.isfile(args.source) or not args.source.endswith(".potion"):
+        print(f"Error: '{args.source}' is not a .potion file.")
+        return 1
+    if args.rounds < 1:
+        print("Error: --rounds must be at least 1")
+        return 1
+
+    try:
+        result = compile_file(args.source, outdir=args.outdir)
+        compile_runtime_module("potion_bench", args.outdir)
+        benchmarks = collect_benchmarks(result.modules, args.filter)
+    except ErlcError as e:
+        print("❌ erlc compilation failed:")
+        print(e.stderr)
+        return 1
+    except Exception as e:
+        print(f"Error compiling file: {e}")
+        return 1
+
+    if not benchmarks:
+        print("No `fn bench_*()` functions found.")
+        return 1
+
+    output_path = os.path.abspath(os.path.join(args.outdir, "bench.txt"))
+    if os.path.exists(output_path):
+        os.remove(output_path)
+    command = build_bench_command(
+        args.outdir,
+        benchmarks,
+        int(args.warmup * 1000),
+        int(args.duration * 1000),
+        args.rounds,
+        output_path,
+    )
+    print(f"⏱️ Running {len(benchmarks)} benchmark(s)...")
+    run = subprocess.run(command, capture_output=True, text=True)
+    if run.returncode != 0 or not os.path.isfile(output_path):
+        print("❌ Benchmark run failed:")
+        print(run.stdout)
+        print(run.stderr)
+        return 1
+
+    with open(output_path, "r", encoding="utf-8") as f:
+        results = summarize_rounds(parse_bench_rows(f.read()))
+    print(format_results(results))
+
+    missing = [f"{module}.{function}" for module, function in benchmarks if f"{module}.{function}" not in results]
+    for name in missing:
+        print(f"❌ {name} crashed; see the output above")
+    if missing:
+        print(run.stdout)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump({"benchmarks": results}, f, indent=2)
+        print(f"📝 Baseline written to {args.save_baseline}")
+
+    status = 1 if missing else 0
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = compare_to_baseline(results, baseline, args.threshold)
+        print(format_comparison(rows, args.threshold))
+        if any(row["regression"] for row in rows):
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
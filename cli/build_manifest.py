@@ -0,0 +1,107 @@
+import json
+import os
+from dataclasses import dataclass, field
+
+from cli.module_loader import dependency_order
+from codegen.potion_codegen import runtime_module_path
+
+MANIFEST_FILE = "potion-manifest.json"
+MANIFEST_FORMATS = ("json",)
+MANIFEST_VERSION = 1
+
+
+@dataclass
+class ModuleArtifacts:
+    """O que um build fez com um módulo: generated, reused, cached, precompiled ou removed."""
+
+    status: str
+    outputs: list = field(default_factory=list)
+    runtime_modules: list = field(default_factory=list)
+
+
+def module_inputs(loaded_modules):
+    """source_name -> .potion lidos para gerar o módulo: o próprio arquivo e todos os que ele importa, direta ou indiretamente."""
+    inputs = {}
+    for loaded_module in dependency_order(loaded_modules):
+        paths = [loaded_module.file_path]
+        for imported_name in loaded_module.imports:
+            paths.extend(inputs[imported_name])
+        inputs[loaded_module.source_name] = list(dict.fromkeys(paths))
+    return inputs
+
+
+def escape_make_path(path):
+    return path.replace("$", "$$").replace("#", "\\#").replace(" ", "\\ ")
+
+
+def depfile_rules(result):
+    """Regras (saídas, entradas) de cada módulo gerado e de cada módulo de runtime copiado."""
+    inputs = module_inputs(result.modules)
+    rules = []
+    for loaded_module in result.modules:
+        artifacts = result.artifacts.get(loaded_module.source_name)
+        if artifacts is not None and artifacts.outputs:
+            rules.append((artifacts.outputs, inputs[loaded_module.source_name]))
+    for name, outputs in result.runtime_artifacts.items():
+        rules.append((outputs, [runtime_module_path(name)]))
+    return rules
+
+
+def write_depfile(path, result):
+    """
+    Grava um depfile no formato do Make: uma regra `saídas: entradas` por
+    módulo e uma regra vazia para cada .potion, para que apagar um import
+    não quebre o build externo (como o -MP do gcc).
+
+    :param path: Caminho do depfile
+    :param result: CompileResult de um build que terminou com sucesso
+    """
+    rules = depfile_rules(result)
+    lines = []
+    for outputs, inputs in rules:
+        targets = " ".join(escape_make_path(output) for output in outputs)
+        prerequisites = " \\\n  ".join(escape_make_path(input_path) for input_path in inputs)
+        lines.append(f"{targets}: \\\n  {prerequisites}")
+    all_inputs = dict.fromkeys(input_path for _, inputs in rules for input_path in inputs)
+    lines.extend(f"{escape_make_path(input_path)}:" for input_path in all_inputs)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def build_manifest(result):
+    """Grafo de módulos, nomes Erlang e artefatos do build, para agendadores externos."""
+    inputs = module_inputs(result.modules)
+    modules = []
+    for loaded_module in result.modules:
+        artifacts = result.artifacts.get(loaded_module.source_name, ModuleArtifacts("generated"))
+        modules.append({
+            "name": loaded_module.source_name,
+            "module_name": loaded_module.module_name,
+            "source": loaded_module.file_path,
+            "library": loaded_module.library,
+            "imports": list(loaded_module.imports),
+            "inputs": inputs[loaded_module.source_name],
+            "status": artifacts.status,
+            "outputs": artifacts.outputs,
+            "runtime_modules": artifacts.runtime_modules,
+        })
+    return {
+        "version": MANIFEST_VERSION,
+        "entry": result.entry_module.source_name,
+        "modules": modules,
+        "build_order": [module.source_name for module in dependency_order(result.modules)],
+        "runtime_modules": [
+            {"module_name": name, "source": runtime_module_path(name), "outputs": outputs}
+            for name, outputs in result.runtime_artifacts.items()
+        ],
+    }
+
+
+def write_manifest(path, result):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(build_manifest(result), f, indent=2)
+        f.write("\n")
+
+
+def manifest_path(outdir):
+    return os.path.join(outdir, MANIFEST_FILE)
@@ -0,0 +1,159 @@
+import contextlib
+import json
+import time
+import tracemalloc
+
+from parser.potion_parser import ASTNode
+
+MODULE_PHASES = ["lex", "parse", "semantic", "codegen", "write"]
+
+
+def count_ast_nodes(node):
+    if isinstance(node, ASTNode):
+        return 1 + sum(count_ast_nodes(value) for value in vars(node).values())
+    if isinstance(node, (list, tuple)):
+        return sum(count_ast_nodes(item) for item in node)
+    if isinstance(node, dict):
+        return sum(count_ast_nodes(key) + count_ast_nodes(value) for key, value in node.items())
+    return 0
+
+
+def measure_phase(report, phase, module=None):
+    """Return `report.phase(...)`, or a no-op context when no report is being collected."""
+    if report is None:
+        return contextlib.nullcontext()
+    return report.phase(phase, module)
+
+
+class BuildReport:
+    """Collects per-module and per-phase timings for a potionc build.
+
+    Modules are keyed by their source name. Phases that cover the whole build
+    (module loading, erlc) are recorded with `module=None`. When
+    `trace_memory` is set, every phase also records the tracemalloc peak
+    seen while it ran. `options` holds the settings the build ran with
+    (-O level, erlc flags, tree shaking).
+    """
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.modules = {}
+        self.build_phases = {}
+        self.options = {}
+        self.started_at = None
+        self.total_seconds = None
+        self.peak_bytes = None
+        self._peak_stack = []
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def finish(self):
+        if self.started_at is not None:
+            self.total_seconds = time.perf_counter() - self.started_at
+        if self.trace_memory and tracemalloc.is_tracing():
+            self.peak_bytes = max(self.peak_bytes or 0, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+    def module(self, name):
+        if name not in self.modules:
+            self.modules[name] = {
+                "phases": {},
+                "tokens": 0,
+                "ast_nodes": 0,
+                "emitted_lines": 0,
+            }
+        return self.modules[name]
+
+    def record(self, module, **counts):
+        self.module(module).update(counts)
+
+    @contextlib.contextmanager
+    def phase(self, phase, module=None):
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            # Nested phases reset the peak, so the children's peaks are
+            # carried up to the enclosing phase on exit.
+            reset_peak = getattr(tracemalloc, "reset_peak", None)
+            if reset_peak is not None:
+                reset_peak()
+            self._peak_stack.append(0)
+
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started_at
+            entry = {"seconds": seconds}
+            if tracing:
+                peak = max(self._peak_stack.pop(), tracemalloc.get_traced_memory()[1])
+                if self._peak_stack:
+                    self._peak_stack[-1] = max(self._peak_stack[-1], peak)
+                self.peak_bytes = max(self.peak_bytes or 0, peak)
+                entry["peak_kib"] = round(peak / 1024, 1)
+
+            phases = self.build_phases if module is None else self.module(module)["phases"]
+            if phase in phases:
+                entry["seconds"] += phases[phase]["seconds"]
+                if "peak_kib" in phases[phase]:
+                    entry["peak_kib"] = max(entry.get("peak_kib", 0), phases[phase]["peak_kib"])
+            phases[phase] = entry
+
+    def to_dict(self):
+        return {
+            "modules": [{"module": name, **data} for name, data in self.modules.items()],
+            "build": {"phases": self.build_phases, "options": self.options},
+            "total_seconds": self.total_seconds,
+            "peak_kib": None if self.peak_bytes is None else round(self.peak_bytes / 1024, 1),
+        }
+
+    def write_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def format_table(self):
+        headers = ["module", *(f"{phase} ms" for phase in MODULE_PHASES), "tokens", "nodes", "lines", "peak KiB"]
+        rows = []
+        totals = {phase: 0.0 for phase in MODULE_PHASES}
+        for name, data in self.modules.items():
+            row = [name]
+            for phase in MODULE_PHASES:
+                seconds = data["phases"].get(phase, {}).get("seconds", 0.0)
+                totals[phase] += seconds
+                row.append(f"{seconds * 1000:.2f}")
+            row.extend(str(data[key]) for key in ("tokens", "ast_nodes", "emitted_lines"))
+            row.append(self._format_peak(data["phases"].values()))
+            rows.append(row)
+
+        rows.append([
+            "total",
+            *(f"{totals[phase] * 1000:.2f}" for phase in MODULE_PHASES),
+            *(str(sum(data[key] for data in self.modules.values())) for key in ("tokens", "ast_nodes", "emitted_lines")),
+            "-" if self.peak_bytes is None else f"{self.peak_bytes / 1024:.1f}",
+        ])
+
+        widths = [max(len(str(row[i])) for row in [headers, *rows]) for i in range(len(headers))]
+        lines = [self._format_row(headers, widths)]
+        lines.append("  ".join("-" * width for width in widths))
+        lines.extend(self._format_row(row, widths) for row in rows)
+
+        for phase, entry in self.build_phases.items():
+            peak = f" (peak {entry['peak_kib']:.1f} KiB)" if "peak_kib" in entry else ""
+            lines.append(f"{phase}: {entry['seconds'] * 1000:.2f} ms{peak}")
+        if self.total_seconds is not None:
+            lines.append(f"total: {self.total_seconds * 1000:.2f} ms")
+        if self.options:
+            lines.append("options: " + ", ".join(f"{key}={value}" for key, value in self.options.items()))
+        return "\n".join(lines)
+
+    @staticmethod
+    def _format_peak(entries):
+        peaks = [entry["peak_kib"] for entry in entries if "peak_kib" in entry]
+        return f"{max(peaks):.1f}" if peaks else "-"
+
+    @staticmethod
+    def _format_row(row, widths):
+        first, *rest = row
+        return "  ".join([first.ljust(widths[0]), *(value.rjust(width) for value, width in zip(rest, widths[1:]))])
@@ -0,0 +1,34 @@
+import re
+from dataclasses import dataclass, field
+
+# Espaços e comentários de linha que podem vir antes ou entre os imports.
+SKIP_RE = re.compile(r"(?:\s+|//[^\n]*)*")
+IMPORT_RE = re.compile(r"import\s+(?:(erlang)\s+)?([a-zA-Z_][a-zA-Z0-9_]*)\b")
+
+
+@dataclass
+class ImportHeader:
+    imports: list = field(default_factory=list)
+    erlang_imports: list = field(default_factory=list)
+
+
+def scan_import_header(source_code):
+    """
+    Lê só os `import` / `import erlang` do início do arquivo, sem tokenizar
+    nem montar a AST. Para no primeiro trecho que não é import.
+
+    :param source_code: Conteúdo de um arquivo .potion
+    :return: ImportHeader com os módulos Potion e Erlang importados
+    """
+    header = ImportHeader()
+    position = SKIP_RE.match(source_code).end()
+    while True:
+        match = IMPORT_RE.match(source_code, position)
+        if match is None:
+            return header
+        erlang, module_name = match.groups()
+        if not erlang and module_name == "erlang":
+            # `import erlang` sem nome de módulo: o parser reporta o erro.
+            return header
+        (header.erlang_imports if erlang else header.imports).append(module_name)
+        position = SKIP_RE.match(source_code, match.end()).end()
@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+
+from parser.potion_parser import FunctionParam
+
+from cli.module_loader import register_external_function
+from semantic.call_graph import public_functions
+
+INTERFACE_EXTENSION = ".potioni"
+INTERFACE_VERSION = 1
+
+
+def interface_hash(interface):
+    # Só a API entra no hash: mudar a implementação não invalida quem importa.
+    api = {"module_name": interface["module_name"], "functions": interface["functions"]}
+    return hashlib.sha256(json.dumps(api, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def make_interface(loaded_module, functions):
+    interface = {
+        "version": INTERFACE_VERSION,
+        "module": loaded_module.source_name,
+        "module_name": loaded_module.module_name,
+        "functions": functions,
+    }
+    interface["hash"] = interface_hash(interface)
+    return interface
+
+
+def function_entry(function_def, return_type):
+    return {
+        "name": function_def.name,
+        "params": [{"name": param.name, "type": param.type_annotation} for param in function_def.params],
+        "return_type": return_type,
+    }
+
+
+def build_interface(loaded_module, codegen):
+    """Interface de um módulo já gerado: funções públicas, parâmetros e tipo de retorno inferido."""
+    return make_interface(
+        loaded_module,
+        [
+            function_entry(function_def, codegen.return_type_summary(function_def.name))
+            for function_def in public_functions(loaded_module.ast)
+        ],
+    )
+
+
+def ast_interface(loaded_module):
+    """Interface tirada só da AST, para módulos que não passam pelo codegen neste build."""
+    return make_interface(
+        loaded_module,
+        [function_entry(function_def, "dynamic") for function_def in public_functions(loaded_module.ast)],
+    )
+
+
+def read_interface(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            interface = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    return interface if interface.get("version") == INTERFACE_VERSION else None
+
+
+class InterfaceStore:
+    """Interfaces (.potioni) dos módulos de um build.
+
+    Cada interface é gravada em outdir com um carimbo: hash do código,
+    opções de codegen, chave do build e hash das interfaces importadas. Um
+    módulo cujo carimbo não mudou e cujos artefatos existem é reaproveitado
+    sem passar pelo codegen nem pelo erlc. Com um ArtifactCache, um módulo
+    que não está em outdir é copiado do cache quando o carimbo já foi
+    compilado antes. Interfaces novas só são gravadas (e guardadas no cache)
+    em `commit`, depois que o build dá certo.
+
+    Sem outdir, `memory` (caminho do .potion -> interface com carimbo) faz o
+    mesmo papel em memória: é como o `potionc serve` revalida só os módulos
+    que mudaram entre duas checagens.
+    """
+
+    def __init__(self, outdir=None, build_key=None, output_extensions=(".erl",), reuse=True, cache=None, memory=None):
+        self.outdir = outdir
+        self.build_key = build_key
+        self.output_extensions = output_extensions
+        self.memory = memory if outdir is None else None
+        self.reuse = reuse and (outdir is not None or self.memory is not None)
+        self.cache = cache if outdir is not None else None
+        self.interfaces = {}
+        self.reused = []
+        self.restored = []
+        self.runtime_modules = {}
+        self.pending = {}
+
+    def interface_path(self, loaded_module):
+        return os.path.join(self.outdir, f"{loaded_module.module_name}{INTERFACE_EXTENSION}")
+
+    def output_paths(self, loaded_module):
+        return [os.path.join(self.outdir, f"{loaded_module.module_name}{extension}") for extension in self.output_extensions]
+
+    def external_functions(self, loaded_module):
+        external_functions = {}
+        for imported_name in loaded_module.imports:
+            interface = self.interfaces[imported_name]
+            for function in interface["functions"]:
+                register_external_function(external_functions, function["name"], {
+                    "module_name": interface["module_name"],
+                    "source_name": imported_name,
+                    "params": [FunctionParam(param["name"], param["type"]) for param in function["params"]],
+                    "return_type": function["return_type"],
+                })
+        return external_functions
+
+    def stamp(self, loaded_module, options):
+        return {
+            "source_hash": loaded_module.source_hash,
+            "options": options,
+            "build": self.build_key,
+            "imports": {name: self.interfaces[name]["hash"] for name in loaded_module.imports},
+        }
+
+    def stored_interface(self, loaded_module, stamp):
+        if self.memory is not None:
+            stored = self.memory.get(loaded_module.file_path)
+            return stored if stored is not None and stored["stamp"] == stamp else None
+        stored = read_interface(self.interface_path(loaded_module))
+        if stored is None or stored.get("stamp") != stamp:
+            return None
+        if not all(os.path.isfile(path) for path in self.output_paths(loaded_module)):
+            return None
+        return stored
+
+    def reusable(self, loaded_module, stamp):
+        """Interface gravada por um build anterior equivalente (em outdir ou no cache), ou None."""
+        if not self.reuse:
+            return None
+        stored = self.stored_interface(loaded_module, stamp)
+        if stored is None and self.cache is not None:
+            if self.cache.fetch(self.cache.key(loaded_module.module_name, stamp), self.outdir):
+                stored = self.stored_interface(loaded_module, stamp)
+                if stored is not None:
+                    self.restored.append(loaded_module)
+        if stored is None:
+            return None
+        self.interfaces[loaded_module.source_name] = stored
+        self.runtime_modules[loaded_module.source_name] = stored.get("runtime_modules", [])
+        self.reused.append(loaded_module)
+        return stored
+
+    def use(self, loaded_module, interface):
+        self.interfaces[loaded_module.source_name] = interface
+
+    def add(self, loaded_module, interface, stamp, runtime_modules, diagnostics=()):
+        self.interfaces[loaded_module.source_name] = interface
+        self.runtime_modules[loaded_module.source_name] = sorted(runtime_modules)
+        record = {
+            **interface,
+            "stamp": stamp,
+            "runtime_modules": sorted(runtime_modules),
+            "diagnostics": list(diagnostics),
+        }
+        if self.memory is not None:
+            self.memory[loaded_module.file_path] = record
+        elif self.outdir is not None:
+            self.pending[loaded_module.source_name] = (loaded_module, record)
+
+    def commit(self):
+        stored = False
+        for loaded_module, interface in self.pending.values():
+            path = self.interface_path(loaded_module)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(interface, f, indent=2, sort_keys=True)
+            if self.cache is not None:
+                key = self.cache.key(loaded_module.module_name, interface["stamp"])
+                stored |= self.cache.store(key, [*self.output_paths(loaded_module), path])
+        if stored:
+            self.cache.prune()
+        self.pending = {}
@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+
+INDEX_FILE = ".potion_index.json"
+INDEX_VERSION = 2
+PROJECT_FILE = "potion.json"
+SEARCH_PATH_ENV = "POTION_PATH"
+
+
+@dataclass
+class SearchPaths:
+    """Diretórios onde `import nome` procura nome.potion depois do diretório do próprio arquivo.
+
+    Módulos encontrados em `libs` são bibliotecas: o .beam compilado fica
+    ao lado do .potion e é reaproveitado por todos os programas.
+    """
+
+    paths: list = field(default_factory=list)
+    libs: list = field(default_factory=list)
+
+    def directories(self, importer_dir):
+        return list(dict.fromkeys([importer_dir, *self.paths, *self.libs]))
+
+    def is_library(self, directory):
+        return directory in self.libs
+
+
+def hash_source(source_code):
+    return hashlib.sha256(source_code.encode("utf-8")).hexdigest()
+
+
+def find_project_file(start_dir):
+    directory = os.path.abspath(start_dir)
+    while True:
+        candidate = os.path.join(directory, PROJECT_FILE)
+        if os.path.isfile(candidate):
+            return candidate
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return None
+        directory = parent
+
+
+def project_root(entry_path):
+    """Diretório do potion.json mais próximo do arquivo de entrada ou, sem ele, o diretório do arquivo."""
+    entry_dir = os.path.dirname(os.path.abspath(entry_path))
+    project_file = find_project_file(entry_dir)
+    return entry_dir if project_file is None else os.path.dirname(project_file)
+
+
+def load_project_file(path):
+    with open(path, "r", encoding="utf-8") as f:
+        try:
+            project = json.load(f)
+        except json.JSONDecodeError as e:
+            raise Exception(f"{PROJECT_FILE} inválido em {path}: {e}")
+    base_dir = os.path.dirname(path)
+    paths = [os.path.join(base_dir, directory) for directory in project.get("paths", [])]
+    libs = [os.path.join(base_dir, directory) for directory in project.get("libs", [])]
+    return paths, libs
+
+
+def module_search_paths(entry_path, include_dirs=(), lib_dirs=(), environ=None):
+    """
+    Monta os caminhos de busca na ordem: -I da linha de comando, `paths` do
+    potion.json mais próximo do arquivo de entrada e POTION_PATH. As
+    bibliotecas vêm de --lib e de `libs` do potion.json.
+
+    :param entry_path: Arquivo .potion de entrada
+    :param include_dirs: Diretórios passados com -I
+    :param lib_dirs: Diretórios de biblioteca passados com --lib
+    :param environ: Ambiente usado para ler POTION_PATH (padrão: os.environ)
+    :return: SearchPaths com caminhos absolutos
+    """
+    environ = os.environ if environ is None else environ
+    project_paths, project_libs = [], []
+    project_file = find_project_file(os.path.dirname(os.path.abspath(entry_path)))
+    if project_file is not None:
+        project_paths, project_libs = load_project_file(project_file)
+    env_paths = [path for path in environ.get(SEARCH_PATH_ENV, "").split(os.pathsep) if path]
+
+    def absolute(directories):
+        return list(dict.fromkeys(os.path.abspath(directory) for directory in directories))
+
+    return SearchPaths(
+        paths=absolute([*include_dirs, *project_paths, *env_paths]),
+        libs=absolute([*lib_dirs, *project_libs]),
+    )
+
+
+class ModuleIndex:
+    """Cache persistente nome → caminho dos diretórios de busca.
+
+    A listagem de um diretório só é refeita quando o mtime dele muda, então
+    resolver um import custa um stat por diretório em vez de um probe por
+    import. O hash do código não fica aqui: ele sai sempre do texto lido.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.directories = {}
+        self.changed = False
+
+    @classmethod
+    def load(cls, path):
+        index = cls(path)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return index
+        if data.get("version") == INDEX_VERSION:
+            index.directories = data.get("directories", {})
+        return index
+
+    def save(self):
+        if self.path is None or not self.changed:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": INDEX_VERSION, "directories": self.directories}, f, indent=2, sort_keys=True)
+        os.replace(temp_path, self.path)
+        self.changed = False
+
+    def modules_in(self, directory):
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            return {}
+        entry = self.directories.get(directory)
+        if entry is not None and entry["mtime"] == mtime:
+            return entry["modules"]
+
+        modules = {}
+        for file_name in sorted(os.listdir(directory)):
+            name, extension = os.path.splitext(file_name)
+            path = os.path.join(directory, file_name)
+            if extension == ".potion" and os.path.isfile(path):
+                modules[name] = {"path": path}
+        self.directories[directory] = {"mtime": mtime, "modules": modules}
+        self.changed = True
+        return modules
+
+    def find(self, name, directories):
+        """Devolve (caminho, diretório) do primeiro name.potion em directories, ou (None, None)."""
+        for directory in directories:
+            module = self.modules_in(directory).get(name)
+            if module is not None:
+                return module["path"], directory
+        return None, None
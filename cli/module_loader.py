@@ -1,10 +1,19 @@
 import os
 import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
 
 from parser.potion_parser import FunctionDef, ImportStatement
 
-from cli.parse_potion_file import parse_potion_file
+from cli.import_scanner import scan_import_header
+from cli.module_index import ModuleIndex, SearchPaths, hash_source
+from cli.parse_potion_file import parse_potion_source
+from semantic.call_graph import function_references, module_functions, public_functions
+
+
+# Abaixo disso, subir o pool e devolver as ASTs custa mais do que o parse.
+PARALLEL_PARSE_MIN_BYTES = 256 * 1024
 
 
 def sanitize_module_name(source_name: str) -> str:
@@ -23,6 +32,8 @@ class LoadedModule:
     file_path: str
     ast: object
     imports: list
+    library: bool = False
+    source_hash: str = ""
 
 
 def collect_module_imports(ast):
@@ -33,43 +44,158 @@ def collect_module_functions(ast):
     return [stmt for stmt in ast.statements if isinstance(stmt, FunctionDef)]
 
 
-def load_module_graph(entry_path):
-    modules = {}
-    loading = set()
-
-    def load(file_path):
-        abs_path = os.path.abspath(file_path)
-        if abs_path in modules:
-            return modules[abs_path]
-        if abs_path in loading:
-            raise Exception(f"Import cíclico detectado: {abs_path}")
-        if not os.path.isfile(abs_path):
-            raise Exception(f"Módulo não encontrado: {file_path}")
-
-        loading.add(abs_path)
-        source_name = os.path.splitext(os.path.basename(abs_path))[0]
-        ast = parse_potion_file(abs_path)
-        imports = collect_module_imports(ast)
-        loaded_module = LoadedModule(
-            source_name=source_name,
-            module_name=sanitize_module_name(source_name),
-            file_path=abs_path,
-            ast=ast,
-            imports=imports,
+def load_module_graph(entry_path, report=None, jobs=1, search_paths=None, index=None, parsed=None, overlays=None):
+    """
+    Carrega o módulo de entrada e todos os módulos Potion importados por ele.
+
+    O grafo é descoberto em largura lendo só o cabeçalho de imports de cada
+    arquivo; depois os módulos são analisados de uma vez, em paralelo quando
+    jobs > 1. Imports fora do cabeçalho aparecem na AST e entram na rodada
+    seguinte.
+
+    :param entry_path: Caminho do .potion de entrada
+    :param report: BuildReport opcional; com ele o parse roda neste processo
+    :param jobs: Número máximo de processos para o parse
+    :param search_paths: SearchPaths usados depois do diretório do arquivo que importa
+    :param index: ModuleIndex que resolve nomes; sem ele, um índice só em memória
+    :param parsed: Dicionário caminho -> (hash, AST) mantido por quem chama; arquivos com o mesmo hash não são analisados de novo
+    :param overlays: Dicionário caminho -> texto usado no lugar do arquivo em disco (buffers ainda não salvos)
+    :return: (módulo de entrada, módulos carregados em ordem de import)
+    """
+    entry_path = os.path.abspath(entry_path)
+    overlays = overlays or {}
+    if not os.path.isfile(entry_path) and entry_path not in overlays:
+        raise Exception(f"Módulo não encontrado: {entry_path}")
+    resolver = ImportResolver(search_paths or SearchPaths(), index or ModuleIndex())
+
+    asts = {}
+    hashes = {}
+    imports_by_path = {}
+    pending = [entry_path]
+    while pending:
+        sources = discover_module_sources(pending, imports_by_path, resolver, overlays)
+        for path, source in sources.items():
+            # O hash sai do texto que foi lido: um mtime parado não garante que o conteúdo é o mesmo.
+            hashes[path] = hash_source(source)
+        stale = {
+            path: source
+            for path, source in sources.items()
+            if parsed is None or parsed.get(path, (None,))[0] != hashes[path]
+        }
+        asts.update(parse_module_sources(stale, report=report, jobs=jobs))
+        for path in sources:
+            if path in stale:
+                if parsed is not None:
+                    parsed[path] = (hashes[path], asts[path])
+            else:
+                asts[path] = parsed[path][1]
+        pending = []
+        for path in sources:
+            imports_by_path[path] = resolver.resolve(path, collect_module_imports(asts[path]))
+            pending.extend(imported for imported in imports_by_path[path] if imported not in asts)
+        pending = list(dict.fromkeys(pending))
+
+    modules = [
+        LoadedModule(
+            source_name=module_source_name(path),
+            module_name=sanitize_module_name(module_source_name(path)),
+            file_path=path,
+            ast=asts[path],
+            imports=collect_module_imports(asts[path]),
+            library=path in resolver.library_paths,
+            source_hash=hashes[path],
         )
-        modules[abs_path] = loaded_module
+        for path in import_order(entry_path, imports_by_path)
+    ]
+    paths_by_source_name = {}
+    for module in modules:
+        other = paths_by_source_name.setdefault(module.source_name, module.file_path)
+        if other != module.file_path:
+            raise Exception(f"Dois módulos com o mesmo nome '{module.source_name}': {other} e {module.file_path}")
+    return modules[0], modules
+
+
+def module_source_name(file_path):
+    return os.path.splitext(os.path.basename(file_path))[0]
 
-        base_dir = os.path.dirname(abs_path)
+
+class ImportResolver:
+    """Resolve `import nome` pelo diretório do arquivo e depois pelos SearchPaths."""
+
+    def __init__(self, search_paths, index):
+        self.search_paths = search_paths
+        self.index = index
+        self.library_paths = set()
+
+    def resolve(self, file_path, imports):
+        directories = self.search_paths.directories(os.path.dirname(file_path))
+        resolved = []
         for imported_name in imports:
-            imported_path = os.path.join(base_dir, f"{imported_name}.potion")
-            load(imported_path)
+            imported_path, directory = self.index.find(imported_name, directories)
+            if imported_path is None:
+                raise Exception(
+                    f"Módulo não encontrado: {imported_name}.potion (procurado em: {', '.join(directories)})"
+                )
+            if self.search_paths.is_library(directory):
+                self.library_paths.add(imported_path)
+            resolved.append(imported_path)
+        return resolved
+
+
+def discover_module_sources(paths, known, resolver, overlays=None):
+    """Lê os arquivos alcançáveis a partir de paths, em largura, sem montar AST."""
+    overlays = overlays or {}
+    sources = {}
+    queue = deque(path for path in paths if path not in known)
+    while queue:
+        path = queue.popleft()
+        if path in sources:
+            continue
+        if path in overlays:
+            sources[path] = overlays[path]
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                sources[path] = f.read()
+        header = scan_import_header(sources[path])
+        for imported in resolver.resolve(path, header.imports):
+            if imported not in sources and imported not in known:
+                queue.append(imported)
+    return sources
 
-        loading.remove(abs_path)
-        return loaded_module
 
-    entry_module = load(entry_path)
-    ordered_modules = list(modules.values())
-    return entry_module, ordered_modules
+def parse_module_sources(sources, report=None, jobs=1):
+    # O BuildReport mede tempo e memória dentro deste processo, então com
+    # ele o parse não vai para o pool.
+    small = sum(len(source) for source in sources.values()) < PARALLEL_PARSE_MIN_BYTES
+    if report is not None or jobs <= 1 or len(sources) < 2 or small:
+        return {path: parse_potion_source(source, path, report=report) for path, source in sources.items()}
+    paths = list(sources)
+    with ProcessPoolExecutor(max_workers=min(jobs, len(paths))) as pool:
+        asts = pool.map(parse_potion_source, [sources[path] for path in paths], paths)
+        return dict(zip(paths, asts))
+
+
+def import_order(entry_path, imports_by_path):
+    """Ordem em profundidade a partir da entrada, sem recursão, detectando ciclos."""
+    order = [entry_path]
+    visiting = {entry_path}
+    done = set()
+    stack = [(entry_path, iter(imports_by_path[entry_path]))]
+    while stack:
+        path, imports = stack[-1]
+        for imported in imports:
+            if imported in visiting:
+                raise Exception(f"Import cíclico detectado: {imported}")
+            if imported not in done:
+                visiting.add(imported)
+                order.append(imported)
+                stack.append((imported, iter(imports_by_path[imported])))
+                break
+        else:
+            stack.pop()
+            visiting.remove(path)
+            done.add(path)
+    return order
 
 
 def build_external_function_map(module, modules_by_source_name):
@@ -78,15 +204,83 @@ def build_external_function_map(module, modules_by_source_name):
         if imported_name not in modules_by_source_name:
             raise Exception(f"Módulo importado não encontrado: {imported_name}")
         imported_module = modules_by_source_name[imported_name]
-        for function_def in collect_module_functions(imported_module.ast):
-            key = (function_def.name, len(function_def.params))
-            if key in external_functions:
-                raise Exception(
-                    f"Conflito de import: função '{function_def.name}/{len(function_def.params)}' "
-                    f"foi importada de mais de um módulo."
-                )
-            external_functions[key] = {
+        # Só as funções públicas (`pub fn`) são visíveis para quem importa.
+        for function_def in public_functions(imported_module.ast):
+            register_external_function(external_functions, function_def.name, {
                 "module_name": imported_module.module_name,
+                "source_name": imported_module.source_name,
                 "params": function_def.params,
-            }
+            })
     return external_functions
+
+
+def register_external_function(external_functions, name, entry):
+    key = (name, len(entry["params"]))
+    if key in external_functions:
+        raise Exception(
+            f"Conflito de import: função '{name}/{len(entry['params'])}' "
+            f"foi importada de mais de um módulo."
+        )
+    external_functions[key] = entry
+
+
+def dependency_order(loaded_modules):
+    """Módulos com cada import antes de quem o importa (o grafo já foi checado contra ciclos)."""
+    modules_by_source_name = {module.source_name: module for module in loaded_modules}
+    order = []
+    done = set()
+    for root in loaded_modules:
+        stack = [(root, iter(root.imports))]
+        while stack:
+            module, imports = stack[-1]
+            if module.source_name in done:
+                stack.pop()
+                continue
+            for imported_name in imports:
+                if imported_name not in done:
+                    imported = modules_by_source_name[imported_name]
+                    stack.append((imported, iter(imported.imports)))
+                    break
+            else:
+                stack.pop()
+                done.add(module.source_name)
+                order.append(module)
+    return order
+
+
+def reachable_module_functions(entry_module, loaded_modules, extra_roots=()):
+    """Funções alcançáveis a partir de main/0 do módulo de entrada, seguindo os imports.
+
+    Devolve {source_name: {nomes}}; módulos sem nenhuma função alcançável
+    ficam de fora. extra_roots são funções mantidas em todo módulo
+    alcançado, como o code_change usado pelos hooks de upgrade.
+    """
+    modules_by_source_name = {module.source_name: module for module in loaded_modules}
+    functions = {module.source_name: module_functions(module.ast) for module in loaded_modules}
+    if "main" not in functions[entry_module.source_name]:
+        raise Exception("Tree shaking precisa de uma função main/0 no módulo de entrada.")
+
+    external_by_name = {}
+    reachable = {}
+    pending = [(entry_module.source_name, "main")]
+    while pending:
+        source_name, name = pending.pop()
+        if name in reachable.get(source_name, ()):
+            continue
+        if source_name not in reachable:
+            reachable[source_name] = set()
+            pending.extend((source_name, root) for root in extra_roots if root in functions[source_name])
+            # O mesmo nome pode existir com aridades diferentes; manter todas é seguro.
+            external_by_name[source_name] = {}
+            external_map = build_external_function_map(modules_by_source_name[source_name], modules_by_source_name)
+            for (external_name, _), external in external_map.items():
+                external_by_name[source_name].setdefault(external_name, set()).add(external["source_name"])
+        reachable[source_name].add(name)
+
+        for ref in function_references(functions[source_name][name].body):
+            if ref in functions[source_name]:
+                pending.append((source_name, ref))
+            else:
+                pending.extend((imported, ref) for imported in external_by_name[source_name].get(ref, ()))
+
+    return {module.source_name: reachable[module.source_name] for module in loaded_modules if module.source_name in reachable}
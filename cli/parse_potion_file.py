@@ -1,17 +1,44 @@
+import os
+
 from lexer.potion_lexer import tokenize
 from parser.potion_parser import Parser
 
-def parse_potion_file(file_path):
+from cli.build_report import count_ast_nodes, measure_phase
+
+def parse_potion_file(file_path, report=None):
     """
     Lê um arquivo .potion, faz a análise léxica e sintática, e retorna a AST.
     
     :param file_path: Caminho para o arquivo .potion
+    :param report: BuildReport opcional que recebe os tempos de lex/parse do módulo
     :return: AST gerada pelo parser
     """
     with open(file_path, "r", encoding="utf-8") as f:
         source_code = f.read()
+    return parse_potion_source(source_code, file_path, report=report)
+
+
+def parse_potion_source(source_code, file_path, report=None):
+    """
+    Faz a análise léxica e sintática de um código .potion já lido.
+
+    Também é o ponto de entrada dos workers do parse paralelo, por isso a
+    AST devolvida precisa ser serializável com pickle.
+
+    :param source_code: Conteúdo do arquivo .potion
+    :param file_path: Caminho de origem; o nome do módulo vem dele
+    :param report: BuildReport opcional que recebe os tempos de lex/parse do módulo
+    :return: AST gerada pelo parser
+    """
+    module = os.path.splitext(os.path.basename(file_path))[0]
+
+    with measure_phase(report, "lex", module):
+        tokens = tokenize(source_code)
+
+    with measure_phase(report, "parse", module):
+        parser = Parser(tokens)
+        ast = parser.parse()  # ou parser.program() dependendo do nome que você deu
 
-    tokens = tokenize(source_code)
-    parser = Parser(tokens)
-    ast = parser.parse()  # ou parser.program() dependendo do nome que você deu
+    if report is not None:
+        report.record(module, tokens=len(tokens), ast_nodes=count_ast_nodes(ast))
     return ast
@@ -1,12 +1,564 @@
-from cli.module_loader import build_external_function_map, load_module_graph, sanitize_module_name
-from codegen.potion_codegen import ErlangCodegen
+from cli.build_report import BuildReport, measure_phase
+from cli.profiling import CompilerProfile
+from cli.runner import RunnerClient, RunnerError
+from cli.module_index import INDEX_FILE, ModuleIndex, module_search_paths, project_root
+from cli.artifact_cache import ArtifactCache, compiler_fingerprint
+from cli.build_manifest import MANIFEST_FORMATS, ModuleArtifacts, manifest_path, write_depfile, write_manifest
+from cli.interface import INTERFACE_EXTENSION, InterfaceStore, ast_interface, build_interface, read_interface
+from cli.module_loader import (
+    dependency_order,
+    load_module_graph,
+    reachable_module_functions,
+    sanitize_module_name,
+)
+from codegen.potion_codegen import INSTRUMENT_KINDS, OPTIMIZATION_LEVELS, ErlangCodegen, runtime_module_path
+from dataclasses import dataclass, field
+import contextlib
+import importlib
+import shutil
 import sys
 import os
 import subprocess
 import argparse
 
 
+INSTRUMENT_RUNTIME_MODULES = {
+    "calls": "potion_instrument",
+    "messages": "potion_mailbox",
+}
+
+
+@dataclass
+class CompileResult:
+    entry_module: object
+    modules: list
+    outputs: list
+    # source_name -> ModuleArtifacts; runtime_artifacts: módulo de runtime -> arquivos gerados.
+    artifacts: dict = field(default_factory=dict)
+    runtime_artifacts: dict = field(default_factory=dict)
+
+
+class ErlcError(Exception):
+    def __init__(self, stderr):
+        super().__init__(f"erlc compilation failed:\n{stderr}")
+        self.stderr = stderr
+
+
+def source_path_for_erlang(file_path, source_root=None):
+    # Relativo à raiz do projeto (não ao cwd), o -file fica igual entre
+    # checkouts e o carimbo do cache não depende de onde o build roda.
+    try:
+        relative = os.path.relpath(file_path, source_root)
+    except ValueError:
+        return file_path
+    return file_path if relative.startswith("..") else relative
+
+
+def module_codegen_options(
+    loaded_module,
+    instrument=(),
+    file_attributes=True,
+    hot_reload=False,
+    upgrade_hooks=False,
+    optimize=0,
+    keep_functions=None,
+    source_root=None,
+):
+    """Opções de codegen de um módulo, como entram no carimbo do .potioni."""
+    return {
+        "instrument": sorted(instrument),
+        "source_path": source_path_for_erlang(loaded_module.file_path, source_root) if file_attributes else None,
+        "hot_reload": hot_reload,
+        "upgrade_hooks": upgrade_hooks,
+        "optimize": optimize,
+        "keep_functions": None if keep_functions is None else sorted(keep_functions),
+    }
+
+
+def emit_erlang_modules(
+    loaded_modules,
+    report=None,
+    instrument=(),
+    file_attributes=True,
+    hot_reload=False,
+    upgrade_hooks=False,
+    optimize=0,
+    keep_functions=None,
+    precompiled=(),
+    interfaces=None,
+    source_root=None,
+):
+    """Gera o Erlang de cada módulo sem gravar nada; devolve [(módulo, código)] e os módulos de runtime usados.
+
+    Os módulos são gerados com cada import antes de quem o importa, e as
+    chamadas externas são resolvidas pelas interfaces em `interfaces`
+    (InterfaceStore). Módulos que o InterfaceStore reaproveita de um build
+    anterior ficam de fora do resultado.
+
+    keep_functions ({source_name: {nomes}}) vem do tree shaking: módulos fora
+    dele não são gerados e as demais funções de cada módulo são descartadas.
+    precompiled lista bibliotecas cujo .beam já existe e não são geradas.
+    Os caminhos do -file são relativos a source_root (padrão: o cwd).
+    """
+    interfaces = InterfaceStore() if interfaces is None else interfaces
+
+    sources = []
+    runtime_modules = set()
+    for loaded_module in dependency_order(loaded_modules):
+        module = loaded_module.source_name
+        if keep_functions is not None and module not in keep_functions:
+            print(f"🌳 Tree shaking removed module {module}")
+            interfaces.use(loaded_module, ast_interface(loaded_module))
+            if report is not None:
+                report.record(module, removed=True)
+            continue
+        if module in precompiled:
+            print(f"📚 Using precompiled library module {module}")
+            interfaces.use(loaded_module, library_interface(loaded_module))
+            continue
+
+        codegen_options = module_codegen_options(
+            loaded_module,
+            instrument,
+            file_attributes,
+            hot_reload,
+            upgrade_hooks,
+            optimize,
+            None if keep_functions is None else keep_functions[module],
+            source_root,
+        )
+        stamp = interfaces.stamp(loaded_module, codegen_options)
+        stored = interfaces.reusable(loaded_module, stamp)
+        if stored is not None:
+            cached = loaded_module in interfaces.restored
+            print(f"📦 {module} restored from cache" if cached else f"♻️ {module} is up to date")
+            for diagnostic in stored.get("diagnostics", []):
+                print(diagnostic)
+            runtime_modules.update(stored.get("runtime_modules", []))
+            if report is not None:
+                report.record(module, reused=True, cached=cached)
+            continue
+
+        with measure_phase(report, "semantic", module):
+            codegen = ErlangCodegen(
+                loaded_module.ast,
+                module_name=loaded_module.module_name,
+                external_functions=interfaces.external_functions(loaded_module),
+                **codegen_options,
+            )
+            codegen.collect_function_names_and_globals(loaded_module.ast)
+
+        # A validação semântica dos corpos acontece junto com a emissão.
+        with measure_phase(report, "codegen", module):
+            erlang_code = codegen.emit_module()
+            diagnostics = dropped_function_diagnostics(module, codegen, tree_shake=keep_functions is not None)
+            interfaces.add(
+                loaded_module,
+                build_interface(loaded_module, codegen),
+                stamp,
+                codegen.runtime_modules_used,
+                diagnostics,
+            )
+
+        sources.append((loaded_module, erlang_code))
+        runtime_modules |= codegen.runtime_modules_used
+        for diagnostic in diagnostics:
+            print(diagnostic)
+        if report is not None:
+            report.record(
+                module,
+                emitted_lines=erlang_code.count("\n") + 1,
+                dropped_functions=list(codegen.dropped_functions),
+            )
+
+    import_order = [module.source_name for module in loaded_modules]
+    sources.sort(key=lambda source: import_order.index(source[0].source_name))
+    return sources, sorted(runtime_modules)
+
+
+def dropped_function_diagnostics(module, codegen, tree_shake):
+    if not codegen.dropped_functions:
+        return []
+    dropped = ", ".join(f"{name}/{codegen.function_arities[name]}" for name in codegen.dropped_functions)
+    if tree_shake:
+        return [f"🌳 Tree shaking removed from {module}: {dropped}"]
+    return [f"⚠️ Unused private functions removed from {module}: {dropped}"]
+
+
+def generate_erlang_modules(entry_module, loaded_modules, outdir, report=None, **codegen_options):
+    sources, runtime_modules = emit_erlang_modules(loaded_modules, report=report, **codegen_options)
+
+    # Criar diretório target/ ou personalizado se não existir
+    os.makedirs(outdir, exist_ok=True)
+
+    generated_outputs = []
+    for loaded_module, erlang_code in sources:
+        output_path = os.path.join(outdir, f"{loaded_module.module_name}.erl")
+        with measure_phase(report, "write", loaded_module.source_name):
+            with open(output_path, "w", encoding="utf-8") as f:
+                f.write(erlang_code)
+        generated_outputs.append(output_path)
+
+        print(f"\n✅ Erlang file generated: {output_path}")
+        if loaded_module is entry_module and loaded_module.module_name != loaded_module.source_name:
+            print(f"ℹ️ Sanitized Erlang module name: {loaded_module.module_name}")
+
+    for runtime_module in runtime_modules:
+        output_path = os.path.join(outdir, f"{runtime_module}.erl")
+        shutil.copyfile(runtime_module_path(runtime_module), output_path)
+        generated_outputs.append(output_path)
+
+    return generated_outputs
+
+
+def compile_file(
+    source_path,
+    outdir="target",
+    beam=True,
+    report=None,
+    profile=None,
+    instrument=(),
+    file_attributes=True,
+    hot_reload=False,
+    upgrade_hooks=False,
+    optimize=0,
+    erlc_flags=(),
+    tree_shake=False,
+    jobs=1,
+    include_dirs=(),
+    lib_dirs=(),
+    incremental=True,
+    cache_dir=None,
+    cache_size=None,
+    parsed=None,
+):
+    """
+    Compila um arquivo .potion e todos os módulos importados por ele.
+
+    :param source_path: Caminho para o arquivo .potion de entrada
+    :param outdir: Diretório onde os arquivos .erl/.beam são gravados
+    :param beam: Quando False, para depois de gerar os arquivos .erl
+    :param report: BuildReport opcional que recebe tempos e contagens por fase
+    :param profile: CompilerProfile opcional; a compilação inteira roda sob o profiler
+    :param instrument: Tipos de instrumentação de runtime, por exemplo ("calls",)
+    :param file_attributes: Emite -file(...) apontando cada função para o .potion
+    :param hot_reload: Chamadas de cauda em cláusulas de receive viram ?MODULE:f(...)
+    :param upgrade_hooks: Loops de receive aceitam a mensagem potion_upgrade (implica hot_reload)
+    :param optimize: Nível de -O (0 a 3); controla o -compile([inline, ...]) gerado
+    :param erlc_flags: Flags repassadas ao erlc, por exemplo ("+deterministic",)
+    :param tree_shake: Gera só as funções e os módulos alcançáveis a partir de main/0
+    :param jobs: Número de processos usados para analisar os módulos importados (ignorado com profile)
+    :param include_dirs: Diretórios extras onde procurar módulos importados (-I)
+    :param lib_dirs: Diretórios de bibliotecas com .beam pré-compilado (--lib)
+    :param incremental: Reaproveita módulos cujo código, opções e interfaces importadas não mudaram
+    :param cache_dir: Cache de artefatos compartilhado (padrão: POTION_CACHE_DIR; sem ele, não há cache)
+    :param cache_size: Limite do cache, por exemplo "500M" (padrão: POTION_CACHE_SIZE ou 1 GB)
+    :param parsed: Dicionário caminho -> (hash, AST) reaproveitado entre compilações (usado pelo `potionc serve`)
+    :return: CompileResult com o módulo de entrada, os módulos carregados e os .erl gerados
+    """
+
+    codegen_options = {
+        "instrument": instrument,
+        "file_attributes": file_attributes,
+        "hot_reload": hot_reload,
+        "upgrade_hooks": upgrade_hooks,
+        "optimize": optimize,
+    }
+    build_options = {
+        "erlc_flags": list(erlc_flags),
+        "tree_shake": tree_shake,
+        # O cProfile só enxerga este processo.
+        "jobs": 1 if profile is not None else jobs,
+        "include_dirs": include_dirs,
+        "lib_dirs": lib_dirs,
+        "incremental": incremental,
+        "cache_dir": cache_dir,
+        "cache_size": cache_size,
+        "parsed": parsed,
+    }
+    if report is not None:
+        report.options.update(
+            optimize=optimize, erlc_flags=build_options["erlc_flags"], tree_shake=tree_shake
+        )
+    profiling = profile.running() if profile is not None else contextlib.nullcontext()
+    with profiling:
+        return _compile_file(source_path, outdir, beam, report, codegen_options, build_options)
+
+
+def _compile_file(source_path, outdir, beam, report, codegen_options, build_options):
+    erlc_flags = build_options["erlc_flags"]
+    tree_shake = build_options["tree_shake"]
+    if report is not None:
+        report.start()
+    try:
+        with measure_phase(report, "load_module_graph"):
+            entry_module, loaded_modules = load_program(
+                source_path,
+                outdir,
+                report,
+                build_options["jobs"],
+                build_options["include_dirs"],
+                build_options["lib_dirs"],
+                build_options["parsed"],
+            )
+
+        # Bibliotecas só são gravadas de volta quando compiladas com as opções padrão.
+        store_libraries = not (
+            tree_shake or codegen_options["instrument"] or codegen_options["hot_reload"] or codegen_options["upgrade_hooks"]
+        )
+        build_key = {
+            "beam": beam,
+            "erlc_flags": erlc_flags,
+            "compiler": compiler_fingerprint(),
+        }
+        codegen_options = {**codegen_options, "source_root": project_root(source_path)}
+        precompiled = precompiled_library_modules(loaded_modules, codegen_options, build_key) if beam else []
+        output_extensions = (".erl", ".beam") if beam else (".erl",)
+        interfaces = InterfaceStore(
+            outdir,
+            build_key=build_key,
+            output_extensions=output_extensions,
+            reuse=build_options["incremental"],
+            cache=ArtifactCache.configured(build_options["cache_dir"], build_options["cache_size"]),
+        )
+        codegen_options = {
+            **codegen_options,
+            "precompiled": {module.source_name for module in precompiled},
+            "interfaces": interfaces,
+        }
+
+        if tree_shake:
+            extra_roots = ("code_change",) if codegen_options["upgrade_hooks"] else ()
+            with measure_phase(report, "tree_shake"):
+                codegen_options = {
+                    **codegen_options,
+                    "keep_functions": reachable_module_functions(entry_module, loaded_modules, extra_roots),
+                }
+
+        generated_outputs = generate_erlang_modules(
+            entry_module, loaded_modules, outdir, report=report, **codegen_options
+        )
+
+        if beam and generated_outputs:
+            print("🔧 Compiling with erlc...")
+            with measure_phase(report, "erlc"):
+                result = subprocess.run(
+                    ["erlc", *erlc_flags, "-o", outdir, *generated_outputs], capture_output=True, text=True
+                )
+            if result.returncode != 0:
+                raise ErlcError(result.stderr)
+        # As interfaces vão para outdir antes de as bibliotecas serem guardadas com elas.
+        interfaces.commit()
+        if beam:
+            install_library_modules(loaded_modules, precompiled, outdir, store_libraries)
+
+        reused_outputs = [os.path.join(outdir, f"{module.module_name}.erl") for module in interfaces.reused]
+        return CompileResult(
+            entry_module,
+            loaded_modules,
+            generated_outputs + reused_outputs,
+            *collect_artifacts(loaded_modules, outdir, interfaces, codegen_options, precompiled),
+        )
+    finally:
+        if report is not None:
+            report.finish()
+
+
+def collect_artifacts(loaded_modules, outdir, interfaces, codegen_options, precompiled):
+    """Estado e arquivos gerados de cada módulo do build, para --depfile e --manifest."""
+    keep_functions = codegen_options.get("keep_functions")
+    precompiled_names = {module.source_name for module in precompiled}
+    restored_names = {module.source_name for module in interfaces.restored}
+    reused_names = {module.source_name for module in interfaces.reused}
+    artifacts = {}
+    runtime_modules = set()
+    for loaded_module in loaded_modules:
+        module = loaded_module.source_name
+        if keep_functions is not None and module not in keep_functions:
+            artifacts[module] = ModuleArtifacts("removed")
+        elif module in precompiled_names:
+            artifacts[module] = ModuleArtifacts("precompiled", [os.path.join(outdir, f"{loaded_module.module_name}.beam")])
+        else:
+            if module in restored_names:
+                status = "cached"
+            elif module in reused_names:
+                status = "reused"
+            else:
+                status = "generated"
+            used = interfaces.runtime_modules.get(module, [])
+            runtime_modules.update(used)
+            outputs = [*interfaces.output_paths(loaded_module), interfaces.interface_path(loaded_module)]
+            artifacts[module] = ModuleArtifacts(status, outputs, list(used))
+    runtime_artifacts = {
+        name: [os.path.join(outdir, f"{name}{extension}") for extension in interfaces.output_extensions]
+        for name in sorted(runtime_modules)
+    }
+    return artifacts, runtime_artifacts
+
+
+def load_program(source_path, outdir, report=None, jobs=1, include_dirs=(), lib_dirs=(), parsed=None, save_index=True):
+    """Carrega o grafo de módulos usando os caminhos de busca e o índice persistido em outdir.
+
+    Com save_index=False (--emit-ast) o índice é só lido e nada é gravado em outdir.
+    """
+    search_paths = module_search_paths(source_path, include_dirs, lib_dirs)
+    index = ModuleIndex.load(os.path.join(outdir, INDEX_FILE))
+    loaded = load_module_graph(
+        os.path.abspath(source_path),
+        report=report,
+        jobs=jobs,
+        search_paths=search_paths,
+        index=index,
+        parsed=parsed,
+    )
+    if save_index:
+        index.save()
+    return loaded
+
+
+def library_beam_path(loaded_module):
+    return os.path.join(os.path.dirname(loaded_module.file_path), f"{loaded_module.module_name}.beam")
+
+
+def library_interface_path(loaded_module):
+    return os.path.join(os.path.dirname(loaded_module.file_path), f"{loaded_module.module_name}{INTERFACE_EXTENSION}")
+
+
+def library_interface(loaded_module):
+    return read_interface(library_interface_path(loaded_module)) or ast_interface(loaded_module)
+
+
+def precompiled_library_modules(loaded_modules, codegen_options, build_key):
+    """Bibliotecas com um .beam ao lado do .potion gerado do mesmo código, com as mesmas opções de codegen e a mesma chave de build.
+
+    O carimbo vem do .potioni guardado junto com o .beam; sem ele, o .beam não é usado.
+    O tree shaking fica de fora da comparação: o .beam completo serve a qualquer programa.
+    """
+    precompiled = []
+    for loaded_module in loaded_modules:
+        if not loaded_module.library or not os.path.isfile(library_beam_path(loaded_module)):
+            continue
+        stored = read_interface(library_interface_path(loaded_module))
+        stamp = stored.get("stamp") if stored is not None else None
+        if (
+            stamp is not None
+            and stamp.get("source_hash") == loaded_module.source_hash
+            and stamp.get("options") == module_codegen_options(loaded_module, **codegen_options)
+            and stamp.get("build") == build_key
+        ):
+            precompiled.append(loaded_module)
+    return precompiled
+
+
+def install_library_modules(loaded_modules, precompiled, outdir, store):
+    """Copia os .beam pré-compilados para outdir e, com store, guarda na biblioteca os recém-compilados."""
+    installed = []
+    for loaded_module in precompiled:
+        output_path = os.path.join(outdir, f"{loaded_module.module_name}.beam")
+        shutil.copyfile(library_beam_path(loaded_module), output_path)
+        installed.append(output_path)
+
+    for loaded_module in loaded_modules:
+        beam_path = os.path.join(outdir, f"{loaded_module.module_name}.beam")
+        if not store or not loaded_module.library or loaded_module in precompiled or not os.path.isfile(beam_path):
+            continue
+        try:
+            shutil.copyfile(beam_path, library_beam_path(loaded_module))
+            interface_path = os.path.join(outdir, f"{loaded_module.module_name}{INTERFACE_EXTENSION}")
+            if os.path.isfile(interface_path):
+                shutil.copyfile(interface_path, library_interface_path(loaded_module))
+            print(f"📚 Stored library module {loaded_module.source_name} in {os.path.dirname(loaded_module.file_path)}")
+        except OSError as e:
+            print(f"⚠️ Could not store library module {loaded_module.source_name}: {e}")
+    return installed
+
+
+def compile_runtime_module(module_name, outdir):
+    """Compila um módulo de codegen/runtime (driver de profile, bench etc.) em outdir."""
+    result = subprocess.run(
+        ["erlc", "-o", outdir, runtime_module_path(module_name)],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise ErlcError(result.stderr)
+
+
+def run_in_runner(outdir, module_name, instrument):
+    """Executa main/0 no nó persistente de outdir, recarregando só os .beam alterados."""
+    client = RunnerClient.connect_or_start(outdir, code_paths=(outdir,))
+    with client:
+        reloaded = client.load_directory(outdir)
+        if reloaded:
+            print(f"♻️ Reloaded: {', '.join(reloaded)}")
+        runtime_modules = [INSTRUMENT_RUNTIME_MODULES[kind] for kind in instrument]
+        calls = [
+            *((runtime_module, "reset") for runtime_module in runtime_modules),
+            (module_name, "main"),
+            *((runtime_module, "report") for runtime_module in runtime_modules),
+        ]
+        print(client.run(calls).output, end="")
+
+
+def emit_build_report(report, args):
+    if report is None:
+        return
+    if args.time_passes:
+        print("\n⏱️ Time passes:")
+        print(report.format_table())
+    if args.build_report:
+        report.write_json(args.build_report)
+        print(f"📝 Build report written to {args.build_report}")
+
+
+def emit_build_outputs(result, args):
+    if args.depfile:
+        write_depfile(args.depfile, result)
+        print(f"📝 Depfile written to {args.depfile}")
+    if args.manifest:
+        path = manifest_path(args.outdir)
+        write_manifest(path, result)
+        print(f"📝 Build manifest written to {path}")
+
+
+def emit_profile(profile, args):
+    if profile is None:
+        return
+    if args.profile:
+        profile.dump(args.profile)
+        print(f"📝 Profile written to {args.profile}")
+    if args.profile_top:
+        print(f"\n🔥 Hot spots by subsystem (top {args.profile_top}):")
+        print(profile.format_summary(args.profile_top))
+
+
+def parse_instrument_kinds(values):
+    kinds = []
+    for value in values or []:
+        for kind in value.split(","):
+            kind = kind.strip()
+            if kind not in INSTRUMENT_KINDS:
+                raise argparse.ArgumentTypeError(
+                    f"unknown instrumentation '{kind}' (expected one of: {', '.join(INSTRUMENT_KINDS)})"
+                )
+            kinds.append(kind)
+    return tuple(dict.fromkeys(kinds))
+
+
+SUBCOMMANDS = {
+    "bench": "cli.bench",
+    "cache": "cli.artifact_cache",
+    "profile": "cli.beam_profile",
+    "runner": "cli.runner",
+    "serve": "cli.server",
+}
+
+
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] in SUBCOMMANDS:
+        subcommand = importlib.import_module(SUBCOMMANDS[sys.argv[1]])
+        sys.exit(subcommand.main(sys.argv[2:]))
+
     parser = argparse.ArgumentParser(
         description="Potion Compiler - Compile .potion files to Erlang"
     )
@@ -14,9 +566,118 @@ def main():
     parser.add_argument("--emit-ast", action="store_true", help="Print AST instead of compiling")
     parser.add_argument("--no-beam", action="store_true", help="Skip compilation to .beam")
     parser.add_argument("--run", action="store_true", help="Run the compiled module (calls main/0)")
+    parser.add_argument(
+        "--runner",
+        action="store_true",
+        help="With --run, use a persistent BEAM node that hot-reloads changed modules (see `potionc runner`)",
+    )
     parser.add_argument("--outdir", default="target", help="Output directory [default: target/]")
+    parser.add_argument("--time-passes", action="store_true", help="Print per-module, per-phase timings and memory")
+    parser.add_argument("--build-report", metavar="PATH", help="Write per-phase timings and memory as JSON")
+    parser.add_argument(
+        "--depfile",
+        metavar="PATH",
+        help="Write a Make-format depfile listing each generated file and the .potion files it was built from",
+    )
+    parser.add_argument(
+        "--manifest",
+        choices=MANIFEST_FORMATS,
+        help="Write the module graph, Erlang module names and artifact paths to <outdir>/potion-manifest.json",
+    )
+    parser.add_argument("--profile", metavar="PATH", help="Run the compile under cProfile and write the stats file")
+    parser.add_argument("--profile-top", type=int, metavar="N", help="Print the N hottest functions per compiler subsystem")
+    parser.add_argument(
+        "--no-file-attributes",
+        action="store_true",
+        help="Do not emit -file attributes mapping generated functions back to .potion lines",
+    )
+    parser.add_argument(
+        "-O",
+        dest="optimize",
+        type=int,
+        choices=sorted(OPTIMIZATION_LEVELS),
+        default=0,
+        help="Optimization level: emits -compile([inline, {inline_size, N}]) for 1-3 [default: 0]",
+    )
+    parser.add_argument(
+        "--erlc-flag",
+        action="append",
+        default=[],
+        metavar="FLAG",
+        help="Pass a flag to erlc, e.g. --erlc-flag=+warnings_as_errors (repeatable)",
+    )
+    parser.add_argument(
+        "--deterministic",
+        action="store_true",
+        help="Build reproducible .beam files (erlc +deterministic)",
+    )
+    parser.add_argument(
+        "-I",
+        dest="include_dirs",
+        action="append",
+        default=[],
+        metavar="DIR",
+        help="Also look for imported modules in DIR (repeatable; see also POTION_PATH and potion.json)",
+    )
+    parser.add_argument(
+        "--lib",
+        dest="lib_dirs",
+        action="append",
+        default=[],
+        metavar="DIR",
+        help="Library directory whose modules are compiled once and reused as .beam files (repeatable)",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Parse imported modules in up to N processes when the sources add up to 256 KiB or more [default: 1]",
+    )
+    parser.add_argument(
+        "--no-incremental",
+        action="store_true",
+        help="Regenerate every module even when its source, options and imported interfaces are unchanged",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        metavar="DIR",
+        help="Shared artifact cache; unchanged modules are copied from it instead of compiled [default: $POTION_CACHE_DIR]",
+    )
+    parser.add_argument(
+        "--cache-size",
+        metavar="SIZE",
+        help="Evict least recently used cache entries above SIZE, e.g. 500M or 2G [default: $POTION_CACHE_SIZE or 1 GB]",
+    )
+    parser.add_argument(
+        "--tree-shake",
+        action="store_true",
+        help="Only generate the functions and modules reachable from main/0",
+    )
+    parser.add_argument(
+        "--hot-reload",
+        action="store_true",
+        help="Emit tail calls at the end of receive clauses as ?MODULE:f(...) so loops pick up reloaded code",
+    )
+    parser.add_argument(
+        "--upgrade-hooks",
+        action="store_true",
+        help="Let receive loops handle a potion_upgrade message through code_change/2 (implies --hot-reload)",
+    )
+    parser.add_argument(
+        "--instrument",
+        action="append",
+        metavar="KIND",
+        help=f"Instrument generated code ({', '.join(INSTRUMENT_KINDS)}); may be repeated or comma-separated",
+    )
 
     args = parser.parse_args()
+    try:
+        instrument = parse_instrument_kinds(args.instrument)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+    erlc_flags = [*args.erlc_flag, *(["+deterministic"] if args.deterministic else [])]
     input_path = args.source
     abs_path = os.path.abspath(input_path)
 
@@ -28,61 +689,72 @@ def main():
         print("Error: the file must have the extension .potion")
         sys.exit(1)
 
-    filename = os.path.basename(abs_path)
-    source_module_name = os.path.splitext(filename)[0]
+    report = BuildReport() if args.time_passes or args.build_report else None
+    profile = CompilerProfile() if args.profile or args.profile_top else None
 
     try:
-        entry_module, loaded_modules = load_module_graph(abs_path)
-        module_name = entry_module.module_name
-
         if args.emit_ast:
+            entry_module, _ = load_program(
+                abs_path,
+                args.outdir,
+                jobs=args.jobs,
+                include_dirs=args.include_dirs,
+                lib_dirs=args.lib_dirs,
+                save_index=False,
+            )
             print("📦 AST:")
             print(entry_module.ast)
             return
 
-        modules_by_source_name = {module.source_name: module for module in loaded_modules}
-
-        # Criar diretório target/ ou personalizado se não existir
-        os.makedirs(args.outdir, exist_ok=True)
-
-        generated_outputs = []
-        for loaded_module in loaded_modules:
-            external_functions = build_external_function_map(loaded_module, modules_by_source_name)
-            codegen = ErlangCodegen(
-                loaded_module.ast,
-                module_name=loaded_module.module_name,
-                external_functions=external_functions,
-            )
-            erlang_code = codegen.generate()
-
-            output_path = os.path.join(args.outdir, f"{loaded_module.module_name}.erl")
-            with open(output_path, "w", encoding="utf-8") as f:
-                f.write(erlang_code)
-            generated_outputs.append(output_path)
-
-            print(f"\n✅ Erlang file generated: {output_path}")
-            if loaded_module is entry_module and loaded_module.module_name != source_module_name:
-                print(f"ℹ️ Sanitized Erlang module name: {loaded_module.module_name}")
+        result = compile_file(
+            abs_path,
+            outdir=args.outdir,
+            beam=not args.no_beam,
+            report=report,
+            profile=profile,
+            instrument=instrument,
+            file_attributes=not args.no_file_attributes,
+            hot_reload=args.hot_reload,
+            upgrade_hooks=args.upgrade_hooks,
+            optimize=args.optimize,
+            erlc_flags=erlc_flags,
+            tree_shake=args.tree_shake,
+            jobs=args.jobs,
+            include_dirs=args.include_dirs,
+            lib_dirs=args.lib_dirs,
+            incremental=not args.no_incremental,
+            cache_dir=args.cache_dir,
+            cache_size=args.cache_size,
+        )
+        module_name = result.entry_module.module_name
+        emit_build_outputs(result, args)
 
         if not args.no_beam:
-            print("🔧 Compiling with erlc...")
-            result = subprocess.run(["erlc", "-o", args.outdir, *generated_outputs], capture_output=True, text=True)
-
-            if result.returncode != 0:
-                print("❌ erlc compilation failed:")
-                print(result.stderr)
-                sys.exit(1)
-
             beam_path = os.path.join(args.outdir, f"{module_name}.beam")
             print(f"✅ Compilation successful! BEAM file: {beam_path}")
 
             if args.run:
                 print("🚀 Running main/0...\n")
-                os.system(f'erl -noshell -pa {args.outdir} -eval "{module_name}:main(), halt()."')
+                if args.runner:
+                    run_in_runner(args.outdir, module_name, instrument)
+                else:
+                    report_calls = "".join(f"{INSTRUMENT_RUNTIME_MODULES[kind]}:report(), " for kind in instrument)
+                    os.system(f'erl -noshell -pa {args.outdir} -eval "{module_name}:main(), {report_calls}halt()."')
 
+    except ErlcError as e:
+        print("❌ erlc compilation failed:")
+        print(e.stderr)
+        sys.exit(1)
+    except RunnerError as e:
+        print(e.output, end="")
+        print(f"❌ {e}")
+        sys.exit(1)
     except Exception as e:
         print(f"Error compiling file: {e}")
         sys.exit(1)
+    finally:
+        emit_build_report(report, args)
+        emit_profile(profile, args)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,94 @@
+import contextlib
+import cProfile
+import os
+import pstats
+
+SUBSYSTEMS = ["lexer", "parser", "semantic", "codegen", "loader", "cli", "other"]
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_LOADER_FILES = {"module_loader.py", "parse_potion_file.py"}
+
+
+def classify_subsystem(filename):
+    """Map a profiled function's source file to the compiler subsystem it belongs to."""
+    # cProfile reports builtins with "~" and generated code with "<...>".
+    if filename == "~" or filename.startswith("<") or not os.path.isabs(filename):
+        return "other"
+    if not filename.startswith(_ROOT + os.sep):
+        return "other"
+    package, _, rest = os.path.relpath(filename, _ROOT).partition(os.sep)
+    if package == "cli":
+        return "loader" if rest in _LOADER_FILES else "cli"
+    if package in SUBSYSTEMS:
+        return package
+    return "other"
+
+
+def _display_path(filename):
+    if filename.startswith(_ROOT + os.sep):
+        return os.path.relpath(filename, _ROOT)
+    return filename
+
+
+class CompilerProfile:
+    """cProfile wrapper used by `potionc --profile` and `compile_file(profile=...)`.
+
+    The standard library has no sampling profiler, so the deterministic
+    profiler is used. Hot spots are grouped by compiler subsystem based on
+    the file each function lives in.
+    """
+
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+
+    @contextlib.contextmanager
+    def running(self):
+        self.profiler.enable()
+        try:
+            yield self
+        finally:
+            self.profiler.disable()
+
+    def stats(self):
+        return pstats.Stats(self.profiler)
+
+    def dump(self, path):
+        self.profiler.dump_stats(path)
+
+    def summary(self, top=10):
+        """Return {subsystem: {"self_seconds", "calls", "functions"}} with the
+        `top` functions by self time in each subsystem."""
+        groups = {}
+        for (filename, line, function), (_, calls, self_time, cumulative, _) in self.stats().stats.items():
+            group = groups.setdefault(
+                classify_subsystem(filename),
+                {"self_seconds": 0.0, "calls": 0, "functions": []},
+            )
+            group["self_seconds"] += self_time
+            group["calls"] += calls
+            group["functions"].append({
+                "function": function,
+                "location": f"{_display_path(filename)}:{line}",
+                "calls": calls,
+                "self_seconds": self_time,
+                "cumulative_seconds": cumulative,
+            })
+
+        for group in groups.values():
+            group["functions"].sort(key=lambda entry: entry["self_seconds"], reverse=True)
+            del group["functions"][top:]
+        return {name: groups[name] for name in SUBSYSTEMS if name in groups}
+
+    def format_summary(self, top=10):
+        summary = self.summary(top)
+        total = sum(group["self_seconds"] for group in summary.values()) or 1.0
+        lines = []
+        for name, group in summary.items():
+            share = group["self_seconds"] / total * 100
+            lines.append(f"{name}: {group['self_seconds'] * 1000:.2f} ms self ({share:.1f}%), {group['calls']} calls")
+            for entry in group["functions"]:
+                lines.append(
+                    f"    {entry['self_seconds'] * 1000:9.2f} ms self {entry['cumulative_seconds'] * 1000:9.2f} ms cum"
+                    f" {entry['calls']:>8}  {entry['function']} ({entry['location']})"
+                )
+        return "\n".join(lines)
@@ -0,0 +1,205 @@
+import argparse
+import glob
+import os
+import socket
+import struct
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+
+PORT_FILE = ".potion_runner"
+RUNNER_MODULE = "potion_runner"
+
+
+class RunnerError(Exception):
+    def __init__(self, reason, output=""):
+        super().__init__(f"runner error: {reason}")
+        self.reason = reason
+        self.output = output
+
+
+@dataclass
+class RunResult:
+    value: str
+    output: str
+
+
+def port_file_path(state_dir):
+    return os.path.join(state_dir, PORT_FILE)
+
+
+class RunnerClient:
+    """Client for the persistent BEAM node in codegen/runtime/potion_runner.erl.
+
+    The node keeps running between builds: `load_directory` pushes only the
+    .beam files whose code changed, and `run` calls functions without
+    booting a new VM.
+    """
+
+    def __init__(self, port, process=None, timeout=30):
+        self.process = process
+        self.socket = socket.create_connection(("127.0.0.1", port), timeout=timeout)
+
+    @classmethod
+    def start(cls, state_dir, code_paths=(), startup_timeout=10):
+        # Importado aqui para evitar import circular com cli.potionc.
+        from cli.potionc import compile_runtime_module
+
+        os.makedirs(state_dir, exist_ok=True)
+        compile_runtime_module(RUNNER_MODULE, state_dir)
+        port_path = port_file_path(state_dir)
+        if os.path.exists(port_path):
+            os.remove(port_path)
+
+        paths = [arg for path in (state_dir, *code_paths) for arg in ("-pa", path)]
+        escaped = os.path.abspath(port_path).replace("\\", "\\\\").replace('"', '\\"')
+        process = subprocess.Popen(
+            ["erl", "-noshell", *paths, "-eval", f'{RUNNER_MODULE}:start("{escaped}").'],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        deadline = time.monotonic() + startup_timeout
+        while time.monotonic() < deadline:
+            port = read_port(port_path)
+            if port is not None:
+                return cls(port, process=process)
+            if process.poll() is not None:
+                raise RunnerError(f"runner exited with status {process.returncode} during startup")
+            time.sleep(0.05)
+        process.kill()
+        raise RunnerError("runner did not start in time")
+
+    @classmethod
+    def connect(cls, state_dir):
+        """Connect to the runner whose port file is in state_dir, or return None."""
+        port = read_port(port_file_path(state_dir))
+        if port is None:
+            return None
+        client = None
+        try:
+            client = cls(port)
+            client.ping()
+            return client
+        except (OSError, RunnerError):
+            # Porta velha ou algo que não responde como o runner: quem chama sobe outro.
+            if client is not None:
+                client.close()
+            os.remove(port_file_path(state_dir))
+            return None
+
+    @classmethod
+    def connect_or_start(cls, state_dir, code_paths=()):
+        return cls.connect(state_dir) or cls.start(state_dir, code_paths)
+
+    def request(self, *fields):
+        payload = "\t".join(str(field) for field in fields).encode("utf-8")
+        self.socket.sendall(struct.pack(">I", len(payload)) + payload)
+        (size,) = struct.unpack(">I", self._recv_exact(4))
+        reply = self._recv_exact(size)
+        status, value_size, rest = reply.split(b"\t", 2)
+        value_size = int(value_size)
+        value = rest[:value_size].decode("utf-8")
+        output = rest[value_size:].decode("utf-8")
+        if status != b"ok":
+            raise RunnerError(value, output)
+        return RunResult(value, output)
+
+    def _recv_exact(self, size):
+        chunks = []
+        while size:
+            chunk = self.socket.recv(size)
+            if not chunk:
+                raise RunnerError("connection closed by runner")
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b"".join(chunks)
+
+    def ping(self):
+        return self.request("ping").value == "pong"
+
+    def load(self, module_name, beam_path):
+        """Load a .beam into the runner; returns "loaded" or "unchanged"."""
+        return self.request("load", module_name, os.path.abspath(beam_path)).value
+
+    def load_directory(self, directory):
+        """Push every .beam in directory and return the modules that changed."""
+        loaded = []
+        for beam_path in sorted(glob.glob(os.path.join(directory, "*.beam"))):
+            module_name = os.path.splitext(os.path.basename(beam_path))[0]
+            if module_name == RUNNER_MODULE:
+                continue
+            if self.load(module_name, beam_path) == "loaded":
+                loaded.append(module_name)
+        return loaded
+
+    def run(self, calls, timeout_ms=0):
+        """Call each (module, function) pair in order; returns the last value and all output."""
+        return self.request("run", timeout_ms, *(f"{module}:{function}" for module, function in calls))
+
+    def stop(self):
+        try:
+            self.request("stop")
+        finally:
+            self.close()
+        if self.process is not None:
+            self.process.wait(timeout=10)
+
+    def close(self):
+        self.socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_port(port_path):
+    try:
+        with open(port_path, "r", encoding="utf-8") as f:
+            content = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return int(content) if content.isdigit() else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="potionc runner",
+        description="Manage the persistent BEAM node used by `potionc --run --runner`",
+    )
+    parser.add_argument("action", choices=("start", "status", "stop"))
+    parser.add_argument("--outdir", default="target", help="Output directory the runner serves [default: target/]")
+    args = parser.parse_args(argv)
+
+    try:
+        client = RunnerClient.connect(args.outdir)
+        if args.action == "start":
+            if client is None:
+                client = RunnerClient.start(args.outdir, code_paths=(args.outdir,))
+                print(f"🚀 Runner started for {args.outdir}")
+            else:
+                print(f"ℹ️ Runner already running for {args.outdir}")
+            client.close()
+        elif args.action == "status":
+            if client is None:
+                print(f"Runner is not running for {args.outdir}")
+                return 1
+            print(f"✅ Runner is running for {args.outdir}")
+            client.close()
+        elif client is not None:
+            client.stop()
+            print(f"🛑 Runner stopped for {args.outdir}")
+        else:
+            print(f"Runner is not running for {args.outdir}")
+    except Exception as e:
+        print(f"Error: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,261 @@
+import argparse
+import contextlib
+import inspect
+import io
+import json
+import os
+import re
+import sys
+
+from parser.potion_parser import ASTNode
+
+from cli.build_manifest import build_manifest
+from cli.interface import InterfaceStore
+from cli.module_index import ModuleIndex, module_search_paths
+from cli.module_loader import dependency_order, load_module_graph
+from cli.parse_potion_file import parse_potion_source
+from cli.potionc import ErlcError, compile_file, emit_erlang_modules
+
+# Códigos do JSON-RPC 2.0; -32000 fica na faixa reservada para erros do servidor.
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+COMPILE_ERROR = -32000
+
+COMPILE_OPTIONS = (
+    "outdir",
+    "beam",
+    "instrument",
+    "file_attributes",
+    "hot_reload",
+    "upgrade_hooks",
+    "optimize",
+    "erlc_flags",
+    "tree_shake",
+    "jobs",
+    "include_dirs",
+    "lib_dirs",
+    "incremental",
+    "cache_dir",
+    "cache_size",
+)
+LINE_RE = re.compile(r"\bline (\d+)")
+
+
+class RpcError(Exception):
+    def __init__(self, code, message, data=None):
+        super().__init__(message)
+        self.code = code
+        self.data = data
+
+
+def ast_to_json(node):
+    if isinstance(node, ASTNode):
+        return {"node": type(node).__name__, **{name: ast_to_json(value) for name, value in vars(node).items()}}
+    if isinstance(node, (list, tuple)):
+        return [ast_to_json(item) for item in node]
+    if isinstance(node, dict):
+        return [[ast_to_json(key), ast_to_json(value)] for key, value in node.items()]
+    if node is None or isinstance(node, (bool, int, float, str)):
+        return node
+    return str(node)
+
+
+def error_diagnostic(error, path=None):
+    match = LINE_RE.search(str(error))
+    return {
+        "severity": "error",
+        "path": path,
+        "line": int(match.group(1)) if match else None,
+        "message": str(error),
+    }
+
+
+def warning_diagnostics(loaded_modules, generated):
+    diagnostics = []
+    for loaded_module in loaded_modules:
+        record = generated.get(loaded_module.file_path)
+        for message in record["diagnostics"] if record is not None else []:
+            diagnostics.append({"severity": "warning", "path": loaded_module.file_path, "line": None, "message": message})
+    return diagnostics
+
+
+class CompilerServer:
+    """Estado do `potionc serve` entre requisições.
+
+    As ASTs ficam em `parsed` pelo hash do texto de cada arquivo, e as
+    interfaces que `check` gera ficam em `generated` com o carimbo usado nos
+    builds incrementais. Uma requisição só analisa de novo os arquivos que
+    mudaram e só regenera os módulos cujo código ou interfaces importadas
+    mudaram. `compile` grava em disco como o `potionc` e reaproveita os
+    .potioni do outdir.
+    """
+
+    def __init__(self):
+        self.parsed = {}
+        self.generated = {}
+        self.index = ModuleIndex()
+        self.running = True
+        self.methods = {
+            "compile": self.compile,
+            "check": self.check,
+            "diagnostics": self.diagnostics,
+            "emit-ast": self.emit_ast,
+            "shutdown": self.shutdown,
+        }
+
+    def load(self, path, text=None, include_dirs=(), lib_dirs=()):
+        path = os.path.abspath(path)
+        return load_module_graph(
+            path,
+            search_paths=module_search_paths(path, include_dirs, lib_dirs),
+            index=self.index,
+            parsed=self.parsed,
+            overlays={path: text} if text is not None else None,
+        )
+
+    def check(self, path, text=None, include_dirs=(), lib_dirs=()):
+        """Analisa e gera o programa sem gravar nada; text substitui o conteúdo de path."""
+        interfaces = InterfaceStore(memory=self.generated)
+        loaded_modules = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            try:
+                _, loaded_modules = self.load(path, text, include_dirs, lib_dirs)
+                emit_erlang_modules(loaded_modules, interfaces=interfaces)
+            except Exception as e:
+                errors = [error_diagnostic(e, self.failed_path(path, text, loaded_modules, interfaces))]
+            else:
+                errors = []
+
+        reused = {module.source_name for module in interfaces.reused}
+        return {
+            "ok": not errors,
+            "diagnostics": errors + warning_diagnostics(loaded_modules, self.generated),
+            "modules": {
+                module.source_name: "reused" if module.source_name in reused else "generated"
+                for module in loaded_modules
+                if module.source_name in interfaces.interfaces
+            },
+        }
+
+    @staticmethod
+    def failed_path(path, text, loaded_modules, interfaces):
+        if not loaded_modules:
+            # O grafo nem foi carregado: o erro é do buffer se ele sozinho não passa no parser.
+            if text is None:
+                return None
+            try:
+                parse_potion_source(text, path)
+            except Exception:
+                return os.path.abspath(path)
+            return None
+        # O primeiro módulo, em ordem de dependência, sem interface é o que falhou.
+        return next(
+            (
+                module.file_path
+                for module in dependency_order(loaded_modules)
+                if module.source_name not in interfaces.interfaces
+            ),
+            None,
+        )
+
+    def diagnostics(self, path, text, include_dirs=(), lib_dirs=()):
+        """Diagnósticos de um buffer ainda não salvo."""
+        return self.check(path, text, include_dirs, lib_dirs)["diagnostics"]
+
+    def emit_ast(self, path, text=None, include_dirs=(), lib_dirs=()):
+        try:
+            entry_module, _ = self.load(path, text, include_dirs, lib_dirs)
+        except Exception as e:
+            raise RpcError(COMPILE_ERROR, str(e), {"diagnostics": [error_diagnostic(e)]})
+        return {"ast": ast_to_json(entry_module.ast)}
+
+    def compile(self, path, **options):
+        unknown = sorted(set(options) - set(COMPILE_OPTIONS))
+        if unknown:
+            raise RpcError(INVALID_PARAMS, f"Unknown compile options: {', '.join(unknown)}")
+        log = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(log):
+                result = compile_file(os.path.abspath(path), parsed=self.parsed, **options)
+        except ErlcError as e:
+            raise RpcError(COMPILE_ERROR, "erlc compilation failed", {"stderr": e.stderr, "log": log.getvalue()})
+        except Exception as e:
+            raise RpcError(COMPILE_ERROR, str(e), {"diagnostics": [error_diagnostic(e)], "log": log.getvalue()})
+        return {
+            "outputs": result.outputs,
+            "modules": build_manifest(result)["modules"],
+            "log": log.getvalue(),
+        }
+
+    def shutdown(self):
+        self.running = False
+        return None
+
+    def handle(self, request):
+        """Responde a uma requisição JSON-RPC já decodificada; notificações (sem id) não têm resposta."""
+        request_id = request.get("id") if isinstance(request, dict) else None
+        try:
+            if not isinstance(request, dict) or request.get("jsonrpc") != "2.0" or "method" not in request:
+                raise RpcError(INVALID_REQUEST, "Invalid request")
+            method = self.methods.get(request["method"])
+            if method is None:
+                raise RpcError(METHOD_NOT_FOUND, f"Method not found: {request['method']}")
+            params = request.get("params", {})
+            if not isinstance(params, dict):
+                raise RpcError(INVALID_PARAMS, "params must be an object")
+            try:
+                inspect.signature(method).bind(**params)
+            except TypeError as e:
+                raise RpcError(INVALID_PARAMS, str(e))
+            result = method(**params)
+        except RpcError as e:
+            error = {"code": e.code, "message": str(e)}
+            if e.data is not None:
+                error["data"] = e.data
+            response = {"jsonrpc": "2.0", "id": request_id, "error": error}
+        except Exception as e:
+            # Um erro dentro do método é bug do compilador, não dos parâmetros.
+            error = {"code": INTERNAL_ERROR, "message": f"Internal error: {type(e).__name__}: {e}"}
+            response = {"jsonrpc": "2.0", "id": request_id, "error": error}
+        else:
+            response = {"jsonrpc": "2.0", "id": request_id, "result": result}
+        notification = isinstance(request, dict) and "id" not in request and "method" in request
+        return None if notification else response
+
+
+def serve(server, input_stream, output_stream):
+    """Lê uma requisição JSON por linha e escreve cada resposta numa linha, até shutdown ou fim da entrada."""
+    for line in input_stream:
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as e:
+            response = {"jsonrpc": "2.0", "id": None, "error": {"code": PARSE_ERROR, "message": f"Parse error: {e}"}}
+        else:
+            response = server.handle(request)
+        if response is not None:
+            output_stream.write(json.dumps(response) + "\n")
+            output_stream.flush()
+        if not server.running:
+            break
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="potionc serve",
+        description=(
+            "Keep the compiler running and answer JSON-RPC 2.0 requests on stdin, one per line "
+            "(methods: compile, check, diagnostics, emit-ast, shutdown)"
+        ),
+    )
+    parser.parse_args(argv)
+    serve(CompilerServer(), sys.stdin, sys.stdout)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,17 @@
+import os
+import re
+
 from parser.potion_parser import *
-from semantic.potion_semantic import DynamicValue, PidValue, SemanticAnalyzer, UNKNOWN
+from semantic.call_graph import has_single_path, module_functions, public_functions, reachable_functions, uses_visibility
+from semantic.potion_semantic import (
+    DynamicValue,
+    PidValue,
+    SemanticAnalyzer,
+    TABLE_BUILTINS,
+    TABLE_FOLD_CALLBACK_ARITY,
+    TYPE_MAP,
+    UNKNOWN,
+)
 
 RESERVED_WORDS = {
     "true": "true",
@@ -24,21 +36,80 @@ ERLANG_RESERVED_ATOMS = {
     "when",
 }
 
+RUNTIME_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "runtime")
+INSTRUMENT_KINDS = ("calls", "messages")
+INSTRUMENT_IMPL_SUFFIX = "__potion_impl"
+GENERATED_FILE_MARKER = "%% potion: generated file marker"
+# Marca o início do código de cada statement com a linha do .potion; as
+# strings do Potion não atravessam linhas nem contêm NUL.
+SOURCE_LINE_MARKER = "\0potion-line:{}\0"
+SOURCE_LINE_MARKER_RE = re.compile(r"\0potion-line:(\d+)\0")
+FILE_ATTRIBUTE_RE = re.compile(r'^-file\(".*", (\d+)\)\.$')
+# Opções de -compile por nível de -O. O inline do compilador Erlang só
+# atua em chamadas locais para funções menores que inline_size.
+OPTIMIZATION_LEVELS = {
+    0: [],
+    1: ["inline", "{inline_size, 24}"],
+    2: ["inline", "{inline_size, 48}", "inline_list_funcs"],
+    3: ["inline", "{inline_size, 96}", "inline_list_funcs"],
+}
+UPGRADE_MESSAGE_TAG = "potion_upgrade"
+UPGRADED_MESSAGE_TAG = "potion_upgraded"
+
+
+def runtime_module_path(module_name):
+    return os.path.join(RUNTIME_DIR, f"{module_name}.erl")
+
+
 class ErlangCodegen(SemanticAnalyzer):
     RECEIVE_EXTRA_FIELDS = ["reply_to"]
 
-    def __init__(self, ast, module_name="module_name", external_functions=None):
+    def __init__(
+        self,
+        ast,
+        module_name="module_name",
+        external_functions=None,
+        instrument=(),
+        source_path=None,
+        hot_reload=False,
+        upgrade_hooks=False,
+        optimize=0,
+        keep_functions=None,
+    ):
         super().__init__()
+        unknown = set(instrument) - set(INSTRUMENT_KINDS)
+        if unknown:
+            raise Exception(f"Instrumentação desconhecida: {', '.join(sorted(unknown))}")
+        if optimize not in OPTIMIZATION_LEVELS:
+            raise Exception(f"Nível de otimização desconhecido: {optimize}")
         self.ast = ast
         self.lines = []
         self.module_name = module_name
         self.function_names = []
         self.global_vars = []
         self.uses_to_string_builtin = False
+        self.table_helpers_used = set()
         self.external_functions = external_functions or {}
         self.pattern_binding_scopes = []
         self.pattern_binding_counter = 0
         self.pattern_binding_bases = set()
+        self.instrument = frozenset(instrument)
+        self.runtime_modules_used = set()
+        self.current_function = None
+        self.received_message_counter = 0
+        self.source_path = source_path
+        # Hooks de upgrade só fazem sentido se o loop entra no código novo.
+        self.hot_reload = hot_reload or upgrade_hooks
+        self.upgrade_hooks = upgrade_hooks
+        self.qualified_tail_calls = set()
+        self.extra_exports = []
+        self.uses_code_change_helper = False
+        self.optimize = optimize
+        self.public_function_names = set()
+        self.emitted_function_names = set()
+        self.dropped_functions = []
+        # Com tree shaking o CLI já sabe quais funções o programa alcança.
+        self.keep_functions = None if keep_functions is None else set(keep_functions)
 
     def emit_name(self, name):
         for scope in reversed(self.pattern_binding_scopes):
@@ -48,19 +119,160 @@ class ErlangCodegen(SemanticAnalyzer):
 
     def generate(self) -> str:
         self.collect_function_names_and_globals(self.ast)
+        return self.emit_module()
 
+    def emit_module(self) -> str:
+        self.resolve_visibility()
         self.lines.append(f"-module({self.module_name}).")
-        exported = ", ".join(f"{name}/{self.function_arities[name]}" for name in self.function_names)
-        self.lines.append(f"-export([{exported}]).\n")
+        export_index = len(self.lines)
+        instrument_init_index = export_index + 1
+        self.lines.append("")
 
         # Define variáveis globais
         for var_name, value in self.global_vars:
             self.lines.append(f"-define({var_name.upper()}, {value}).")
 
         self.visit(self.ast)
+        self.lines[instrument_init_index:instrument_init_index] = self.instrumentation_init_lines()
+        header = [f"-export([{', '.join(self.exported_functions())}])."]
+        if OPTIMIZATION_LEVELS[self.optimize]:
+            header.append(f"-compile([{', '.join(OPTIMIZATION_LEVELS[self.optimize])}]).")
+        header[-1] += "\n"
+        self.lines[export_index:export_index + 1] = header
+        if self.source_path and (self.uses_to_string_builtin or self.table_helpers_used or self.uses_code_change_helper):
+            self.lines.append(GENERATED_FILE_MARKER)
         if self.uses_to_string_builtin:
             self.append_to_string_builtin()
-        return "\n".join(self.lines)
+        if self.table_helpers_used:
+            self.append_table_builtins()
+        if self.uses_code_change_helper:
+            self.append_code_change_helper()
+        self.lines = self.align_source_lines()
+        return "\n".join(self.resolve_generated_file_markers())
+
+    def resolve_visibility(self):
+        # Sem nenhum `pub fn` o módulo exporta tudo, como antes. Com pub, só
+        # as funções públicas (e main) são exportadas e as privadas que
+        # nenhuma delas alcança são descartadas.
+        self.public_function_names = {function_def.name for function_def in public_functions(self.ast)}
+        if self.keep_functions is not None:
+            self.emitted_function_names = self.keep_functions & set(self.function_names)
+        elif uses_visibility(self.ast):
+            # potion_code_change/2 chama o code_change do usuário.
+            roots = self.public_function_names | ({"code_change"} if self.upgrade_hooks else set())
+            self.emitted_function_names = reachable_functions(module_functions(self.ast), roots)
+        else:
+            self.emitted_function_names = set(self.function_names)
+        self.dropped_functions = [name for name in self.function_names if name not in self.emitted_function_names]
+
+    def emitted_functions(self):
+        """Funções que vão para o .erl, na ordem do fonte; as descartadas por resolve_visibility ficam de fora."""
+        return [name for name in self.function_names if name in self.emitted_function_names]
+
+    def exported_functions(self):
+        exported = [
+            f"{name}/{self.function_arities[name]}"
+            for name in self.function_names
+            if name in self.public_function_names and name in self.emitted_function_names
+        ]
+        return exported + [export for export in dict.fromkeys(self.extra_exports) if export not in exported]
+
+    def return_type_summary(self, name):
+        """Tipo de retorno de name para a interface do módulo, ou dynamic quando não dá para saber."""
+        functions = module_functions(self.ast)
+        if not functions[name].body or not has_single_path(functions, name):
+            return "dynamic"
+        # Avalia o corpo com os parâmetros só tipados, como numa chamada local sem argumentos conhecidos.
+        saved = (
+            self.inside_function,
+            self.local_vars,
+            self.mutable_vars,
+            self.var_versions,
+            self.variables,
+            self.type_env,
+        )
+        self.inside_function = True
+        self.local_vars = {param.name for param in functions[name].params}
+        self.mutable_vars = set()
+        self.var_versions = {}
+        # Globais (val de topo) continuam visíveis, como em visit_FunctionDef.
+        self.variables = self.variables.copy()
+        self.type_env = self.type_env.copy()
+        try:
+            self.bind_function_params(functions[name].params)
+            return_type = self.infer_type(self.evaluate_block(functions[name].body))
+        except Exception:
+            return_type = "dynamic"
+        finally:
+            (
+                self.inside_function,
+                self.local_vars,
+                self.mutable_vars,
+                self.var_versions,
+                self.variables,
+                self.type_env,
+            ) = saved
+        return return_type if return_type in TYPE_MAP else "dynamic"
+
+    def emit_source_line(self, line):
+        # -file faz stack traces, profilers e avisos do erlc apontarem para
+        # o .potion; dentro da função as linhas são deslocamentos a partir
+        # da linha do `fn`, e align_source_lines põe cada statement na
+        # linha física correspondente.
+        if self.source_path and line:
+            self.lines.append(f"-file({self.erlang_string(self.source_path)}, {line}).")
+
+    def mark_source_line(self, code, line):
+        if self.source_path and line and code:
+            return SOURCE_LINE_MARKER.format(line) + code
+        return code
+
+    def align_source_lines(self):
+        # O Erlang não aceita -file dentro de uma função: cada statement
+        # marcado é empurrado com linhas em branco até a sua linha no
+        # .potion, ou puxado para cima juntando linhas que o gerado tem a
+        # mais (um `true ->`, um `end,`), sem passar do statement anterior.
+        aligned = []
+        current = None
+        anchor = 0
+        for physical in "\n".join(self.lines).split("\n"):
+            match = SOURCE_LINE_MARKER_RE.search(physical)
+            if match is not None:
+                physical = SOURCE_LINE_MARKER_RE.sub("", physical)
+                target = int(match.group(1))
+                if current is not None:
+                    if current < target:
+                        aligned.extend([""] * (target - current))
+                    while current > target and len(aligned) > anchor:
+                        previous = aligned.pop()
+                        if previous.strip():
+                            physical = f"{previous.rstrip()} {physical.lstrip()}"
+                        current -= 1
+                    current = max(current, target)
+                anchor = len(aligned)
+            aligned.append(physical)
+            file_attribute = FILE_ATTRIBUTE_RE.match(physical)
+            if file_attribute is not None:
+                current = int(file_attribute.group(1))
+                anchor = len(aligned)
+            elif current is not None:
+                current += 1
+        return aligned
+
+    def resolve_generated_file_markers(self):
+        # Os helpers gerados voltam a apontar para o próprio .erl.
+        resolved = []
+        physical_line = 0
+        for line in self.lines:
+            physical_line += line.count("\n") + 1
+            if line == GENERATED_FILE_MARKER:
+                line = f"-file({self.erlang_string(f'{self.module_name}.erl')}, {physical_line + 1})."
+            resolved.append(line)
+        return resolved
+
+    def erlang_string(self, value):
+        escaped = value.replace("\\", "\\\\").replace('"', '\\"')
+        return f'"{escaped}"'
 
     def collect_function_names_and_globals(self, node):
         if hasattr(node, "statements"):
@@ -99,9 +311,37 @@ class ErlangCodegen(SemanticAnalyzer):
 
     def visit_Program(self, node):
         for stmt in node.statements:
-            if not isinstance(stmt, (ImportStatement, ErlangImportStatement, ValDeclaration, VarDeclaration)):  # Globais já tratadas
+            if isinstance(stmt, FunctionDef) and stmt.name not in self.emitted_function_names:
+                self.validate_dropped_function(stmt)
+            elif not isinstance(stmt, (ImportStatement, ErlangImportStatement, ValDeclaration, VarDeclaration)):  # Globais já tratadas
                 self.visit(stmt)
 
+    def validate_dropped_function(self, node):
+        # Funções descartadas ainda passam pela validação semântica, mas nem
+        # o código nem os helpers que elas usariam entram no módulo. Sem
+        # instrumentação, elas também não ganham wrapper nem contador.
+        saved = (
+            len(self.lines),
+            self.uses_to_string_builtin,
+            set(self.table_helpers_used),
+            set(self.runtime_modules_used),
+            list(self.extra_exports),
+            self.uses_code_change_helper,
+            self.instrument,
+        )
+        self.instrument = ()
+        self.visit(node)
+        (
+            line_count,
+            self.uses_to_string_builtin,
+            self.table_helpers_used,
+            self.runtime_modules_used,
+            self.extra_exports,
+            self.uses_code_change_helper,
+            self.instrument,
+        ) = saved
+        del self.lines[line_count:]
+
     def visit_ValDeclaration(self, node):
         return self.emit_binding(node)
 
@@ -160,10 +400,17 @@ class ErlangCodegen(SemanticAnalyzer):
         }
 
         self.lines.append("")
+        self.emit_source_line(node.line)
+
+        emitted_name = node.name
+        if "calls" in self.instrument:
+            self.append_call_instrumentation_wrapper(node)
+            self.emit_source_line(node.line)
+            emitted_name = self.instrumented_impl_name(node.name)
 
         formatted_params = [self.emit_local_name(p.name) for p in node.params]
         param_str = ", ".join(formatted_params)
-        self.lines.append(f"{node.name}({param_str}) ->")
+        self.lines.append(f"{emitted_name}({param_str}) ->")
 
         # === CONTROLE DE ESCOPO LOCAL ===
         prev_inside = self.inside_function
@@ -172,7 +419,9 @@ class ErlangCodegen(SemanticAnalyzer):
         prev_versions = self.var_versions.copy()
         prev_variables = self.variables.copy()
         prev_type_env = self.type_env.copy()
+        prev_function = self.current_function
         self.inside_function = True
+        self.current_function = node.name
         self.local_vars = {param.name for param in node.params}
         self.mutable_vars = set()
         self.var_versions = {}
@@ -197,16 +446,16 @@ class ErlangCodegen(SemanticAnalyzer):
         else:
             *stmts, last = node.body
             for stmt in stmts:
-                code = self.visit(stmt)
+                code = self.mark_source_line(self.visit(stmt), stmt.line)
                 if code:
                     self.lines.append(f"    {code},")
             
             if isinstance(last, ReturnStatement):
                 ret_code = self.visit(last.value)
-                self.lines.append(f"    {ret_code}.")
+                self.lines.append(f"    {self.mark_source_line(ret_code, last.line)}.")
             else:
                 last_code = self.visit(last)
-                self.lines.append(f"    {last_code or 'ok'}.")
+                self.lines.append(f"    {self.mark_source_line(last_code or 'ok', last.line)}.")
 
         # === RESTAURA CONTEXTO ===
         self.inside_function = prev_inside
@@ -215,7 +464,67 @@ class ErlangCodegen(SemanticAnalyzer):
         self.var_versions = prev_versions
         self.variables = prev_variables
         self.type_env = prev_type_env
+        self.current_function = prev_function
+
+    def instrumented_impl_name(self, name):
+        return f"{name}{INSTRUMENT_IMPL_SUFFIX}"
+
+    def instrumented_function_index(self, name):
+        return self.emitted_functions().index(name) + 1
+
+    def instrumentation_init_lines(self):
+        # O hook -on_load registra as funções e/ou inicia o agregador de
+        # mensagens; módulos sem instrumentação não recebem nada. Se o
+        # agregador não subir, o erro vai para o log e o módulo carrega
+        # mesmo assim, sem estatísticas de mensagens.
+        calls = []
+        if "calls" in self.instrument and self.emitted_functions():
+            self.runtime_modules_used.add("potion_instrument")
+            functions = ", ".join(f"{{{name}, {self.function_arities[name]}}}" for name in self.emitted_functions())
+            calls.append(f"potion_instrument:register_module(?MODULE, [{functions}])")
+        if "potion_mailbox" in self.runtime_modules_used:
+            calls.append(
+                "case potion_mailbox:start() of\n"
+                "        ok -> ok;\n"
+                "        {error, Reason} ->\n"
+                "            logger:error(\"potion_mailbox failed to start: ~p\", [Reason]),\n"
+                "            ok\n"
+                "    end"
+            )
+        if not calls:
+            return []
+        body = ",\n    ".join(calls)
+        return [
+            "-on_load(potion_instrument_init/0).\n",
+            "potion_instrument_init() ->",
+            f"    {body}.\n",
+        ]
+
+    def append_call_instrumentation_wrapper(self, node):
+        # O wrapper exportado conta a chamada e acumula o tempo; o corpo real
+        # fica na função _impl, que não é exportada.
+        args = ", ".join(f"PotionArg{index}" for index in range(1, len(node.params) + 1))
+        index = self.instrumented_function_index(node.name)
+        self.lines.append(f"{node.name}({args}) ->")
+        self.lines.append(f"    PotionStartedAt = potion_instrument:enter(?MODULE, {index}),")
+        self.lines.append(f"    PotionResult = {self.instrumented_impl_name(node.name)}({args}),")
+        self.lines.append(f"    potion_instrument:leave(?MODULE, {index}, PotionStartedAt),")
+        self.lines.append("    PotionResult.")
+        self.lines.append("")
 
+    def emit_instrumented_self_call(self, name, args_code, qualified=False):
+        # Chamadas recursivas vão direto para a _impl, preservando a chamada
+        # de cauda; só o contador de chamadas é incrementado.
+        index = self.instrumented_function_index(name)
+        impl_name = self.instrumented_impl_name(name)
+        if qualified:
+            # Com --hot-reload a _impl precisa ser exportada para ?MODULE:.
+            self.extra_exports.append(f"{impl_name}/{len(args_code)}")
+            impl_name = f"?MODULE:{impl_name}"
+        return (
+            f"begin potion_instrument:enter(?MODULE, {index}), "
+            f"{impl_name}({', '.join(args_code)}) end"
+        )
 
     def visit_FunctionCall(self, node: FunctionCall):
         if node.name == "to_string":
@@ -225,6 +534,9 @@ class ErlangCodegen(SemanticAnalyzer):
             arg_code = self.visit(node.args[0])
             return f"potion_to_string_builtin({arg_code})"
 
+        if node.name in TABLE_BUILTINS:
+            return self.emit_table_builtin(node)
+
         if node.name in self.functions:
             args_values = [self.evaluate_expression(arg) for arg in node.args]
             params = self.functions[node.name]["params"]
@@ -241,8 +553,43 @@ class ErlangCodegen(SemanticAnalyzer):
                 return f"{external['module_name']}:{node.name}({', '.join(args_code)})"
 
         args_code = [self.visit(arg) for arg in node.args]
+        qualified = id(node) in self.qualified_tail_calls
+        if "calls" in self.instrument and node.name == self.current_function:
+            return self.emit_instrumented_self_call(node.name, args_code, qualified)
+        if qualified:
+            self.extra_exports.append(f"{node.name}/{len(args_code)}")
+            return f"?MODULE:{node.name}({', '.join(args_code)})"
         return f"{node.name}({', '.join(args_code)})"
 
+    def emit_table_builtin(self, node: FunctionCall):
+        args_values = [self.evaluate_expression(arg) for arg in node.args]
+        self.validate_table_builtin_call(node, args_values)
+
+        if node.name == "table_fold":
+            table_code = self.visit(node.args[0])
+            acc_code = self.visit(node.args[2])
+            callback_code = self.emit_table_fold_callback(node.args[1].value)
+            return (
+                "ets:foldl(fun ({PotionKey, PotionValue}, PotionAcc) -> "
+                f"{callback_code}(PotionKey, PotionValue, PotionAcc) end, {acc_code}, {table_code})"
+            )
+
+        args_code = [self.visit(arg) for arg in node.args]
+        if node.name == "table_put":
+            table_code, key_code, value_code = args_code
+            return f"ets:insert({table_code}, {{{key_code}, {value_code}}})"
+        if node.name == "table_delete":
+            return f"ets:delete({', '.join(args_code)})"
+
+        self.table_helpers_used.add(node.name)
+        return f"potion_{node.name}_builtin({', '.join(args_code)})"
+
+    def emit_table_fold_callback(self, callback_name):
+        if callback_name in self.functions:
+            return callback_name
+        external = self.external_functions[(callback_name, TABLE_FOLD_CALLBACK_ARITY)]
+        return f"{external['module_name']}:{callback_name}"
+
     def visit_ExternalModuleCall(self, node: ExternalModuleCall):
         self.validate_erlang_module_imported(node.module_name)
         args_code = [self.visit(arg) for arg in node.args]
@@ -258,8 +605,19 @@ class ErlangCodegen(SemanticAnalyzer):
     def visit_SendExpression(self, node: SendExpression):
         target_code = self.visit(node.target)
         message_code = self.visit(node.message)
+        if "messages" in self.instrument:
+            self.runtime_modules_used.add("potion_mailbox")
+            return f"potion_mailbox:send({target_code}, {self.message_tag(node.message)}, {message_code})"
         return f"{target_code} ! {message_code}"
 
+    def message_tag(self, message):
+        # A tag é a primeira chave de um map literal, que é a chave casada
+        # por `receive { on tag(...) }`; outras mensagens só são conhecidas
+        # em runtime.
+        if isinstance(message, MapLiteral) and message.entries:
+            return self.emit_map_key(message.entries[0][0])
+        return "dynamic"
+
     def visit_SpawnExpression(self, node: SpawnExpression):
         call_code = self.visit(node.call)
         return f"spawn(fun () -> {call_code} end)"
@@ -290,6 +648,10 @@ class ErlangCodegen(SemanticAnalyzer):
         start_versions = self.var_versions.copy()
         clauses_code = []
         branch_versions = []
+        tail_calls = self.receive_tail_calls(node) if self.hot_reload else []
+        self.qualified_tail_calls.update(id(call) for call in tail_calls)
+        if self.upgrade_hooks and not merge_vars and any(call.name == self.current_function for call in tail_calls):
+            clauses_code.append(self.emit_upgrade_clause() + ";")
         for idx, clause in enumerate(node.clauses):
             clause_code, end_versions = self.generate_receive_clause(clause, merge_vars, start_versions)
             if idx < len(node.clauses) - 1:
@@ -302,6 +664,46 @@ class ErlangCodegen(SemanticAnalyzer):
         receive_code = f"receive\n{clauses_block}\nend"
         return self.wrap_control_flow_with_merge(receive_code, merge_vars, branch_versions)
 
+    def receive_tail_calls(self, node: ReceiveBlock):
+        # Chamadas locais no fim de uma cláusula de receive viram
+        # ?MODULE:f(...), assim o processo entra na versão mais nova do
+        # módulo a cada mensagem.
+        calls = []
+        for clause in node.clauses:
+            if not clause.body:
+                continue
+            last = clause.body[-1]
+            if isinstance(last, ReturnStatement):
+                last = last.value
+            if isinstance(last, FunctionCall) and last.name in self.function_names:
+                calls.append(last)
+        return calls
+
+    def emit_upgrade_clause(self):
+        # Mensagem de upgrade: o estado do loop (seus parâmetros) passa por
+        # ?MODULE:potion_code_change/2, que já roda no código novo.
+        self.uses_code_change_helper = True
+        self.extra_exports.append("potion_code_change/2")
+        params = self.functions[self.current_function]["params"]
+        args = ", ".join(self.emit_name(param.name) for param in params)
+        upgraded = self.emit_map_key(UPGRADED_MESSAGE_TAG)
+        return (
+            f"    #{{{self.emit_map_key(UPGRADE_MESSAGE_TAG)} := PotionUpgradeFrom}} ->\n"
+            f"        PotionUpgradeFrom ! #{{{upgraded} => self()}},\n"
+            f"        ?MODULE:potion_code_change({self.emit_erlang_atom(self.current_function)}, [{args}])"
+        )
+
+    def append_code_change_helper(self):
+        # Um `fn code_change(function, args)` do usuário pode migrar o estado
+        # e trocar de loop; ele deve devolver {function, args}.
+        self.lines.append("")
+        self.lines.append("potion_code_change(Function, Args) ->")
+        if self.function_arities.get("code_change") == 2:
+            self.lines.append("    {NewFunction, NewArgs} = code_change(Function, Args),")
+            self.lines.append("    erlang:apply(?MODULE, NewFunction, NewArgs).")
+        else:
+            self.lines.append("    erlang:apply(?MODULE, Function, Args).")
+
     def visit_MatchExpression(self, node: MatchExpression):
         value_code = self.visit(node.value)
         merge_vars = self.collect_assigned_mutables(
@@ -359,12 +761,22 @@ class ErlangCodegen(SemanticAnalyzer):
     def generate_receive_clause(self, clause: ReceiveClause, merge_vars, start_versions):
         self.var_versions = start_versions.copy()
         pattern_code = self.emit_receive_pattern(clause)
+        message_hook = None
+        if "messages" in self.instrument:
+            self.runtime_modules_used.add("potion_mailbox")
+            self.received_message_counter += 1
+            message_var = f"PotionMessage{self.received_message_counter}"
+            pattern_code = message_var if clause.is_any else f"{pattern_code} = {message_var}"
+            tag = "any" if clause.is_any else self.emit_map_key(clause.tag)
+            message_hook = f"potion_mailbox:received({tag}, {message_var})"
         prev_locals = self.local_vars.copy()
         self.local_vars |= set(clause.bindings)
         guard_code = ""
         if clause.guard is not None:
             guard_code = f" when {self.visit(clause.guard)}"
         clause_body, end_versions = self.emit_branch_body(clause.body, merge_vars, start_versions)
+        if message_hook is not None:
+            clause_body = f"{message_hook},\n        {clause_body}"
 
         self.local_vars = prev_locals
 
@@ -604,10 +1016,10 @@ class ErlangCodegen(SemanticAnalyzer):
         lines = []
         *stmts, last = statements
         for stmt in stmts:
-            code = self.visit(stmt)
+            code = self.mark_source_line(self.visit(stmt), stmt.line)
             if code:
                 lines.append(code)
-        last_code = self.visit(last) or "ok"
+        last_code = self.mark_source_line(self.visit(last) or "ok", last.line)
         if merge_vars:
             lines.append(last_code)
             lines.append(self.emit_merge_return_expr(merge_vars))
@@ -637,3 +1049,29 @@ class ErlangCodegen(SemanticAnalyzer):
         self.lines.append("    binary_to_list(Value);")
         self.lines.append("potion_to_string_builtin(Value) ->")
         self.lines.append('    lists:flatten(io_lib:format("~p", [Value])).')
+
+    def append_table_builtins(self):
+        if "table_new" in self.table_helpers_used:
+            self.lines.append("")
+            self.lines.append("potion_table_new_builtin(Name, Opts) when is_map(Opts) ->")
+            self.lines.append("    Named = case maps:get(named, Opts, true) of")
+            self.lines.append("        true -> [named_table];")
+            self.lines.append("        false -> []")
+            self.lines.append("    end,")
+            self.lines.append("    Tuning = [")
+            self.lines.append("        {Option, maps:get(Option, Opts)}")
+            self.lines.append("        || Option <- [read_concurrency, write_concurrency, decentralized_counters],")
+            self.lines.append("           maps:is_key(Option, Opts)")
+            self.lines.append("    ],")
+            self.lines.append("    ets:new(Name, [set, public | Named] ++ Tuning).")
+        if "table_get" in self.table_helpers_used:
+            self.lines.append("")
+            self.lines.append("potion_table_get_builtin(Table, Key) ->")
+            self.lines.append("    case ets:lookup(Table, Key) of")
+            self.lines.append("        [{_, Value}] -> Value;")
+            self.lines.append("        [] -> undefined")
+            self.lines.append("    end.")
+        if "table_update_counter" in self.table_helpers_used:
+            self.lines.append("")
+            self.lines.append("potion_table_update_counter_builtin(Table, Key, Increment) ->")
+            self.lines.append("    ets:update_counter(Table, Key, Increment, {Key, 0}).")
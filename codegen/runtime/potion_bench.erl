@@ -0,0 +1,70 @@
+%% Driver used by `potionc bench`.
+%%
+%% Every benchmark is a zero-arity function. Each one runs in a fresh
+%% process: calls are batched so the clock is read once per batch, the
+%% batch size grows during warmup until a batch takes at least 1 ms, and
+%% then `Rounds` timed rounds of DurationMs / Rounds each are recorded.
+%% One tab-separated line per round is written to OutPath:
+%% module, function, round, iterations, elapsed µs.
+-module(potion_bench).
+-export([run/5]).
+
+-define(MIN_BATCH_US, 1000).
+
+run(Benchmarks, WarmupMs, DurationMs, Rounds, OutPath) ->
+    Lines = lists:append([bench(Module, Function, WarmupMs, DurationMs, Rounds) || {Module, Function} <- Benchmarks]),
+    ok = file:write_file(OutPath, Lines).
+
+bench(Module, Function, WarmupMs, DurationMs, Rounds) ->
+    io:format("potion_bench: ~s:~s~n", [Module, Function]),
+    {Pid, Ref} = spawn_monitor(fun () ->
+        Fun = fun Module:Function/0,
+        Batch = warmup(Fun, 1, deadline(WarmupMs)),
+        RoundMs = max(DurationMs div Rounds, 1),
+        exit({done, [timed_round(Fun, Batch, RoundMs) || _ <- lists:seq(1, Rounds)]})
+    end),
+    receive
+        {'DOWN', Ref, process, Pid, {done, Results}} ->
+            [
+                io_lib:format("~s\t~s\t~B\t~B\t~B~n", [Module, Function, Index, Iterations, ElapsedUs])
+             || {Index, {Iterations, ElapsedUs}} <- lists:zip(lists:seq(1, Rounds), Results)
+            ];
+        {'DOWN', Ref, process, Pid, Reason} ->
+            io:format("potion_bench: ~s:~s crashed: ~p~n", [Module, Function, Reason]),
+            []
+    end.
+
+deadline(Ms) ->
+    erlang:monotonic_time(microsecond) + Ms * 1000.
+
+warmup(Fun, Batch, Deadline) ->
+    Started = erlang:monotonic_time(microsecond),
+    run_batch(Fun, Batch),
+    Now = erlang:monotonic_time(microsecond),
+    NextBatch = case Now - Started < ?MIN_BATCH_US of
+        true -> Batch * 2;
+        false -> Batch
+    end,
+    case Now >= Deadline of
+        true -> NextBatch;
+        false -> warmup(Fun, NextBatch, Deadline)
+    end.
+
+timed_round(Fun, Batch, RoundMs) ->
+    Started = erlang:monotonic_time(microsecond),
+    Deadline = Started + RoundMs * 1000,
+    Iterations = round_loop(Fun, Batch, Deadline, 0),
+    {Iterations, erlang:monotonic_time(microsecond) - Started}.
+
+round_loop(Fun, Batch, Deadline, Iterations) ->
+    run_batch(Fun, Batch),
+    case erlang:monotonic_time(microsecond) >= Deadline of
+        true -> Iterations + Batch;
+        false -> round_loop(Fun, Batch, Deadline, Iterations + Batch)
+    end.
+
+run_batch(_Fun, 0) ->
+    ok;
+run_batch(Fun, Batch) ->
+    Fun(),
+    run_batch(Fun, Batch - 1).
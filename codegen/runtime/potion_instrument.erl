@@ -0,0 +1,84 @@
+%% Runtime support for `potionc --instrument=calls`.
+%%
+%% Each instrumented module registers its functions from an on_load hook.
+%% Call counts and cumulative time live in a `counters` ref stored in
+%% persistent_term, two slots per function: calls, then native time units.
+-module(potion_instrument).
+-export([register_module/2, enter/2, leave/3, snapshot/0, report/0, to_json/0, write_json/1, reset/0]).
+
+-define(KEY(Module), {?MODULE, calls, Module}).
+-define(MODULES_KEY, {?MODULE, modules}).
+
+register_module(Module, Functions) ->
+    Key = ?KEY(Module),
+    case persistent_term:get(Key, undefined) of
+        {_Counters, Functions} ->
+            %% Reloading the same code keeps the counters collected so far.
+            ok;
+        _ ->
+            Counters = counters:new(2 * max(length(Functions), 1), [write_concurrency]),
+            persistent_term:put(Key, {Counters, Functions}),
+            Modules = persistent_term:get(?MODULES_KEY, []),
+            persistent_term:put(?MODULES_KEY, lists:usort([Module | Modules])),
+            ok
+    end.
+
+enter(Module, Index) ->
+    {Counters, _} = persistent_term:get(?KEY(Module)),
+    counters:add(Counters, 2 * Index - 1, 1),
+    erlang:monotonic_time().
+
+leave(Module, Index, StartedAt) ->
+    {Counters, _} = persistent_term:get(?KEY(Module)),
+    counters:add(Counters, 2 * Index, erlang:monotonic_time() - StartedAt),
+    ok.
+
+snapshot() ->
+    Rows = lists:append([module_rows(Module) || Module <- persistent_term:get(?MODULES_KEY, [])]),
+    lists:reverse(lists:keysort(5, Rows)).
+
+module_rows(Module) ->
+    {Counters, Functions} = persistent_term:get(?KEY(Module)),
+    Indexed = lists:zip(lists:seq(1, length(Functions)), Functions),
+    [row(Module, Name, Arity, counters:get(Counters, 2 * I - 1), counters:get(Counters, 2 * I))
+     || {I, {Name, Arity}} <- Indexed].
+
+row(Module, Name, Arity, Calls, Native) ->
+    TotalUs = erlang:convert_time_unit(Native, native, microsecond),
+    AvgUs = case Calls of
+        0 -> 0;
+        _ -> TotalUs div Calls
+    end,
+    {Module, Name, Arity, Calls, TotalUs, AvgUs}.
+
+report() ->
+    io:format("~-40s ~12s ~14s ~10s~n", ["function", "calls", "total_us", "avg_us"]),
+    lists:foreach(
+        fun ({Module, Name, Arity, Calls, TotalUs, AvgUs}) ->
+            Label = io_lib:format("~s:~s/~B", [Module, Name, Arity]),
+            io:format("~-40s ~12B ~14B ~10B~n", [Label, Calls, TotalUs, AvgUs])
+        end,
+        snapshot()
+    ).
+
+to_json() ->
+    Entries = [
+        io_lib:format(
+            "{\"module\":\"~s\",\"function\":\"~s\",\"arity\":~B,\"calls\":~B,\"total_us\":~B,\"avg_us\":~B}",
+            [Module, Name, Arity, Calls, TotalUs, AvgUs]
+        )
+     || {Module, Name, Arity, Calls, TotalUs, AvgUs} <- snapshot()],
+    iolist_to_binary(["[", lists:join(",", Entries), "]"]).
+
+write_json(Path) ->
+    file:write_file(Path, to_json()).
+
+reset() ->
+    lists:foreach(
+        fun (Module) ->
+            {Counters, Functions} = persistent_term:get(?KEY(Module)),
+            [counters:put(Counters, Slot, 0) || Slot <- lists:seq(1, 2 * length(Functions))]
+        end,
+        persistent_term:get(?MODULES_KEY, [])
+    ),
+    ok.
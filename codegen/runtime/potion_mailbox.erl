@@ -0,0 +1,227 @@
+%% Runtime support for `potionc --instrument=messages`.
+%%
+%% Instrumented sends count messages per tag and record the send time in a
+%% side table keyed by receiver and message hash, so the message itself is
+%% delivered unchanged. Instrumented receive clauses count the message, take
+%% the oldest matching send time to record how long it spent in the mailbox,
+%% and sample message_queue_len of the receiving process. Everything is kept
+%% in public ETS tables owned by a long-lived holder process, which also drops
+%% send times nobody claimed; histograms use power-of-two buckets.
+-module(potion_mailbox).
+-export([start/0, send/3, received/2, snapshot/0, report/0, to_json/0, write_json/1, reset/0, stop/0]).
+
+-define(TABLE, potion_mailbox_stats).
+-define(HOLDER, potion_mailbox_holder).
+-define(IN_FLIGHT, potion_mailbox_in_flight).
+-define(MAX_IN_FLIGHT, 100000).
+-define(IN_FLIGHT_TTL_MS, 60000).
+-define(QUEUE_SAMPLE_EVERY, 16).
+
+start() ->
+    case whereis(?HOLDER) of
+        undefined ->
+            Caller = self(),
+            Holder = spawn(fun () -> init_holder(Caller) end),
+            receive
+                {Holder, ready} -> ok;
+                {Holder, already_started} -> ok
+            after 5000 ->
+                {error, timeout}
+            end;
+        _ ->
+            ok
+    end.
+
+init_holder(Caller) ->
+    try register(?HOLDER, self()) of
+        true ->
+            ets:new(?TABLE, [set, public, named_table, {write_concurrency, true}]),
+            ets:new(?IN_FLIGHT, [ordered_set, public, named_table, {write_concurrency, true}]),
+            ets:insert(?TABLE, {started_at, erlang:monotonic_time()}),
+            Caller ! {self(), ready},
+            holder_loop()
+    catch
+        error:badarg ->
+            Caller ! {self(), already_started}
+    end.
+
+holder_loop() ->
+    receive
+        stop -> ok;
+        _ -> holder_loop()
+    after ?IN_FLIGHT_TTL_MS ->
+        %% Messages consumed by uninstrumented receives never claim their send time.
+        Cutoff = erlang:monotonic_time() - erlang:convert_time_unit(?IN_FLIGHT_TTL_MS, millisecond, native),
+        ets:select_delete(?IN_FLIGHT, [{{'_', '$1'}, [{'<', '$1', Cutoff}], [true]}]),
+        holder_loop()
+    end.
+
+stop() ->
+    case whereis(?HOLDER) of
+        undefined -> ok;
+        Holder -> Holder ! stop, ok
+    end.
+
+send(Target, Tag, Message) ->
+    bump({sent, Tag}),
+    record_sent_at(Target, Message),
+    Target ! Message.
+
+received(Tag, Message) ->
+    Count = bump({received, Tag}),
+    case take_sent_at(Message) of
+        {ok, SentAt} ->
+            Elapsed = erlang:convert_time_unit(erlang:monotonic_time() - SentAt, native, microsecond),
+            bump({queue_time_us, Tag, bucket(Elapsed)});
+        _ ->
+            ok
+    end,
+    case Count rem ?QUEUE_SAMPLE_EVERY of
+        0 ->
+            {message_queue_len, Len} = erlang:process_info(self(), message_queue_len),
+            bump({queue_len, bucket(Len)});
+        _ ->
+            ok
+    end,
+    ok.
+
+%% Keys are {Receiver, phash2(Message), Seq}: equal messages pending for the
+%% same receiver are claimed oldest first.
+record_sent_at(Target, Message) ->
+    Pid = receiver_pid(Target),
+    try
+        case Pid =/= undefined andalso ets:info(?IN_FLIGHT, size) < ?MAX_IN_FLIGHT of
+            true ->
+                Key = {Pid, erlang:phash2(Message), erlang:unique_integer([monotonic, positive])},
+                ets:insert(?IN_FLIGHT, {Key, erlang:monotonic_time()}),
+                ok;
+            false ->
+                ok
+        end
+    catch
+        error:badarg -> ok
+    end.
+
+take_sent_at(Message) ->
+    Self = self(),
+    Hash = erlang:phash2(Message),
+    try
+        case ets:next(?IN_FLIGHT, {Self, Hash, 0}) of
+            {Self, Hash, _} = Key ->
+                case ets:take(?IN_FLIGHT, Key) of
+                    [{Key, SentAt}] -> {ok, SentAt};
+                    [] -> error
+                end;
+            _ ->
+                error
+        end
+    catch
+        error:badarg -> error
+    end.
+
+receiver_pid(Pid) when is_pid(Pid) -> Pid;
+receiver_pid(Name) when is_atom(Name) -> whereis(Name);
+receiver_pid(_) -> undefined.
+
+bump(Key) ->
+    try
+        ets:update_counter(?TABLE, Key, 1, {Key, 0})
+    catch
+        error:badarg -> 0
+    end.
+
+%% Bucket N holds values in [2^(N-1), 2^N); bucket 0 holds 0.
+bucket(0) -> 0;
+bucket(Value) -> bucket(Value, 1).
+
+bucket(Value, N) when Value < (1 bsl N) -> N;
+bucket(Value, N) -> bucket(Value, N + 1).
+
+bucket_upper(0) -> 0;
+bucket_upper(N) -> (1 bsl N) - 1.
+
+snapshot() ->
+    case ets:whereis(?TABLE) of
+        undefined ->
+            #{};
+        _ ->
+            Entries = ets:tab2list(?TABLE),
+            [{started_at, StartedAt}] = ets:lookup(?TABLE, started_at),
+            ElapsedS = max(erlang:convert_time_unit(erlang:monotonic_time() - StartedAt, native, millisecond), 1) / 1000,
+            Tags = lists:usort([Tag || {{Kind, Tag}, _} <- Entries, Kind =:= sent orelse Kind =:= received]),
+            #{
+                elapsed_s => ElapsedS,
+                tags => [tag_stats(Tag, Entries, ElapsedS) || Tag <- Tags],
+                queue_len => histogram([{Bucket, Count} || {{queue_len, Bucket}, Count} <- Entries])
+            }
+    end.
+
+tag_stats(Tag, Entries, ElapsedS) ->
+    Sent = proplists:get_value({sent, Tag}, Entries, 0),
+    Received = proplists:get_value({received, Tag}, Entries, 0),
+    #{
+        tag => Tag,
+        sent => Sent,
+        received => Received,
+        sent_per_s => Sent / ElapsedS,
+        received_per_s => Received / ElapsedS,
+        queue_time_us => histogram([{Bucket, Count} || {{queue_time_us, T, Bucket}, Count} <- Entries, T =:= Tag])
+    }.
+
+histogram(Buckets) ->
+    [#{le => bucket_upper(Bucket), count => Count} || {Bucket, Count} <- lists:keysort(1, Buckets)].
+
+report() ->
+    case snapshot() of
+        #{tags := Tags, queue_len := QueueLen, elapsed_s := ElapsedS} ->
+            io:format("mailbox stats over ~.1f s~n", [ElapsedS]),
+            io:format("~-24s ~10s ~10s ~10s ~10s~n", ["tag", "sent", "received", "sent/s", "recv/s"]),
+            lists:foreach(
+                fun (#{tag := Tag, sent := Sent, received := Received, sent_per_s := SentRate, received_per_s := ReceivedRate} = Stats) ->
+                    io:format("~-24s ~10B ~10B ~10.1f ~10.1f~n", [Tag, Sent, Received, SentRate, ReceivedRate]),
+                    print_histogram("  time in queue (us)", maps:get(queue_time_us, Stats))
+                end,
+                Tags
+            ),
+            print_histogram("message_queue_len (sampled)", QueueLen);
+        _ ->
+            io:format("mailbox stats: no data~n")
+    end.
+
+print_histogram(_Label, []) ->
+    ok;
+print_histogram(Label, Buckets) ->
+    io:format("~s~n", [Label]),
+    [io:format("    <= ~-10B ~B~n", [Le, Count]) || #{le := Le, count := Count} <- Buckets],
+    ok.
+
+to_json() ->
+    iolist_to_binary(json_value(snapshot())).
+
+json_value(Map) when is_map(Map) ->
+    Fields = [[json_value(atom_to_binary(Key, utf8)), ":", json_value(Value)] || {Key, Value} <- lists:keysort(1, maps:to_list(Map))],
+    ["{", lists:join(",", Fields), "}"];
+json_value(List) when is_list(List) ->
+    ["[", lists:join(",", [json_value(Item) || Item <- List]), "]"];
+json_value(Atom) when is_atom(Atom) ->
+    json_value(atom_to_binary(Atom, utf8));
+json_value(Binary) when is_binary(Binary) ->
+    ["\"", Binary, "\""];
+json_value(Integer) when is_integer(Integer) ->
+    integer_to_binary(Integer);
+json_value(Float) when is_float(Float) ->
+    float_to_binary(Float, [{decimals, 3}, compact]).
+
+write_json(Path) ->
+    file:write_file(Path, to_json()).
+
+reset() ->
+    case ets:whereis(?TABLE) of
+        undefined ->
+            ok;
+        _ ->
+            ets:match_delete(?TABLE, {{'_', '_'}, '_'}),
+            ets:match_delete(?TABLE, {{'_', '_', '_'}, '_'}),
+            ets:insert(?TABLE, {started_at, erlang:monotonic_time()}),
+            ok
+    end.
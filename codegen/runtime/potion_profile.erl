@@ -0,0 +1,103 @@
+%% Driver used by `potionc profile`.
+%%
+%% Runs Module:Entry() in a fresh process under eprof, fprof or tprof, either
+%% Calls times in a row or until DurationMs elapses, whichever comes first.
+%% eprof writes its own text log to OutPath; fprof and tprof results are
+%% flattened to tab-separated lines: module, function, arity, calls, own µs.
+-module(potion_profile).
+-export([run/6]).
+
+run(Profiler, Module, Entry, Calls, DurationMs, OutPath) ->
+    Driver = self(),
+    Runner = spawn(fun () ->
+        receive go -> ok end,
+        run_calls(Module, Entry, Calls),
+        Driver ! {self(), done}
+    end),
+    Ref = erlang:monitor(process, Runner),
+    Outcome = profile(Profiler, Runner, Ref, DurationMs, OutPath),
+    exit(Runner, kill),
+    io:format("potion_profile: ~p~n", [Outcome]),
+    Outcome.
+
+run_calls(_Module, _Entry, 0) ->
+    ok;
+run_calls(Module, Entry, Calls) ->
+    Module:Entry(),
+    run_calls(Module, Entry, Calls - 1).
+
+wait(Runner, Ref, DurationMs) ->
+    Timeout = case DurationMs of
+        0 -> infinity;
+        _ -> DurationMs
+    end,
+    receive
+        {Runner, done} -> completed;
+        {'DOWN', Ref, process, Runner, Reason} -> {crashed, Reason}
+    after Timeout ->
+        duration_elapsed
+    end.
+
+profile(eprof, Runner, Ref, DurationMs, OutPath) ->
+    eprof:start(),
+    profiling = eprof:start_profiling([Runner]),
+    Runner ! go,
+    Outcome = wait(Runner, Ref, DurationMs),
+    eprof:stop_profiling(),
+    eprof:log(OutPath),
+    eprof:analyze(total),
+    eprof:stop(),
+    Outcome;
+profile(fprof, Runner, Ref, DurationMs, OutPath) ->
+    TraceFile = OutPath ++ ".trace",
+    AnalysisFile = OutPath ++ ".analysis",
+    ok = fprof:trace([start, {procs, [Runner]}, {file, TraceFile}]),
+    Runner ! go,
+    Outcome = wait(Runner, Ref, DurationMs),
+    fprof:trace(stop),
+    ok = fprof:profile([{file, TraceFile}]),
+    ok = fprof:analyse([{dest, AnalysisFile}, {totals, false}]),
+    {ok, Terms} = file:consult(AnalysisFile),
+    write_rows(OutPath, fprof_rows(Terms)),
+    Outcome;
+profile(tprof, Runner, Ref, DurationMs, OutPath) ->
+    tprof:start(#{type => call_time}),
+    tprof:set_pattern('_', '_', '_'),
+    tprof:enable_trace({all_children, Runner}),
+    Runner ! go,
+    Outcome = wait(Runner, Ref, DurationMs),
+    tprof:disable_trace(all),
+    Sample = tprof:collect(),
+    tprof:stop(),
+    write_rows(OutPath, tprof_rows(tprof:inspect(Sample, total, call_time))),
+    Outcome.
+
+%% fprof times are in milliseconds; one entry per process and function.
+fprof_rows(Terms) ->
+    Entries = [
+        {{M, F, A}, Count, round(Own * 1000)}
+     || {_Callers, {{M, F, A}, Count, _Acc, Own}, _Called} <- Terms
+    ],
+    merge(Entries).
+
+tprof_rows(Inspected) ->
+    Entries = [
+        {{M, F, A}, Count, Time}
+     || {_Type, _Total, Lines} <- maps:values(Inspected),
+        {M, {F, A}, Count, Time, _PerCall, _Percent} <- Lines
+    ],
+    merge(Entries).
+
+merge(Entries) ->
+    Totals = lists:foldl(
+        fun ({MFA, Count, Own}, Acc) ->
+            maps:update_with(MFA, fun ({C, O}) -> {C + Count, O + Own} end, {Count, Own}, Acc)
+        end,
+        #{},
+        Entries
+    ),
+    [{M, F, A, Count, Own} || {{M, F, A}, {Count, Own}} <- maps:to_list(Totals)].
+
+write_rows(OutPath, Rows) ->
+    Lines = [io_lib:format("~s\t~s\t~B\t~B\t~B~n", [M, F, A, Count, Own]) || {M, F, A, Count, Own} <- Rows],
+    ok = file:write_file(OutPath, Lines).
@@ -0,0 +1,181 @@
+%% Long-lived node used by `potionc --run --runner` and the test suite.
+%%
+%% Listens on a loopback TCP port, written to PortFile, and serves one client
+%% at a time. Requests and replies are {packet, 4} frames. Requests are
+%% tab-separated:
+%%   ping
+%%   load <Module> <BeamPath>  load a .beam unless the same code is loaded
+%%   run <TimeoutMs> <M:F>...  call zero-arity functions in order, 0 = no timeout
+%%   stop
+%% Replies are "ok|error <Size> <Value><Output>": Value is the loaded status,
+%% the last call's result or the error reason; Output is everything printed
+%% by the run and by the processes it spawned. Old code is only replaced
+%% through code:soft_purge/1, so a load fails instead of killing processes
+%% still running it.
+-module(potion_runner).
+-export([start/1]).
+
+-define(DISCARD_IDLE_MS, 5000).
+
+start(PortFile) ->
+    {ok, Listen} = gen_tcp:listen(0, [binary, {packet, 4}, {active, false}, {ip, {127, 0, 0, 1}}]),
+    {ok, Port} = inet:port(Listen),
+    ok = file:write_file(PortFile, integer_to_list(Port)),
+    accept(Listen).
+
+accept(Listen) ->
+    {ok, Socket} = gen_tcp:accept(Listen),
+    case serve(Socket) of
+        stop ->
+            gen_tcp:close(Listen),
+            init:stop();
+        closed ->
+            accept(Listen)
+    end.
+
+serve(Socket) ->
+    case gen_tcp:recv(Socket, 0) of
+        {ok, Request} ->
+            case binary:split(Request, <<"\t">>, [global]) of
+                [<<"stop">>] ->
+                    gen_tcp:send(Socket, reply({ok, <<"stopping">>, <<>>})),
+                    gen_tcp:close(Socket),
+                    stop;
+                Fields ->
+                    gen_tcp:send(Socket, reply(handle(Fields))),
+                    serve(Socket)
+            end;
+        {error, _} ->
+            closed
+    end.
+
+handle([<<"ping">>]) ->
+    {ok, <<"pong">>, <<>>};
+handle([<<"load">>, Module, Path]) ->
+    load(binary_to_atom(Module, utf8), binary_to_list(Path));
+handle([<<"run">>, TimeoutMs | Calls]) ->
+    run([parse_call(Call) || Call <- Calls], binary_to_integer(TimeoutMs));
+handle(Fields) ->
+    {error, {bad_request, Fields}, <<>>}.
+
+reply({Status, Value, Output}) ->
+    Rendered = render(Value),
+    [atom_to_binary(Status, utf8), "\t", integer_to_binary(byte_size(Rendered)), "\t", Rendered, Output].
+
+render(Value) when is_binary(Value) ->
+    Value;
+render(Value) ->
+    unicode:characters_to_binary(io_lib:format("~0tp", [Value])).
+
+parse_call(Call) ->
+    [Module, Function] = binary:split(Call, <<":">>),
+    {binary_to_atom(Module, utf8), binary_to_atom(Function, utf8)}.
+
+load(Module, Path) ->
+    case file:read_file(Path) of
+        {ok, Binary} ->
+            case same_code(Module, Binary) of
+                true -> {ok, <<"unchanged">>, <<>>};
+                false -> replace(Module, Path, Binary)
+            end;
+        {error, Reason} ->
+            {error, {read_failed, Path, Reason}, <<>>}
+    end.
+
+same_code(Module, Binary) ->
+    case {code:is_loaded(Module), beam_lib:md5(Binary)} of
+        {false, _} -> false;
+        {_, {ok, {Module, Md5}}} -> Md5 =:= Module:module_info(md5);
+        _ -> false
+    end.
+
+replace(Module, Path, Binary) ->
+    case code:soft_purge(Module) of
+        false ->
+            {error, {not_purged, Module}, <<>>};
+        true ->
+            case code:load_binary(Module, Path, Binary) of
+                {module, Module} -> {ok, <<"loaded">>, <<>>};
+                {error, Reason} -> {error, {load_failed, Module, Reason}, <<>>}
+            end
+    end.
+
+run(Calls, TimeoutMs) ->
+    Collector = spawn(fun () -> collect([]) end),
+    {Worker, Ref} = spawn_monitor(fun () ->
+        group_leader(Collector, self()),
+        exit({done, call_all(Calls, ok)})
+    end),
+    Timeout = case TimeoutMs of
+        0 -> infinity;
+        _ -> TimeoutMs
+    end,
+    Outcome = receive
+        {'DOWN', Ref, process, Worker, {done, Value}} -> {ok, Value};
+        {'DOWN', Ref, process, Worker, Reason} -> {error, {crashed, Reason}}
+    after Timeout ->
+        exit(Worker, kill),
+        {error, timeout}
+    end,
+    Collector ! {flush, self()},
+    Output = receive
+        {Collector, output, Printed} -> Printed
+    end,
+    {Status, Value} = Outcome,
+    {Status, Value, Output}.
+
+call_all([], Last) ->
+    Last;
+call_all([{Module, Function} | Rest], _Last) ->
+    call_all(Rest, Module:Function()).
+
+%% Minimal io server: keeps put_chars output until flushed, then discards
+%% output from processes that outlive the run. After DISCARD_IDLE_MS without
+%% requests it exits once no process has it as group leader any more.
+collect(Acc) ->
+    receive
+        {io_request, From, ReplyAs, Request} ->
+            {Reply, NewAcc} = io_request(Request, Acc),
+            From ! {io_reply, ReplyAs, Reply},
+            collect(NewAcc);
+        {flush, From} ->
+            From ! {self(), output, unicode:characters_to_binary(lists:reverse(Acc))},
+            discard()
+    end.
+
+discard() ->
+    receive
+        {io_request, From, ReplyAs, Request} ->
+            {Reply, _} = io_request(Request, []),
+            From ! {io_reply, ReplyAs, Reply},
+            discard()
+    after ?DISCARD_IDLE_MS ->
+        case has_members() of
+            true -> discard();
+            false -> ok
+        end
+    end.
+
+has_members() ->
+    Self = self(),
+    lists:any(
+        fun (Pid) -> Pid =/= Self andalso erlang:process_info(Pid, group_leader) =:= {group_leader, Self} end,
+        erlang:processes()
+    ).
+
+io_request({put_chars, Encoding, Chars}, Acc) ->
+    {ok, [unicode:characters_to_binary(Chars, Encoding) | Acc]};
+io_request({put_chars, Encoding, Module, Function, Args}, Acc) ->
+    io_request({put_chars, Encoding, apply(Module, Function, Args)}, Acc);
+io_request({put_chars, Chars}, Acc) ->
+    io_request({put_chars, latin1, Chars}, Acc);
+io_request({requests, Requests}, Acc) ->
+    lists:foldl(fun (Request, {_, A}) -> io_request(Request, A) end, {ok, Acc}, Requests);
+io_request(getopts, Acc) ->
+    {[{binary, false}, {encoding, unicode}], Acc};
+io_request(Request, Acc) when element(1, Request) =:= get_chars;
+                              element(1, Request) =:= get_line;
+                              element(1, Request) =:= get_until ->
+    {eof, Acc};
+io_request(_Request, Acc) ->
+    {{error, request}, Acc}.
@@ -0,0 +1,369 @@
+"""Load generator for the feature-server demo.
+
+Starts the demo on a local port (or targets one that is already running),
+drives a weighted mix of POST/GET/list requests at fixed concurrency levels
+and prints throughput and latency percentiles as JSON.
+
+Run from the repository root:
+
+    python demo/bench/loadgen.py --concurrency 1,8,32 --duration 10
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+DEMO_DIR = os.path.join(REPO_ROOT, "demo")
+
+REQUEST_KINDS = ("post", "get", "list")
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        kind, _, weight = part.partition("=")
+        kind = kind.strip()
+        if kind not in REQUEST_KINDS:
+            raise argparse.ArgumentTypeError(f"unknown request kind '{kind}' in mix")
+        mix[kind] = int(weight or "1")
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("request mix needs at least one positive weight")
+    return mix
+
+
+def parse_levels(text):
+    return [int(level) for level in text.split(",") if level.strip()]
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class DemoServer:
+    """Builds the demo into a scratch directory and runs it under `erl`."""
+
+    def __init__(self, port, acceptors=None, max_connections=None):
+        self.port = port
+        self.acceptors = acceptors
+        self.max_connections = max_connections
+        self.workdir = None
+        self.process = None
+
+    def start(self, timeout=30.0):
+        self.workdir = tempfile.mkdtemp(prefix="potion-demo-bench-")
+        build_dir = os.path.join(self.workdir, "_build")
+        shutil.copy(os.path.join(DEMO_DIR, "demo_support.erl"), self.workdir)
+
+        subprocess.run(
+            [sys.executable, "-m", "cli.potionc", os.path.join(DEMO_DIR, "main.potion"), "--outdir", build_dir],
+            cwd=REPO_ROOT,
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+
+        env = dict(os.environ, POTION_DEMO_PORT=str(self.port))
+        if self.acceptors:
+            env["POTION_DEMO_ACCEPTORS"] = str(self.acceptors)
+        if self.max_connections:
+            env["POTION_DEMO_MAX_CONNECTIONS"] = str(self.max_connections)
+
+        self.process = subprocess.Popen(
+            ["erl", "-noshell", "-pa", build_dir, "-eval", "main:main()."],
+            cwd=self.workdir,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        self.wait_until_ready(timeout)
+
+    def wait_until_ready(self, timeout):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError("demo server exited during startup")
+            try:
+                with socket.create_connection(("127.0.0.1", self.port), timeout=0.5):
+                    return
+            except OSError:
+                time.sleep(0.2)
+        raise RuntimeError(f"demo server did not listen on port {self.port} within {timeout}s")
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        if self.workdir is not None:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+class HttpConnection:
+    """Minimal keep-alive HTTP/1.1 client over asyncio streams."""
+
+    def __init__(self, host, port, keep_alive=True):
+        self.host = host
+        self.port = port
+        self.keep_alive = keep_alive
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method, path, body=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+        payload = b"" if body is None else json.dumps(body).encode("utf-8")
+        head = [
+            f"{method} {path} HTTP/1.1",
+            f"host: {self.host}:{self.port}",
+            f"connection: {'keep-alive' if self.keep_alive else 'close'}",
+        ]
+        if payload:
+            head.append("content-type: application/json")
+        head.append(f"content-length: {len(payload)}")
+        self.writer.write(("\r\n".join(head) + "\r\n\r\n").encode("ascii") + payload)
+        await self.writer.drain()
+
+        status, headers = await self.read_head()
+        await self.reader.readexactly(int(headers.get("content-length", "0")))
+        if not self.keep_alive or headers.get("connection") == "close":
+            await self.close()
+        return status
+
+    async def read_head(self):
+        raw = await self.reader.readuntil(b"\r\n\r\n")
+        lines = raw.decode("latin-1").split("\r\n")
+        status = int(lines[0].split(" ", 2)[1])
+        headers = {}
+        for line in lines[1:]:
+            name, sep, value = line.partition(":")
+            if sep:
+                headers[name.strip().lower()] = value.strip()
+        return status, headers
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except (ConnectionError, AttributeError):
+                pass
+        self.reader = None
+        self.writer = None
+
+
+class Workload:
+    def __init__(self, mix, features, environment, seed):
+        self.kinds = [kind for kind in REQUEST_KINDS if mix.get(kind)]
+        self.weights = [mix[kind] for kind in self.kinds]
+        self.features = [f"bench_feature_{index}" for index in range(features)]
+        self.environment = environment
+        self.random = random.Random(seed)
+
+    def next_request(self):
+        kind = self.random.choices(self.kinds, self.weights)[0]
+        name = self.random.choice(self.features)
+        if kind == "post":
+            body = {
+                "name": name,
+                "environment": self.environment,
+                "enabled": self.random.random() < 0.5,
+                "description": "load generator",
+            }
+            return kind, "POST", "/features", body
+        if kind == "get":
+            return kind, "GET", f"/features/{name}?environment={self.environment}", None
+        return kind, "GET", "/features", None
+
+    def seed_requests(self):
+        for name in self.features:
+            body = {"name": name, "environment": self.environment, "enabled": True, "description": "seed"}
+            yield "POST", "/features", body
+
+
+async def seed_features(host, port, workload):
+    connection = HttpConnection(host, port)
+    try:
+        for method, path, body in workload.seed_requests():
+            status = await connection.request(method, path, body)
+            if status != 200:
+                raise RuntimeError(f"seeding failed with HTTP {status}")
+    finally:
+        await connection.close()
+
+
+async def run_worker(host, port, workload, deadline, record_after, keep_alive, samples):
+    connection = HttpConnection(host, port, keep_alive=keep_alive)
+    try:
+        while time.perf_counter() < deadline:
+            kind, method, path, body = workload.next_request()
+            started = time.perf_counter()
+            try:
+                status = await connection.request(method, path, body)
+                ok = status < 500
+            except (OSError, asyncio.IncompleteReadError, ValueError):
+                await connection.close()
+                ok = False
+            finished = time.perf_counter()
+            if started >= record_after:
+                samples.append((kind, ok, finished - started))
+    finally:
+        await connection.close()
+
+
+async def run_level(host, port, workload, concurrency, duration, warmup, keep_alive):
+    samples = []
+    start = time.perf_counter()
+    record_after = start + warmup
+    deadline = record_after + duration
+    await asyncio.gather(*[
+        run_worker(host, port, workload, deadline, record_after, keep_alive, samples)
+        for _ in range(concurrency)
+    ])
+    return summarize(concurrency, duration, samples)
+
+
+def summarize(concurrency, duration, samples):
+    latencies = sorted(elapsed for _, ok, elapsed in samples if ok)
+    errors = sum(1 for _, ok, _ in samples if not ok)
+    by_kind = {}
+    for kind, _, _ in samples:
+        by_kind[kind] = by_kind.get(kind, 0) + 1
+
+    def ms(value):
+        return None if value is None else round(value * 1000.0, 3)
+
+    return {
+        "concurrency": concurrency,
+        "duration_s": duration,
+        "requests": len(samples),
+        "errors": errors,
+        "requests_by_kind": by_kind,
+        "throughput_rps": round(len(latencies) / duration, 1) if duration else None,
+        "latency_ms": {
+            "mean": ms(sum(latencies) / len(latencies)) if latencies else None,
+            "p50": ms(percentile(latencies, 0.50)),
+            "p95": ms(percentile(latencies, 0.95)),
+            "p99": ms(percentile(latencies, 0.99)),
+            "max": ms(latencies[-1]) if latencies else None,
+        },
+    }
+
+
+def compare_results(current, baseline):
+    baseline_levels = {level["concurrency"]: level for level in baseline.get("levels", [])}
+    comparison = []
+    for level in current["levels"]:
+        previous = baseline_levels.get(level["concurrency"])
+        if previous is None:
+            continue
+        comparison.append({
+            "concurrency": level["concurrency"],
+            "throughput_change_pct": percent_change(previous["throughput_rps"], level["throughput_rps"]),
+            "p99_change_pct": percent_change(previous["latency_ms"]["p99"], level["latency_ms"]["p99"]),
+        })
+    return comparison
+
+
+def percent_change(before, after):
+    if not before or after is None:
+        return None
+    return round((after - before) * 100.0 / before, 1)
+
+
+async def run_benchmark(args, host, port):
+    workload = Workload(args.mix, args.features, args.environment, args.seed)
+    await seed_features(host, port, workload)
+    levels = []
+    for concurrency in args.concurrency:
+        level = await run_level(host, port, workload, concurrency, args.duration, args.warmup, not args.no_keep_alive)
+        print(
+            f"concurrency={concurrency} rps={level['throughput_rps']} "
+            f"p50={level['latency_ms']['p50']}ms p99={level['latency_ms']['p99']}ms errors={level['errors']}",
+            file=sys.stderr,
+        )
+        levels.append(level)
+    return levels
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load generator for the Potion feature-server demo")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=None, help="Port for the demo server [default: a free port]")
+    parser.add_argument("--no-start", action="store_true", help="Target a server that is already running")
+    parser.add_argument("--concurrency", type=parse_levels, default=[1, 8, 32], help="Comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=10.0, help="Measured seconds per concurrency level")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Unmeasured seconds before each level")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("post=1,get=8,list=1"), help="Request weights, e.g. post=1,get=8,list=1")
+    parser.add_argument("--features", type=int, default=100, help="Distinct feature names to seed and query")
+    parser.add_argument("--environment", default="bench")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for the request mix")
+    parser.add_argument("--no-keep-alive", action="store_true", help="Open a new connection per request")
+    parser.add_argument("--acceptors", type=int, default=None, help="Override the demo acceptor count")
+    parser.add_argument("--max-connections", type=int, default=None, help="Override the demo connection limit")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    parser.add_argument("--compare", help="Baseline JSON report to compare against")
+    args = parser.parse_args(argv)
+
+    port = args.port or (4040 if args.no_start else free_port())
+    server = None
+    if not args.no_start:
+        server = DemoServer(port, acceptors=args.acceptors, max_connections=args.max_connections)
+        server.start()
+
+    try:
+        levels = asyncio.run(run_benchmark(args, args.host, port))
+    finally:
+        if server is not None:
+            server.stop()
+
+    report = {
+        "benchmark": "demo_feature_server",
+        "started_server": server is not None,
+        "config": {
+            "mix": args.mix,
+            "features": args.features,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "keep_alive": not args.no_keep_alive,
+            "seed": args.seed,
+        },
+        "host": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "levels": levels,
+    }
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            report["comparison"] = compare_results(report, json.load(f))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,10 +4,20 @@
     setup/1,
     listen/1,
     accept/1,
+    handoff/2,
+    start_limiter/1,
+    acquire_slot/1,
+    assign_slot/3,
+    empty_buffer/0,
     read_request/1,
+    read_request/2,
     send_json/4,
+    send_json/5,
     close/1,
+    log/1,
     now_rfc3339/0,
+    now_us/0,
+    server_config/3,
     mnesia_upsert_feature/5,
     mnesia_get_feature/2,
     mnesia_list_features/0
@@ -26,51 +36,146 @@ setup(Dir0) ->
     ok.
 
 listen(Port) ->
-    {ok, ListenSocket} = gen_tcp:listen(Port, [binary, {packet, raw}, {active, false}, {reuseaddr, true}]),
+    {ok, ListenSocket} = gen_tcp:listen(Port, [
+        binary,
+        {packet, raw},
+        {active, false},
+        {reuseaddr, true},
+        {backlog, 1024}
+    ]),
     ListenSocket.
 
 accept(ListenSocket) ->
     {ok, Socket} = gen_tcp:accept(ListenSocket),
     Socket.
 
+handoff(Socket, Pid) ->
+    gen_tcp:controlling_process(Socket, Pid).
+
 close(Socket) ->
     gen_tcp:close(Socket).
 
+%% Connection limiter: an acceptor asks for a slot after accept/1 returns and
+%% blocks while the limit is reached, so further connections wait in the listen
+%% backlog instead of piling up as handler processes. Idle acceptors hold no
+%% slot. A slot is released when the process holding it exits.
+start_limiter(MaxConnections) ->
+    spawn(fun() -> limiter_loop(MaxConnections, #{}) end).
+
+acquire_slot(Limiter) ->
+    Ref = make_ref(),
+    Limiter ! {acquire, self(), Ref},
+    receive
+        {slot_granted, Ref, Slot} -> Slot
+    end.
+
+assign_slot(Limiter, Slot, Pid) ->
+    Limiter ! {assign, Slot, Pid},
+    ok.
+
+limiter_loop(MaxConnections, Slots) ->
+    receive
+        {acquire, From, Ref} when map_size(Slots) < MaxConnections ->
+            Slot = erlang:monitor(process, From),
+            From ! {slot_granted, Ref, Slot},
+            limiter_loop(MaxConnections, Slots#{Slot => From});
+        {assign, Slot, Pid} ->
+            erlang:demonitor(Slot, [flush]),
+            NewSlot = erlang:monitor(process, Pid),
+            limiter_loop(MaxConnections, maps:put(NewSlot, Pid, maps:remove(Slot, Slots)));
+        {'DOWN', Slot, process, _Pid, _Reason} ->
+            limiter_loop(MaxConnections, maps:remove(Slot, Slots))
+    end.
+
+empty_buffer() ->
+    <<>>.
+
 read_request(Socket) ->
-    case recv_until_headers(Socket, <<>>) of
+    read_request(Socket, <<>>).
+
+%% Buffer holds bytes already received after the previous request on this
+%% connection, which is how pipelined requests are picked up. The returned
+%% request carries the new leftover bytes in `buffer`.
+read_request(Socket, Buffer) ->
+    case recv_until_headers(Socket, Buffer) of
         {ok, HeaderBin, Rest} ->
-            ContentLength = content_length(HeaderBin),
+            [RequestLineBin | HeaderLines] = binary:split(HeaderBin, <<"\r\n">>, [global]),
+            Headers = parse_headers(HeaderLines),
+            ContentLength = content_length(Headers),
             case recv_body(Socket, Rest, ContentLength) of
-                {ok, BodyBin} ->
-                    parse_request(HeaderBin, BodyBin);
+                {ok, BodyBin, Leftover} ->
+                    Request = parse_request_line(RequestLineBin, Headers, BodyBin),
+                    Request#{buffer => Leftover};
                 {error, closed} ->
-                    error_request("connection_closed");
+                    closed_request();
                 {error, Reason} ->
-                    error_request(io_lib:format("read_body_error: ~p", [Reason]))
+                    error_request(format_error("read_body_error", Reason))
             end;
         {error, closed} ->
-            error_request("connection_closed");
+            closed_request();
+        {error, timeout} ->
+            closed_request();
         {error, Reason} ->
-            error_request(io_lib:format("read_headers_error: ~p", [Reason]))
+            error_request(format_error("read_headers_error", Reason))
     end.
 
 send_json(Socket, Status, Payload, JsonArray) ->
-    JsonReady = json_ready(Payload, JsonArray),
-    Body = iolist_to_binary(json:encode(JsonReady)),
+    send_json(Socket, Status, Payload, JsonArray, false).
+
+send_json(Socket, Status, Payload, JsonArray, KeepAlive) ->
+    Body = iolist_to_binary(encode_json(Payload, JsonArray)),
     Response = [
         "HTTP/1.1 ", status_line(Status), "\r\n",
         "content-type: application/json\r\n",
         "content-length: ", integer_to_list(byte_size(Body)), "\r\n",
-        "connection: close\r\n",
+        connection_line(KeepAlive),
         "\r\n",
         Body
     ],
     gen_tcp:send(Socket, Response).
 
+%% Logging for the Potion side. Parts are string literals, binary request
+%% fields and atoms; strings and binaries are both chardata, so binaries are
+%% printed as they are, without converting them at each call site.
+log(Parts) ->
+    io:format("~ts~n", [[log_part(Part) || Part <- Parts]]).
+
+log_part(Part) when is_atom(Part) ->
+    atom_to_binary(Part, utf8);
+log_part(Part) when is_integer(Part) ->
+    integer_to_binary(Part);
+log_part(Part) ->
+    Part.
+
 now_rfc3339() ->
-    calendar:system_time_to_rfc3339(erlang:system_time(second), [{unit, second}]).
+    list_to_binary(calendar:system_time_to_rfc3339(erlang:system_time(second), [{unit, second}])).
+
+now_us() ->
+    erlang:monotonic_time(microsecond).
 
-mnesia_upsert_feature(Name, Environment, Enabled, Description, UpdatedAt) ->
+%% Defaults come from main.potion; the environment overrides them so the
+%% benchmark harness can start the server on a free port.
+server_config(Port, Acceptors, MaxConnections) ->
+    #{
+        port => env_int("POTION_DEMO_PORT", Port),
+        acceptors => env_int("POTION_DEMO_ACCEPTORS", Acceptors),
+        max_connections => env_int("POTION_DEMO_MAX_CONNECTIONS", MaxConnections)
+    }.
+
+env_int(Name, Default) ->
+    case os:getenv(Name) of
+        false -> Default;
+        "" -> Default;
+        Value -> list_to_integer(Value)
+    end.
+
+%% Request fields are usually sub-binaries of the whole request buffer.
+%% Copying them before they are stored keeps Mnesia and the ETS cache from
+%% holding on to every request binary they were sliced from.
+mnesia_upsert_feature(Name0, Environment0, Enabled, Description0, UpdatedAt) ->
+    Name = binary:copy(Name0),
+    Environment = binary:copy(Environment0),
+    Description = copy_optional_binary(Description0),
     Fun =
         fun() ->
             Record = {
@@ -165,8 +270,8 @@ recv_until_headers(Socket, Acc) ->
     end.
 
 recv_body(_Socket, Rest, ContentLength) when byte_size(Rest) >= ContentLength ->
-    <<Body:ContentLength/binary, _/binary>> = Rest,
-    {ok, Body};
+    <<Body:ContentLength/binary, Leftover/binary>> = Rest,
+    {ok, Body, Leftover};
 recv_body(Socket, Rest, ContentLength) ->
     Missing = ContentLength - byte_size(Rest),
     case gen_tcp:recv(Socket, Missing, 5000) of
@@ -176,77 +281,86 @@ recv_body(Socket, Rest, ContentLength) ->
             Error
     end.
 
-parse_request(HeaderBin, BodyBin) ->
-    case binary:split(HeaderBin, <<"\r\n">>, [global]) of
-        [RequestLineBin | _HeaderLines] ->
-            parse_request_line(RequestLineBin, BodyBin);
-        _ ->
-            error_request("invalid_http_request")
-    end.
-
-parse_request_line(RequestLineBin, BodyBin) ->
+parse_request_line(RequestLineBin, Headers, BodyBin) ->
     case binary:split(RequestLineBin, <<" ">>, [global]) of
-        [MethodBin, TargetBin, _VersionBin] ->
+        [MethodBin, TargetBin, VersionBin] ->
             {PathBin, QueryBin} = split_target(TargetBin),
-            Path = binary_to_list(PathBin),
             FeatureName = feature_name_from_path(PathBin),
             Environment = query_param(QueryBin, <<"environment">>),
-            build_request(binary_to_list(MethodBin), Path, FeatureName, Environment, BodyBin);
+            Request = request_map(method(MethodBin), PathBin, resource(PathBin), FeatureName, Environment),
+            build_request(Request#{keep_alive => keep_alive(VersionBin, Headers)}, BodyBin);
         _ ->
-            error_request("invalid_request_line")
+            error_request(<<"invalid_request_line">>)
     end.
 
-build_request(Method, Path, FeatureName, Environment, <<>>) ->
-    #{
-        method => Method,
-        path => Path,
-        feature_name => FeatureName,
-        environment => Environment,
-        body => undefined,
-        parse_error => undefined
-    };
-build_request(Method, Path, FeatureName, Environment, BodyBin) ->
+build_request(Request, <<>>) ->
+    Request;
+build_request(Request, BodyBin) ->
     try
         Decoded = json:decode(BodyBin),
-        Body = normalize_feature_payload(Decoded),
-        #{
-            method => Method,
-            path => Path,
-            feature_name => FeatureName,
-            environment => Environment,
-            body => Body,
-            parse_error => undefined
-        }
+        Request#{body => normalize_feature_payload(Decoded)}
     catch
         error:_ ->
-            #{
-                method => Method,
-                path => Path,
-                feature_name => FeatureName,
-                environment => Environment,
-                body => undefined,
-                parse_error => "invalid_json_body"
-            }
+            Request#{parse_error => <<"invalid_json_body">>, keep_alive => false}
     end.
 
-error_request(Message) ->
+request_map(Method, Path, Resource, FeatureName, Environment) ->
     #{
-        method => "UNKNOWN",
-        path => "/",
-        feature_name => undefined,
-        environment => undefined,
+        method => Method,
+        path => Path,
+        resource => Resource,
+        feature_name => FeatureName,
+        environment => Environment,
         body => undefined,
-        parse_error => flatten(Message)
+        parse_error => undefined,
+        keep_alive => false,
+        closed => false,
+        buffer => <<>>
     }.
 
+error_request(Message) ->
+    Request = request_map(unknown, <<"/">>, unknown, undefined, undefined),
+    Request#{parse_error => Message}.
+
+closed_request() ->
+    Request = error_request(<<"connection_closed">>),
+    Request#{closed => true}.
+
+%% HTTP/1.1 connections stay open unless the client asks to close them;
+%% HTTP/1.0 connections close unless the client asks for keep-alive.
+keep_alive(<<"HTTP/1.1">>, Headers) ->
+    connection_header(Headers) =/= <<"close">>;
+keep_alive(_Version, Headers) ->
+    connection_header(Headers) =:= <<"keep-alive">>.
+
+connection_header(Headers) ->
+    lower_binary(proplists:get_value(<<"connection">>, Headers, <<>>)).
+
+connection_line(true) ->
+    "connection: keep-alive\r\n";
+connection_line(false) ->
+    "connection: close\r\n".
+
 split_target(TargetBin) ->
     case binary:split(TargetBin, <<"?">>) of
         [PathBin, QueryBin] -> {PathBin, QueryBin};
         [PathBin] -> {PathBin, <<>>}
     end.
 
+method(<<"GET">>) -> get;
+method(<<"POST">>) -> post;
+method(<<"PUT">>) -> put;
+method(<<"DELETE">>) -> delete;
+method(<<"HEAD">>) -> head;
+method(_) -> unknown.
+
+resource(<<"/features">>) -> features;
+resource(<<"/features/", _/binary>>) -> features;
+resource(<<"/metrics">>) -> metrics;
+resource(_) -> unknown.
+
 feature_name_from_path(<<"/features/", Name/binary>>) when byte_size(Name) > 0 ->
-    binary_to_list(Name);
+    Name;
 feature_name_from_path(_) ->
     undefined.
 
@@ -260,27 +374,25 @@ query_param_from_pairs([], _Key) ->
     undefined;
 query_param_from_pairs([Pair | Rest], Key) ->
     case binary:split(Pair, <<"=">>) of
-        [Key, Value] -> binary_to_list(Value);
+        [Key, Value] -> Value;
         _ -> query_param_from_pairs(Rest, Key)
     end.
 
-content_length(HeaderBin) ->
-    HeaderLines = binary:split(HeaderBin, <<"\r\n">>, [global]),
-    find_content_length(HeaderLines).
-
-find_content_length([]) ->
-    0;
-find_content_length([Line | Rest]) ->
-    case binary:split(Line, <<":">>) of
-        [Name, Value] ->
-            case lower_binary(trim_binary(Name)) of
-                <<"content-length">> ->
-                    binary_to_integer(trim_binary(Value));
-                _ ->
-                    find_content_length(Rest)
-            end;
-        _ ->
-            find_content_length(Rest)
+parse_headers(HeaderLines) ->
+    lists:filtermap(
+        fun(Line) ->
+            case binary:split(Line, <<":">>) of
+                [Name, Value] -> {true, {lower_binary(trim_binary(Name)), trim_binary(Value)}};
+                _ -> false
+            end
+        end,
+        HeaderLines
+    ).
+
+content_length(Headers) ->
+    case proplists:get_value(<<"content-length">>, Headers) of
+        undefined -> 0;
+        Value -> binary_to_integer(Value)
     end.
 
 normalize_feature_payload(Map) when is_map(Map) ->
@@ -295,13 +407,13 @@ normalize_feature_payload(_) ->
 
 required_string(Map, Key) ->
     case maps:get(Key, Map, undefined) of
-        Value when is_binary(Value) -> binary_to_list(Value);
+        Value when is_binary(Value) -> Value;
         _ -> undefined
     end.
 
 optional_string(Map, Key) ->
     case maps:get(Key, Map, undefined) of
-        Value when is_binary(Value) -> binary_to_list(Value);
+        Value when is_binary(Value) -> Value;
         null -> undefined;
         undefined -> undefined;
         _ -> undefined
@@ -316,34 +428,28 @@ feature_record_to_map({?TABLE, _Key, Name, Environment, Enabled, Description, Up
         updated_at => UpdatedAt
     }.
 
-json_ready(Value, true) when is_list(Value) ->
-    [json_ready(Item, false) || Item <- Value];
-json_ready(Value, false) when is_list(Value) ->
-    case is_string_list(Value) of
-        true -> unicode:characters_to_binary(Value);
-        false -> [json_ready(Item, false) || Item <- Value]
-    end;
-json_ready(Value, _TopArray) when is_map(Value) ->
-    maps:from_list([
-        {json_key(Key), json_ready(Item, false)}
-        || {Key, Item} <- maps:to_list(Value)
-    ]);
-json_ready(undefined, _TopArray) ->
-    null;
-json_ready(Value, _TopArray) ->
+copy_optional_binary(Value) when is_binary(Value) ->
+    binary:copy(Value);
+copy_optional_binary(Value) ->
     Value.
 
-json_key(Key) when is_atom(Key) ->
-    Key;
-json_key(Key) when is_list(Key) ->
-    unicode:characters_to_binary(Key);
-json_key(Key) ->
-    Key.
-
-is_string_list([]) ->
-    false;
-is_string_list(List) ->
-    io_lib:printable_unicode_list(List).
+%% Feature data is binary end to end, so only values produced on the Potion
+%% side need conversion while encoding: charlist string literals become JSON
+%% strings and `none` becomes null.
+encode_json(Payload, true) when is_list(Payload) ->
+    json:encode_list(Payload, fun json_encoder/2);
+encode_json(Payload, _JsonArray) ->
+    json:encode(Payload, fun json_encoder/2).
+
+json_encoder(undefined, Encode) ->
+    json:encode_atom(null, Encode);
+json_encoder([Char | _] = Value, Encode) when is_integer(Char) ->
+    case io_lib:printable_unicode_list(Value) of
+        true -> json:encode_binary(unicode:characters_to_binary(Value));
+        false -> json:encode_value(Value, Encode)
+    end;
+json_encoder(Value, Encode) ->
+    json:encode_value(Value, Encode).
 
 status_line(200) -> "200 OK";
 status_line(400) -> "400 Bad Request";
@@ -353,10 +459,31 @@ status_line(500) -> "500 Internal Server Error";
 status_line(_) -> "500 Internal Server Error".
 
 trim_binary(Bin) ->
-    list_to_binary(string:trim(binary_to_list(Bin))).
+    trim_trailing(trim_leading(Bin)).
+
+trim_leading(<<Char, Rest/binary>>) when Char =:= $\s; Char =:= $\t ->
+    trim_leading(Rest);
+trim_leading(Bin) ->
+    Bin.
+
+trim_trailing(<<>>) ->
+    <<>>;
+trim_trailing(Bin) ->
+    case binary:last(Bin) of
+        Char when Char =:= $\s; Char =:= $\t ->
+            trim_trailing(binary:part(Bin, 0, byte_size(Bin) - 1));
+        _ ->
+            Bin
+    end.
 
+%% Header names and the values compared here are ASCII tokens.
 lower_binary(Bin) ->
-    list_to_binary(string:lowercase(binary_to_list(Bin))).
+    << <<(ascii_lower(Char))>> || <<Char>> <= Bin >>.
+
+ascii_lower(Char) when Char >= $A, Char =< $Z ->
+    Char + 32;
+ascii_lower(Char) ->
+    Char.
 
-flatten(Value) ->
-    lists:flatten(io_lib:format("~ts", [Value])).
+format_error(Prefix, Reason) ->
+    iolist_to_binary(io_lib:format("~s: ~p", [Prefix, Reason])).
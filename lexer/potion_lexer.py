@@ -1,5 +1,5 @@
 import re
-from typing import List, Tuple
+from typing import List
 
 # --------------------
 # TOKENS DEFINITIONS
@@ -21,6 +21,7 @@ TOKEN_SPEC = [
     ("VAR",        r"var\b"),
     ("IMPORT",     r"import\b"),
     ("ERLANG",     r"erlang\b"),
+    ("PUB",        r"pub\b"),
     ("FN",         r"fn\b"),
     ("SP",         r"sp\b"),
     ("SEND",       r"send\b"),
@@ -55,7 +56,18 @@ TOKEN_SPEC = [
 
 token_re = re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern in TOKEN_SPEC))
 
-Token = Tuple[str, str]  # (type, value)
+class Token(tuple):
+    """(type, value) tuple that also records the 1-based line and column where
+    the token starts. It still compares and unpacks as a plain 2-tuple."""
+
+    def __new__(cls, kind: str, value: str, line: int = 0, column: int = 0):
+        token = super().__new__(cls, (kind, value))
+        token.line = line
+        token.column = column
+        return token
+
+    def __getnewargs__(self):
+        return (self[0], self[1], self.line, self.column)
 
 # --------------------
 # LEXER IMPLEMENTATION
@@ -63,15 +75,21 @@ Token = Tuple[str, str]  # (type, value)
 def tokenize(code: str) -> List[Token]:
 
     tokens = []
+    line = 1
+    line_start = 0
     for match in token_re.finditer(code):
         kind = match.lastgroup
         value = match.group()
-        if kind in ("WHITESPACE", "COMMENT"):
-            continue
-        elif kind == "INVALID_ATOM":
-            raise RuntimeError(f"Invalid atom literal: {value}")
+        start = match.start()
+        if kind == "INVALID_ATOM":
+            raise RuntimeError(f"Invalid atom literal: {value} (line {line})")
         elif kind == "MISMATCH":
-            raise RuntimeError(f"Unexpected character: {value}")
-        else:
-            tokens.append((kind, value))
+            raise RuntimeError(f"Unexpected character: {value} (line {line})")
+        elif kind not in ("WHITESPACE", "COMMENT"):
+            tokens.append(Token(kind, value, line, start - line_start + 1))
+
+        newlines = value.count("\n")
+        if newlines:
+            line += newlines
+            line_start = start + value.rindex("\n") + 1
     return tokens
@@ -5,7 +5,8 @@ from lexer.potion_lexer import Token, tokenize
 # AST NODE DEFINITIONS
 # --------------------
 class ASTNode:
-    pass
+    # Linha do .potion onde o nó começa; preenchida pelo parser para statements.
+    line: Optional[int] = None
 
 class Program(ASTNode):
     def __init__(self, statements: List[ASTNode]):
@@ -42,10 +43,11 @@ class FunctionParam(ASTNode):
         self.type_annotation = type_annotation
 
 class FunctionDef(ASTNode):
-    def __init__(self, name: str, params: List[FunctionParam], body: List[ASTNode]):
+    def __init__(self, name: str, params: List[FunctionParam], body: List[ASTNode], public: bool = False):
         self.name = name
         self.params = params
         self.body = body
+        self.public = public
 
 class FunctionCall(ASTNode):
     def __init__(self, name: str, args: List[ASTNode]):
@@ -206,7 +208,9 @@ class Parser:
         if tok[0] == kind:
             self.pos += 1
             return tok
-        raise SyntaxError(f"Expected {kind}, got {tok}")
+        line = getattr(tok, "line", None)
+        location = f" at line {line}" if line else ""
+        raise SyntaxError(f"Expected {kind}, got {tok}{location}")
 
     def parse(self) -> Program:
         statements = []
@@ -217,6 +221,13 @@ class Parser:
         return Program(statements)
 
     def statement(self) -> Union[ASTNode, None]:
+        line = getattr(self.current(), "line", None)
+        node = self.parse_statement()
+        if node is not None and node.line is None:
+            node.line = line
+        return node
+
+    def parse_statement(self) -> Union[ASTNode, None]:
         tok = self.current()
         if tok[0] == "VAL":
             return self.val_declaration()
@@ -226,6 +237,11 @@ class Parser:
             return self.import_statement()
         elif tok[0] == "FN":
             return self.function_def()
+        elif tok[0] == "PUB":
+            self.eat("PUB")
+            function_def = self.function_def()
+            function_def.public = True
+            return function_def
         elif tok[0] == "IF":
             return self.if_block()
         elif tok[0] == "RETURN":
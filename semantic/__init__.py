@@ -2,6 +2,8 @@ from .potion_semantic import (
     DynamicValue,
     PidValue,
     SemanticAnalyzer,
+    TABLE_BUILTINS,
+    TableValue,
     TYPE_MAP,
     REVERSE_TYPE_MAP,
     UNKNOWN,
@@ -11,6 +13,8 @@ __all__ = [
     "DynamicValue",
     "PidValue",
     "SemanticAnalyzer",
+    "TABLE_BUILTINS",
+    "TableValue",
     "TYPE_MAP",
     "REVERSE_TYPE_MAP",
     "UNKNOWN",
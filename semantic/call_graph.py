@@ -0,0 +1,76 @@
+from parser.potion_parser import ASTNode, FunctionCall, FunctionDef, IfBlock, LiteralAtom, MatchExpression, ReceiveBlock
+
+BRANCH_NODES = (IfBlock, MatchExpression, ReceiveBlock)
+
+
+def function_references(node):
+    """Nomes de função chamados dentro de node, incluindo callbacks de table_fold e alvos de `sp`."""
+    names = set()
+
+    def visit(value):
+        if isinstance(value, FunctionCall):
+            names.add(value.name)
+            if value.name == "table_fold" and len(value.args) > 1 and isinstance(value.args[1], LiteralAtom):
+                names.add(value.args[1].value)
+
+    walk(node, visit)
+    return names
+
+
+def walk(node, visit):
+    visit(node)
+    if isinstance(node, ASTNode):
+        for child in vars(node).values():
+            walk(child, visit)
+    elif isinstance(node, (list, tuple)):
+        for item in node:
+            walk(item, visit)
+
+
+def contains_branches(node):
+    branches = []
+
+    def visit(value):
+        if isinstance(value, BRANCH_NODES):
+            branches.append(value)
+
+    walk(node, visit)
+    return bool(branches)
+
+
+def module_functions(ast):
+    return {stmt.name: stmt for stmt in ast.statements if isinstance(stmt, FunctionDef)}
+
+
+def uses_visibility(ast):
+    """Um módulo só tem funções privadas quando declara pelo menos um `pub fn`."""
+    return any(function_def.public for function_def in module_functions(ast).values())
+
+
+def public_functions(ast):
+    functions = module_functions(ast)
+    if not uses_visibility(ast):
+        return list(functions.values())
+    return [function_def for function_def in functions.values() if function_def.public or function_def.name == "main"]
+
+
+def reachable_functions(functions, roots):
+    """Funções de `functions` ({nome: FunctionDef}) alcançáveis a partir dos nomes em roots."""
+    reachable = set()
+    pending = [name for name in roots if name in functions]
+    while pending:
+        name = pending.pop()
+        if name in reachable:
+            continue
+        reachable.add(name)
+        pending.extend(ref for ref in function_references(functions[name].body) if ref in functions)
+    return reachable
+
+
+def has_single_path(functions, name):
+    """True quando name e as funções locais que ele chama não têm if, match nem receive.
+
+    Só nesse caso avaliar o corpo com parâmetros sem valor dá o tipo de retorno
+    de qualquer chamada.
+    """
+    return not any(contains_branches(functions[reachable].body) for reachable in reachable_functions(functions, [name]))
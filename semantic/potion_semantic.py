@@ -62,14 +62,41 @@ class TupleValue:
         return not self == other
 
 
+class TableValue:
+    pass
+
+
 class TypedValue:
     def __init__(self, type_name):
         self.type_name = type_name
 
 
+class TypedUnknown(DynamicValue):
+    """Valor desconhecido cujo tipo se sabe, como o retorno de uma função importada."""
+
+    def __init__(self, type_name):
+        self.type_name = type_name
+
+
 UNKNOWN = DynamicValue()
 
 
+TABLE_BUILTINS = {
+    "table_new": [FunctionParam("name", "atom"), FunctionParam("opts")],
+    "table_get": [FunctionParam("table"), FunctionParam("key")],
+    "table_put": [FunctionParam("table"), FunctionParam("key"), FunctionParam("value")],
+    "table_delete": [FunctionParam("table"), FunctionParam("key")],
+    "table_update_counter": [
+        FunctionParam("table"),
+        FunctionParam("key"),
+        FunctionParam("increment", "int"),
+    ],
+    "table_fold": [FunctionParam("table"), FunctionParam("callback", "atom"), FunctionParam("acc")],
+}
+
+TABLE_FOLD_CALLBACK_ARITY = 3
+
+
 TYPE_MAP = {
     "int": int,
     "str": str,
@@ -78,6 +105,7 @@ TYPE_MAP = {
     "atom": AtomValue,
     "tuple": TupleValue,
     "pid": PidValue,
+    "table": TableValue,
     "dynamic": DynamicValue,
 }
 
@@ -90,6 +118,7 @@ REVERSE_TYPE_MAP = {
     AtomValue: "atom",
     TupleValue: "tuple",
     PidValue: "pid",
+    TableValue: "table",
     DynamicValue: "dynamic",
 }
 
@@ -147,6 +176,16 @@ class SemanticAnalyzer:
                 self.variables[var_name] = UNKNOWN
                 return
 
+            if isinstance(evaluated_value, TypedUnknown):
+                if node.type_annotation not in ("dynamic", evaluated_value.type_name):
+                    raise Exception(
+                        f"Erro de tipo ({scope}) em '{node.name}': esperado {node.type_annotation}, "
+                        f"mas recebeu {evaluated_value.type_name}"
+                    )
+                self.type_env[var_name] = node.type_annotation
+                self.variables[var_name] = evaluated_value
+                return
+
             if not isinstance(evaluated_value, expected_type):
                 actual_type = self.infer_type(evaluated_value)
                 raise Exception(
@@ -163,29 +202,10 @@ class SemanticAnalyzer:
         self.variables[var_name] = evaluated_value
 
     def infer_type(self, value):
-        if isinstance(value, TypedValue):
+        if isinstance(value, (TypedValue, TypedUnknown)):
             return value.type_name
         return REVERSE_TYPE_MAP.get(type(value), "unknown")
 
-    def placeholder_value_for_type(self, type_name):
-        if type_name == "int":
-            return 0
-        if type_name == "str":
-            return ""
-        if type_name == "bool":
-            return False
-        if type_name == "none":
-            return None
-        if type_name == "atom":
-            return AtomValue("placeholder")
-        if type_name == "tuple":
-            return TupleValue([])
-        if type_name == "pid":
-            return PidValue()
-        if type_name == "dynamic":
-            return UNKNOWN
-        return TypedValue(type_name)
-
     def param_names(self, params):
         return [param.name for param in params]
 
@@ -203,8 +223,8 @@ class SemanticAnalyzer:
             emitted_name = self.emit_local_name(param.name)
             if arg_values is not None:
                 value = arg_values[idx]
-            elif param.type_annotation:
-                value = self.placeholder_value_for_type(param.type_annotation)
+            elif param.type_annotation and param.type_annotation != "dynamic":
+                value = TypedUnknown(param.type_annotation)
             else:
                 value = UNKNOWN
 
@@ -235,6 +255,45 @@ class SemanticAnalyzer:
                     f"espera {param.type_annotation}, mas recebeu {actual_type}"
                 )
 
+    def validate_table_builtin_call(self, node, args):
+        params = TABLE_BUILTINS[node.name]
+        self.validate_function_call_args(node.name, params, args)
+
+        if node.name != "table_new":
+            table_value = args[0]
+            if table_value is not UNKNOWN:
+                actual_type = self.infer_type(table_value)
+                if actual_type not in ("table", "atom", "unknown"):
+                    raise Exception(
+                        f"Erro de tipo em chamada de função '{node.name}': parâmetro 'table' "
+                        f"espera table ou atom, mas recebeu {actual_type}"
+                    )
+
+        if node.name == "table_fold":
+            self.validate_table_fold_callback(node.args[1])
+
+    def validate_table_fold_callback(self, callback_node):
+        if not isinstance(callback_node, LiteralAtom):
+            raise Exception("table_fold espera o nome da função de callback como atom literal, ex: :somar.")
+        key = (callback_node.value, TABLE_FOLD_CALLBACK_ARITY)
+        local_params = self.functions.get(callback_node.value, {}).get("params")
+        if local_params is not None and len(local_params) == TABLE_FOLD_CALLBACK_ARITY:
+            return
+        if key in self.external_functions:
+            return
+        raise Exception(
+            f"Função de callback '{callback_node.value}/{TABLE_FOLD_CALLBACK_ARITY}' "
+            "não definida para table_fold."
+        )
+
+    def evaluate_table_builtin(self, node, args):
+        self.validate_table_builtin_call(node, args)
+        if node.name == "table_new":
+            return TableValue()
+        if node.name in ("table_put", "table_delete"):
+            return True
+        return UNKNOWN
+
     def register_erlang_import(self, module_name):
         self.imported_erlang_modules.add(module_name)
 
@@ -347,8 +406,8 @@ class SemanticAnalyzer:
         if isinstance(node, BinaryOp):
             left = self.evaluate_expression(node.left)
             right = self.evaluate_expression(node.right)
-            if left is UNKNOWN or right is UNKNOWN:
-                return self.evaluate_unknown_binary(node.op)
+            if self.is_unknown(left) or self.is_unknown(right):
+                return self.evaluate_unknown_binary(node.op, left, right)
             if node.op == "+":
                 if self.is_int_value(left) and self.is_int_value(right):
                     return left + right
@@ -363,6 +422,8 @@ class SemanticAnalyzer:
             if node.op == "*":
                 return left * right
             if node.op == "/":
+                if right == 0:
+                    raise Exception("Divisão por zero.")
                 return left / right
             if node.op == "==":
                 return left == right
@@ -406,7 +467,7 @@ class SemanticAnalyzer:
                 if len(args) != 1:
                     raise Exception(f"Função '{func_name}' espera 1 argumento(s), recebeu {len(args)}.")
                 value = args[0]
-                if value is UNKNOWN:
+                if self.is_unknown(value):
                     return ""
                 if value is None:
                     return "undefined"
@@ -417,6 +478,8 @@ class SemanticAnalyzer:
                 if isinstance(value, AtomValue):
                     return value.name
                 return str(value)
+            if func_name in TABLE_BUILTINS:
+                return self.evaluate_table_builtin(node, args)
 
             if func_name not in self.functions:
                 external = self.external_functions.get((func_name, len(args)))
@@ -425,7 +488,9 @@ class SemanticAnalyzer:
                 params = external["params"]
                 self.validate_function_param_annotations(params)
                 self.validate_function_call_args(func_name, params, args)
-                return UNKNOWN
+                # Só o tipo de retorno vem da interface (.potioni) do módulo importado; o valor não é conhecido.
+                return_type = external.get("return_type", "dynamic")
+                return UNKNOWN if return_type == "dynamic" else TypedUnknown(return_type)
 
             func_def = self.functions[func_name]
             params = func_def["params"]
@@ -469,11 +534,22 @@ class SemanticAnalyzer:
             result = self.evaluate_statement(stmt)
         return result
 
-    def evaluate_unknown_binary(self, op):
-        if op == "+":
-            return UNKNOWN
+    def evaluate_unknown_binary(self, op, left, right):
+        # Sem valor, o resultado só tem tipo quando os dois lados têm.
         if op in ("==", "!=", ">", "<", ">=", "<="):
             return False
+        if left is UNKNOWN or right is UNKNOWN:
+            return UNKNOWN
+        left_type, right_type = self.infer_type(left), self.infer_type(right)
+        if op == "+":
+            if left_type == right_type and left_type in ("int", "str"):
+                return TypedUnknown(left_type)
+            raise Exception(
+                f"Erro de tipo: operador '+' recebeu tipos incompatíveis ({left_type} e {right_type}). "
+                "Use to_string(...) para concatenação textual."
+            )
+        if left_type == right_type == "int":
+            return TypedUnknown("int")
         return UNKNOWN
 
     def evaluate_statement(self, stmt):
@@ -504,5 +580,8 @@ class SemanticAnalyzer:
         current_name = self.emit_name(name)
         return self.type_env.get(current_name)
 
+    def is_unknown(self, value):
+        return value is UNKNOWN or isinstance(value, TypedUnknown)
+
     def is_int_value(self, value):
         return type(value) is int
@@ -8,6 +8,7 @@ setup(
     author_email="willianscsilva@gmail.com",
     packages=find_packages(),  # Encontra cli, lexer, parser, etc.
     include_package_data=True,
+    package_data={"codegen": ["runtime/*.erl"]},
     entry_points={
         "console_scripts": [
             "potionc=cli.potionc:main",  # Executável 'potionc' chamará cli/potionc.py:main()
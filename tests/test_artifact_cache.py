@@ -0,0 +1,120 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from cli.artifact_cache import ArtifactCache, main, parse_size
+from cli.potionc import compile_file
+
+HELPERS = """
+pub fn double(x: int) {
+    x * 2
+}
+
+fn unused() {
+    1
+}
+"""
+
+MAIN = """
+import helpers
+
+fn main() {
+    print(double(21))
+}
+"""
+
+
+def write_file(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+    return path
+
+
+class TestArtifactCache(unittest.TestCase):
+    def test_parse_size_accepts_unit_suffixes(self):
+        self.assertEqual(parse_size(1024), 1024)
+        self.assertEqual(parse_size("512K"), 512 * 1024)
+        self.assertEqual(parse_size("500mb"), 500 * 1024 ** 2)
+        self.assertEqual(parse_size("2G"), 2 * 1024 ** 3)
+        with self.assertRaisesRegex(Exception, "Tamanho de cache inválido"):
+            parse_size("lots")
+
+    def test_store_fetch_and_evict_least_recently_used(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = ArtifactCache(os.path.join(tmpdir, "cache"), max_size=20)
+            first = write_file(os.path.join(tmpdir, "build", "first.erl"), "x" * 10)
+            second = write_file(os.path.join(tmpdir, "build", "second.erl"), "y" * 10)
+
+            self.assertTrue(cache.store("aa01", [first]))
+            self.assertFalse(cache.store("aa01", [first]))
+            self.assertTrue(cache.store("bb02", [second]))
+            os.utime(cache.entry_path("aa01"), (1, 1))
+            os.utime(cache.entry_path("bb02"), (2, 2))
+
+            outdir = os.path.join(tmpdir, "out")
+            self.assertEqual(cache.fetch("aa01", outdir), [os.path.join(outdir, "first.erl")])
+            self.assertIsNone(cache.fetch("cc03", outdir))
+            self.assertEqual(cache.stats()["entries"], 2)
+
+            # A entrada aa01 acabou de ser usada; bb02 é a que sai.
+            self.assertEqual(cache.prune(max_size=10), (1, 10))
+            self.assertTrue(os.path.isdir(cache.entry_path("aa01")))
+            self.assertFalse(os.path.isdir(cache.entry_path("bb02")))
+
+    def test_clean_build_copies_unchanged_modules_from_cache(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache_dir = os.path.join(tmpdir, "cache")
+            write_file(os.path.join(tmpdir, "helpers.potion"), HELPERS)
+            main_path = write_file(os.path.join(tmpdir, "main.potion"), MAIN)
+
+            def build(outdir):
+                output = io.StringIO()
+                with contextlib.redirect_stdout(output):
+                    result = compile_file(main_path, outdir=os.path.join(tmpdir, outdir), beam=False, cache_dir=cache_dir)
+                return result, output.getvalue()
+
+            first, first_output = build("ci-1")
+            self.assertIn("⚠️ Unused private functions removed from helpers: unused/0", first_output)
+            second, second_output = build("ci-2")
+
+            self.assertIn("📦 main restored from cache", second_output)
+            self.assertIn("📦 helpers restored from cache", second_output)
+            self.assertIn("⚠️ Unused private functions removed from helpers: unused/0", second_output)
+            self.assertNotIn("Erlang file generated: " + os.path.join(tmpdir, "ci-2", "main.erl"), second_output)
+            for first_path, second_path in zip(sorted(first.outputs), sorted(second.outputs)):
+                with open(first_path, encoding="utf-8") as f, open(second_path, encoding="utf-8") as g:
+                    self.assertEqual(f.read(), g.read())
+
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                self.assertEqual(main(["stats", "--cache-dir", cache_dir]), 0)
+                self.assertEqual(main(["prune", "--cache-dir", cache_dir, "--max-size", "0"]), 0)
+            self.assertIn("entries: 2", output.getvalue())
+            self.assertIn("🧹 Removed 2 cache entries", output.getvalue())
+            self.assertEqual(ArtifactCache(cache_dir).stats()["entries"], 0)
+
+    def test_cache_is_shared_between_checkouts(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache_dir = os.path.join(tmpdir, "cache")
+            outputs = []
+            for checkout in ("checkout-a", "checkout-b"):
+                write_file(os.path.join(tmpdir, checkout, "helpers.potion"), HELPERS)
+                main_path = write_file(os.path.join(tmpdir, checkout, "main.potion"), MAIN)
+                output = io.StringIO()
+                with contextlib.redirect_stdout(output):
+                    compile_file(main_path, outdir=os.path.join(tmpdir, checkout, "out"), beam=False, cache_dir=cache_dir)
+                outputs.append(output.getvalue())
+            with open(os.path.join(tmpdir, "checkout-b", "out", "main.erl"), encoding="utf-8") as f:
+                main_erl = f.read()
+
+        self.assertIn("📦 main restored from cache", outputs[1])
+        self.assertIn("📦 helpers restored from cache", outputs[1])
+        self.assertIn('-file("main.potion", ', main_erl)
+
+    def test_cache_needs_a_directory(self):
+        self.assertIsNone(ArtifactCache.configured(environ={}))
+        cache = ArtifactCache.configured(environ={"POTION_CACHE_DIR": "/tmp/potion", "POTION_CACHE_SIZE": "1M"})
+        self.assertEqual((cache.directory, cache.max_size), ("/tmp/potion", 1024 ** 2))
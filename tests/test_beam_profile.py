@@ -0,0 +1,74 @@
+import unittest
+
+from cli.beam_profile import (
+    build_profile_command,
+    demangle_function,
+    demangle_module,
+    parse_eprof_output,
+    parse_profile_rows,
+    summarize,
+)
+
+EPROF_LOG = """
+FUNCTION                                         CALLS        %  TIME  [uS / CALLS]
+--------                                         -----  -------  ----  [----------]
+io:format/2                                          2     5.00    10  [      5.00]
+potion_18_shared_tables:sum_hits/3                   2    10.00    20  [     10.00]
+potion_18_shared_tables:'-main/0-fun-0-'/3           2    15.00    30  [     15.00]
+potion_18_shared_tables:potion_table_get_builtin/2   3    70.00   140  [     46.67]
+-----------------------------------------------  -----  -------  ----  [----------]
+Total:                                               9  100.00%   200  [     22.22]
+"""
+
+
+class TestBeamProfile(unittest.TestCase):
+    def test_parse_eprof_output(self):
+        rows = parse_eprof_output(EPROF_LOG)
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0], ("io", "format", 2, 2, 10))
+        self.assertEqual(rows[2], ("potion_18_shared_tables", "-main/0-fun-0-", 3, 2, 30))
+
+    def test_parse_profile_rows(self):
+        rows = parse_profile_rows("main\tmain__potion_impl\t0\t1\t250\nets\tlookup\t2\t4\t12\n")
+        self.assertEqual(rows, [("main", "main__potion_impl", 0, 1, 250), ("ets", "lookup", 2, 4, 12)])
+
+    def test_demangle_function(self):
+        self.assertEqual(demangle_function("potion_to_string_builtin", 1), "to_string/1 (builtin)")
+        self.assertEqual(demangle_function("potion_table_get_builtin", 2), "table_get/2 (builtin)")
+        self.assertEqual(demangle_function("loop__potion_impl", 2), "loop/2")
+        self.assertEqual(demangle_function("-main/0-fun-0-", 0), "fun #0 in main/0")
+        self.assertEqual(demangle_function("-main__potion_impl/0-fun-1-", 0), "fun #1 in main/0")
+        self.assertEqual(demangle_function("potion_instrument_init", 0), "(instrumentation init)")
+
+    def test_demangle_module(self):
+        source_names = {"potion_18_shared_tables": "18_shared_tables"}
+        self.assertEqual(demangle_module("potion_18_shared_tables", source_names), "18_shared_tables")
+        self.assertEqual(demangle_module("potion_instrument", source_names), "potion_instrument (potion runtime)")
+        self.assertEqual(demangle_module("ets", source_names), "ets (erlang)")
+
+    def test_summarize_merges_wrappers_and_ranks_by_own_time(self):
+        rows = [
+            ("main", "loop", 1, 1, 5),
+            ("main", "loop__potion_impl", 1, 10, 95),
+            ("ets", "lookup", 2, 10, 50),
+        ]
+        summary = summarize(rows, {"main": "main"}, top=5)
+        self.assertEqual(summary[0]["function"], "loop/1")
+        self.assertEqual(summary[0]["calls"], 11)
+        self.assertEqual(summary[0]["own_us"], 100)
+        self.assertEqual(summary[1]["module"], "ets (erlang)")
+
+        potion_only = summarize(rows, {"main": "main"}, potion_only=True)
+        self.assertEqual([entry["module"] for entry in potion_only], ["main"])
+
+    def test_build_profile_command(self):
+        command = build_profile_command("target", "fprof", "main", "main", 3, 5000, "/tmp/out.txt")
+        self.assertEqual(command[:4], ["erl", "-noshell", "-pa", "target"])
+        self.assertEqual(
+            command[5],
+            'potion_profile:run(fprof, main, main, 3, 5000, "/tmp/out.txt"), halt().',
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import glob
+import os
+import tempfile
+import unittest
+
+from cli.bench import (
+    build_bench_command,
+    collect_benchmarks,
+    compare_to_baseline,
+    parse_bench_rows,
+    summarize_rounds,
+)
+from cli.potionc import compile_file
+
+BEAM_BENCHMARKS = os.path.join(os.path.dirname(os.path.dirname(__file__)), "benchmarks", "beam")
+
+
+class TestBench(unittest.TestCase):
+    def test_parse_bench_rows(self):
+        rows = parse_bench_rows("ping_pong\tbench_ping_pong\t1\t2000\t1000000\nping_pong\tbench_ping_pong\t2\t3000\t1000000\n")
+        self.assertEqual(rows, {"ping_pong.bench_ping_pong": [(2000, 1000000), (3000, 1000000)]})
+
+    def test_summarize_rounds(self):
+        results = summarize_rounds({"m.bench_a": [(2000, 1000000), (3000, 1000000)]})
+        result = results["m.bench_a"]
+        self.assertEqual(result["ops_per_sec"], 2500.0)
+        self.assertEqual(result["min"], 2000.0)
+        self.assertEqual(result["max"], 3000.0)
+        self.assertEqual(result["rounds"], 2)
+        self.assertEqual(result["iterations"], 5000)
+        self.assertGreater(result["rsd_percent"], 0)
+
+    def test_compare_to_baseline_flags_slowdowns_over_threshold(self):
+        baseline = {"benchmarks": {"m.bench_a": {"ops_per_sec": 1000.0}, "m.bench_b": {"ops_per_sec": 1000.0}}}
+        results = {
+            "m.bench_a": {"ops_per_sec": 850.0},
+            "m.bench_b": {"ops_per_sec": 950.0},
+            "m.bench_new": {"ops_per_sec": 10.0},
+        }
+        rows = {row["benchmark"]: row for row in compare_to_baseline(results, baseline, 10)}
+        self.assertTrue(rows["m.bench_a"]["regression"])
+        self.assertEqual(rows["m.bench_a"]["change_percent"], -15.0)
+        self.assertFalse(rows["m.bench_b"]["regression"])
+        self.assertNotIn("m.bench_new", rows)
+
+    def test_build_bench_command(self):
+        command = build_bench_command("target", [("m", "bench_a"), ("n", "bench_b")], 500, 2000, 5, "/tmp/bench.txt")
+        self.assertEqual(command[:4], ["erl", "-noshell", "-pa", "target"])
+        self.assertIn('potion_bench:run([{m, bench_a}, {n, bench_b}], 500, 2000, 5, "/tmp/bench.txt")', command[-1])
+
+    def test_reference_benchmarks_compile_and_are_discovered(self):
+        sources = sorted(glob.glob(os.path.join(BEAM_BENCHMARKS, "*.potion")))
+        self.assertTrue(sources)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for source in sources:
+                result = compile_file(source, outdir=tmpdir, beam=False)
+                benchmarks = collect_benchmarks(result.modules)
+                self.assertTrue(benchmarks, source)
+                for module_name, function in benchmarks:
+                    with open(os.path.join(tmpdir, f"{module_name}.erl"), "r", encoding="utf-8") as f:
+                        self.assertIn(f"{function}/0", f.read())
+
+    def test_collect_benchmarks_applies_filter_and_rejects_parameters(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            source = os.path.join(tmpdir, "bench_demo.potion")
+            with open(source, "w", encoding="utf-8") as f:
+                f.write("fn bench_sum() {\n    1 + 2\n}\n\nfn bench_concat() {\n    \"a\" + \"b\"\n}\n")
+            result = compile_file(source, outdir=tmpdir, beam=False)
+            self.assertEqual(collect_benchmarks(result.modules, "sum"), [("bench_demo", "bench_sum")])
+
+            with open(source, "w", encoding="utf-8") as f:
+                f.write("fn bench_sum(n: int) {\n    n + 2\n}\n")
+            result = compile_file(source, outdir=tmpdir, beam=False)
+            with self.assertRaises(Exception):
+                collect_benchmarks(result.modules)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from benchmarks.compiler_bench import CompilerBenchmark, compare_results, run_benchmark
+from benchmarks.synthetic import ENTRY_MODULE, ProgramShape, generate_program, write_program
+from cli import potionc
+from cli.artifact_cache import CACHE_DIR_ENV
+from cli.module_loader import build_external_function_map, load_module_graph
+from codegen.potion_codegen import ErlangCodegen
+
+
+class TestSyntheticPrograms(unittest.TestCase):
+    def test_generator_is_deterministic(self):
+        shape = ProgramShape(modules=3, functions_per_module=4, seed=7)
+        self.assertEqual(generate_program(shape), generate_program(shape))
+        self.assertIn(f"{ENTRY_MODULE}.potion", generate_program(shape))
+
+    def test_generated_program_compiles(self):
+        shape = ProgramShape(
+            modules=3,
+            functions_per_module=6,
+            nesting_depth=3,
+            fanout=2,
+            match_density=1.0,
+            receive_density=1.0,
+        )
+        with tempfile.TemporaryDirectory() as tmpdir:
+            entry_path = write_program(tmpdir, shape)
+            entry_module, loaded_modules = load_module_graph(entry_path)
+            self.assertEqual(len(loaded_modules), 4)
+
+            modules_by_source_name = {module.source_name: module for module in loaded_modules}
+            for loaded_module in loaded_modules:
+                code = ErlangCodegen(
+                    loaded_module.ast,
+                    module_name=loaded_module.module_name,
+                    external_functions=build_external_function_map(loaded_module, modules_by_source_name),
+                ).generate()
+                self.assertIn(f"-module({loaded_module.module_name}).", code)
+
+    def test_run_benchmark_reports_every_phase(self):
+        result = run_benchmark(ProgramShape(modules=1, functions_per_module=2), repeat=1, warmup=0)
+        self.assertEqual(
+            set(result["phases"]),
+            {"tokenize", "parse", "load_module_graph", "codegen", "potionc"},
+        )
+        self.assertEqual(result["size"]["modules"], 2)
+
+    def test_potionc_phase_rebuilds_every_repetition(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            entry_path = write_program(os.path.join(tmpdir, "src"), ProgramShape(modules=1, functions_per_module=2))
+            benchmark = CompilerBenchmark(entry_path, os.path.join(tmpdir, "out"))
+            with mock.patch.dict(os.environ, {CACHE_DIR_ENV: os.path.join(tmpdir, "cache")}):
+                with mock.patch.object(potionc, "compile_file", wraps=potionc.compile_file) as compile_file:
+                    benchmark.run_potionc()
+                    benchmark.run_potionc()
+                self.assertEqual(os.environ[CACHE_DIR_ENV], os.path.join(tmpdir, "cache"))
+            self.assertFalse(os.path.exists(os.path.join(tmpdir, "cache")))
+
+        self.assertEqual([call.kwargs["incremental"] for call in compile_file.call_args_list], [False, False])
+
+    def test_compare_flags_regressions(self):
+        baseline = {"phases": {"parse": {"median_s": 1.0, "peak_kib": 100.0}}}
+        current = {"phases": {"parse": {"median_s": 1.5, "peak_kib": 100.0}}}
+        rows = compare_results(current, baseline, threshold_percent=10)
+        self.assertTrue(rows[0]["regression"])
+        self.assertEqual(rows[0]["median_s"]["change_percent"], 50.0)
+
+        rows = compare_results(baseline, baseline, threshold_percent=10)
+        self.assertFalse(rows[0]["regression"])
+
+
+if __name__ == "__main__":
+    unittest.main()
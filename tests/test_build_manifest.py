@@ -0,0 +1,83 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from cli.build_manifest import build_manifest, escape_make_path, write_depfile, write_manifest
+from cli.potionc import compile_file
+from codegen.potion_codegen import runtime_module_path
+
+
+def write_file(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+    return path
+
+
+class TestBuildManifest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        root = self.tmpdir.name
+        self.text = write_file(os.path.join(root, "text.potion"), "pub fn shout(s: str) {\n    s\n}\n")
+        self.helpers = write_file(
+            os.path.join(root, "helpers.potion"),
+            "import text\n\npub fn greet() {\n    shout(\"hi\")\n}\n",
+        )
+        self.main = write_file(os.path.join(root, "my-app.potion"), "import helpers\n\nfn main() {\n    greet()\n}\n")
+        self.outdir = os.path.join(root, "out")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def compile(self, **options):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return compile_file(self.main, outdir=self.outdir, beam=False, **options)
+
+    def test_depfile_lists_transitive_inputs_for_each_output(self):
+        result = self.compile(instrument=("calls",))
+        depfile = os.path.join(self.outdir, "build.d")
+        write_depfile(depfile, result)
+        with open(depfile, encoding="utf-8") as f:
+            content = f.read()
+
+        out = self.outdir
+        self.assertIn(
+            f"{out}/my_app.erl {out}/my_app.potioni: \\\n  {self.main} \\\n  {self.helpers} \\\n  {self.text}\n",
+            content,
+        )
+        self.assertIn(f"{out}/text.erl {out}/text.potioni: \\\n  {self.text}\n", content)
+        self.assertIn(f"{out}/potion_instrument.erl: \\\n  {runtime_module_path('potion_instrument')}\n", content)
+        self.assertTrue(content.endswith(f"{self.helpers}:\n{self.text}:\n{runtime_module_path('potion_instrument')}:\n"))
+
+    def test_manifest_describes_graph_names_and_artifacts(self):
+        self.compile()
+        result = self.compile(tree_shake=True)
+        manifest_file = os.path.join(self.outdir, "potion-manifest.json")
+        write_manifest(manifest_file, result)
+        with open(manifest_file, encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        self.assertEqual(manifest["entry"], "my-app")
+        self.assertEqual(manifest["build_order"], ["text", "helpers", "my-app"])
+        modules = {module["name"]: module for module in manifest["modules"]}
+        self.assertEqual(modules["my-app"]["module_name"], "my_app")
+        self.assertEqual(modules["my-app"]["imports"], ["helpers"])
+        self.assertEqual(modules["my-app"]["inputs"], [self.main, self.helpers, self.text])
+        self.assertEqual(
+            modules["helpers"]["outputs"],
+            [os.path.join(self.outdir, "helpers.erl"), os.path.join(self.outdir, "helpers.potioni")],
+        )
+        self.assertEqual(manifest["runtime_modules"], [])
+        self.assertEqual(manifest, build_manifest(result))
+
+    def test_manifest_reports_reused_modules(self):
+        self.compile()
+        write_file(self.text, "pub fn shout(s: str) {\n    s + \"!\"\n}\n")
+        statuses = {module["name"]: module["status"] for module in build_manifest(self.compile())["modules"]}
+        self.assertEqual(statuses, {"my-app": "reused", "helpers": "reused", "text": "generated"})
+
+    def test_escape_make_path(self):
+        self.assertEqual(escape_make_path("my dir/a#b$c.potion"), "my\\ dir/a\\#b$$c.potion")
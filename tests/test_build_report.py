@@ -0,0 +1,92 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from cli.build_report import BuildReport, count_ast_nodes
+from cli.module_loader import load_module_graph
+from cli.potionc import compile_file
+from lexer.potion_lexer import tokenize
+from parser.potion_parser import Parser
+
+
+def write_modules(tmpdir):
+    with open(os.path.join(tmpdir, "helpers.potion"), "w", encoding="utf-8") as f:
+        f.write(
+            """
+            fn greet(name: str) {
+                print(name)
+            }
+            """
+        )
+    main_path = os.path.join(tmpdir, "main.potion")
+    with open(main_path, "w", encoding="utf-8") as f:
+        f.write(
+            """
+            import helpers
+            fn main() {
+                greet("Bruce")
+            }
+            """
+        )
+    return main_path
+
+
+class TestBuildReport(unittest.TestCase):
+    def test_count_ast_nodes(self):
+        ast = Parser(tokenize("fn main() { val x = 1 + 2 }")).parse()
+        # Program, FunctionDef, ValDeclaration, BinaryOp, LiteralInt x2
+        self.assertEqual(count_ast_nodes(ast), 6)
+
+    def test_load_module_graph_records_lex_and_parse(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            report = BuildReport(trace_memory=False)
+            load_module_graph(write_modules(tmpdir), report=report)
+
+        self.assertEqual(set(report.modules), {"main", "helpers"})
+        for data in report.modules.values():
+            self.assertEqual(set(data["phases"]), {"lex", "parse"})
+            self.assertGreater(data["tokens"], 0)
+            self.assertGreater(data["ast_nodes"], 0)
+
+    def test_compile_file_reports_every_phase(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            report = BuildReport()
+            with contextlib.redirect_stdout(io.StringIO()):
+                compile_file(
+                    write_modules(tmpdir),
+                    outdir=os.path.join(tmpdir, "out"),
+                    beam=False,
+                    report=report,
+                    optimize=2,
+                    erlc_flags=("+deterministic",),
+                )
+
+            report_path = os.path.join(tmpdir, "report.json")
+            report.write_json(report_path)
+            with open(report_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+
+        main = next(module for module in data["modules"] if module["module"] == "main")
+        self.assertEqual(set(main["phases"]), {"lex", "parse", "semantic", "codegen", "write"})
+        self.assertIn("peak_kib", main["phases"]["codegen"])
+        self.assertGreater(main["emitted_lines"], 0)
+        self.assertIn("load_module_graph", data["build"]["phases"])
+        self.assertNotIn("erlc", data["build"]["phases"])
+        self.assertEqual(
+            data["build"]["options"],
+            {"optimize": 2, "erlc_flags": ["+deterministic"], "tree_shake": False},
+        )
+        self.assertIsNotNone(data["total_seconds"])
+        self.assertGreater(data["peak_kib"], 0)
+
+        table = report.format_table()
+        self.assertIn("semantic ms", table)
+        self.assertIn("total", table)
+        self.assertIn("optimize=2", table)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -511,3 +511,328 @@ class TestCodegen(unittest.TestCase):
 
         self.assertIn("{ok, Payload} ->", erlang_code)
         self.assertIn("{error, Payload_Match1} ->", erlang_code)
+
+    def test_table_builtins_codegen(self):
+        code = """
+        fn count(key, value, acc) {
+            return acc + value
+        }
+
+        fn main() {
+            val cache: table = table_new(:feature_cache, {read_concurrency: true, decentralized_counters: true})
+            table_put(cache, "checkout", true)
+            val cached = table_get(cache, "checkout")
+            table_update_counter(cache, :hits, 1)
+            table_delete(cache, "checkout")
+            val total = table_fold(cache, :count, 0)
+            print(total)
+        }
+        """
+        erlang_code = ErlangCodegen(Parser(tokenize(code)).parse()).generate()
+
+        self.assertIn(
+            "Cache = potion_table_new_builtin(feature_cache, #{read_concurrency => true, decentralized_counters => true})",
+            erlang_code,
+        )
+        self.assertIn('ets:insert(Cache, {"checkout", true})', erlang_code)
+        self.assertIn('Cached = potion_table_get_builtin(Cache, "checkout")', erlang_code)
+        self.assertIn("potion_table_update_counter_builtin(Cache, hits, 1)", erlang_code)
+        self.assertIn('ets:delete(Cache, "checkout")', erlang_code)
+        self.assertIn(
+            "ets:foldl(fun ({PotionKey, PotionValue}, PotionAcc) -> count(PotionKey, PotionValue, PotionAcc) end, 0, Cache)",
+            erlang_code,
+        )
+        self.assertIn("potion_table_new_builtin(Name, Opts) when is_map(Opts) ->", erlang_code)
+        self.assertIn("ets:update_counter(Table, Key, Increment, {Key, 0}).", erlang_code)
+
+    def test_table_helpers_are_emitted_only_when_used(self):
+        code = """
+        fn main() {
+            table_put(:feature_cache, "checkout", true)
+        }
+        """
+        erlang_code = ErlangCodegen(Parser(tokenize(code)).parse()).generate()
+
+        self.assertIn('ets:insert(feature_cache, {"checkout", true})', erlang_code)
+        self.assertNotIn("potion_table_new_builtin", erlang_code)
+        self.assertNotIn("potion_table_get_builtin", erlang_code)
+
+    def test_call_instrumentation_wraps_functions(self):
+        code = """
+        fn count_down(n: int) {
+            if n > 0 {
+                count_down(n - 1)
+            }
+        }
+
+        fn main() {
+            count_down(3)
+        }
+        """
+        codegen = ErlangCodegen(Parser(tokenize(code)).parse(), module_name="counter", instrument=("calls",))
+        erlang_code = codegen.generate()
+
+        self.assertIn("-export([count_down/1, main/0]).", erlang_code)
+        self.assertIn("-on_load(potion_instrument_init/0).", erlang_code)
+        self.assertIn("potion_instrument:register_module(?MODULE, [{count_down, 1}, {main, 0}]).", erlang_code)
+        self.assertIn("PotionStartedAt = potion_instrument:enter(?MODULE, 1),", erlang_code)
+        self.assertIn("PotionResult = count_down__potion_impl(PotionArg1),", erlang_code)
+        self.assertIn("count_down__potion_impl(N) ->", erlang_code)
+        # Recursão própria chama a _impl diretamente para manter a chamada de cauda.
+        self.assertIn(
+            "begin potion_instrument:enter(?MODULE, 1), count_down__potion_impl((N - 1)) end",
+            erlang_code,
+        )
+        self.assertIn("    count_down(3)", erlang_code)
+        self.assertEqual(codegen.runtime_modules_used, {"potion_instrument"})
+
+    def test_instrumentation_is_absent_by_default(self):
+        code = """
+        fn main() {
+            print("hi")
+        }
+        """
+        codegen = ErlangCodegen(Parser(tokenize(code)).parse())
+        erlang_code = codegen.generate()
+
+        self.assertNotIn("potion_instrument", erlang_code)
+        self.assertNotIn("__potion_impl", erlang_code)
+        self.assertEqual(codegen.runtime_modules_used, set())
+
+    def test_message_instrumentation_hooks_send_and_receive(self):
+        code = """
+        fn worker() {
+            receive {
+                on ping(payload, reply_to) {
+                    send(reply_to, {pong: payload})
+                }
+
+                on any {
+                    print("unexpected")
+                }
+            }
+        }
+        """
+        codegen = ErlangCodegen(Parser(tokenize(code)).parse(), instrument=("messages",))
+        erlang_code = codegen.generate()
+
+        self.assertIn("-on_load(potion_instrument_init/0).", erlang_code)
+        self.assertIn("    case potion_mailbox:start() of\n        ok -> ok;\n        {error, Reason} ->", erlang_code)
+        self.assertIn("            ok\n    end.\n", erlang_code)
+        self.assertIn("#{ping := Payload, reply_to := Reply_to} = PotionMessage1 ->", erlang_code)
+        self.assertIn("potion_mailbox:received(ping, PotionMessage1),", erlang_code)
+        self.assertIn("    PotionMessage2 ->", erlang_code)
+        self.assertIn("potion_mailbox:received(any, PotionMessage2),", erlang_code)
+        self.assertIn("potion_mailbox:send(Reply_to, pong, #{pong => Payload})", erlang_code)
+        self.assertNotIn("potion_instrument:register_module", erlang_code)
+        self.assertEqual(codegen.runtime_modules_used, {"potion_mailbox"})
+
+    def test_message_instrumentation_skips_modules_without_messages(self):
+        code = """
+        fn main() {
+            print("hi")
+        }
+        """
+        codegen = ErlangCodegen(Parser(tokenize(code)).parse(), instrument=("messages",))
+        erlang_code = codegen.generate()
+
+        self.assertNotIn("-on_load", erlang_code)
+        self.assertEqual(codegen.runtime_modules_used, set())
+
+    def test_file_attributes_map_functions_to_potion_lines(self):
+        code = "fn helper() {\n    return to_string(1)\n}\n\nfn main() {\n    helper()\n}\n"
+        codegen = ErlangCodegen(
+            Parser(tokenize(code)).parse(),
+            module_name="mapped",
+            source_path="src/mapped.potion",
+        )
+        lines = codegen.generate().split("\n")
+
+        helper_index = lines.index('-file("src/mapped.potion", 1).')
+        self.assertEqual(lines[helper_index + 1], "helper() ->")
+        main_index = lines.index('-file("src/mapped.potion", 5).')
+        self.assertEqual(lines[main_index + 1], "main() ->")
+        # Os helpers gerados voltam para o .erl, com a linha física seguinte.
+        reset_index = next(i for i, line in enumerate(lines) if line.startswith('-file("mapped.erl"'))
+        self.assertEqual(lines[reset_index], f'-file("mapped.erl", {reset_index + 2}).')
+
+    def test_file_attributes_keep_body_lines_aligned(self):
+        code = (
+            "fn average(total, count) {\n"
+            "    if count == 0 {\n"
+            "        return 0\n"
+            "    } else {\n"
+            "        return total / count\n"
+            "    }\n"
+            "}\n"
+            "\n"
+            "fn main() {\n"
+            "    val a = average(1, 0)\n"
+            "\n"
+            "\n"
+            "    print(a)\n"
+            "}\n"
+        )
+        for instrument in ((), ("calls",)):
+            codegen = ErlangCodegen(
+                Parser(tokenize(code)).parse(),
+                module_name="mapped",
+                source_path="mapped.potion",
+                instrument=instrument,
+            )
+            lines = codegen.generate().split("\n")
+
+            def source_line(fragment):
+                # Linha do .potion para onde o último -file antes do trecho aponta.
+                index = next(i for i, line in enumerate(lines) if fragment in line)
+                file_index = max(i for i in range(index) if lines[i].startswith("-file("))
+                return int(lines[file_index].rsplit(", ", 1)[1][:-2]) + index - file_index - 1
+
+            self.assertEqual(source_line("true -> 0"), 3)
+            self.assertEqual(source_line("(Total div Count)"), 5)
+            self.assertEqual(source_line("A = average(1, 0)"), 10)
+            self.assertEqual(source_line("io:format"), 13)
+            self.assertNotIn("\0", "\n".join(lines))
+
+    def test_file_attributes_are_absent_without_source_path(self):
+        erlang_code = ErlangCodegen(Parser(tokenize("fn main() {}")).parse()).generate()
+        self.assertNotIn("-file(", erlang_code)
+
+    HOT_RELOAD_LOOP = """
+        fn counter(count: int) {
+            receive {
+                on increment(amount) {
+                    counter(count + amount)
+                }
+                on stop(reason) {
+                    reason
+                }
+            }
+        }
+
+        fn main() {
+            val pid = sp counter(0)
+            send(pid, {increment: 1})
+            helper()
+        }
+
+        fn helper() {
+            print("started")
+        }
+        """
+
+    def test_hot_reload_qualifies_tail_calls_in_receive_clauses(self):
+        erlang_code = ErlangCodegen(Parser(tokenize(self.HOT_RELOAD_LOOP)).parse(), hot_reload=True).generate()
+
+        self.assertIn("?MODULE:counter((Count + Amount))", erlang_code)
+        # Chamadas fora de receive continuam locais.
+        self.assertIn("    helper().", erlang_code)
+        self.assertNotIn("potion_upgrade", erlang_code)
+
+        default_code = ErlangCodegen(Parser(tokenize(self.HOT_RELOAD_LOOP)).parse()).generate()
+        self.assertNotIn("?MODULE:counter", default_code)
+
+    def test_hot_reload_exports_instrumented_impl(self):
+        erlang_code = ErlangCodegen(
+            Parser(tokenize(self.HOT_RELOAD_LOOP)).parse(), hot_reload=True, instrument=("calls",)
+        ).generate()
+
+        self.assertIn("-export([counter/1, main/0, helper/0, counter__potion_impl/1]).", erlang_code)
+        self.assertIn(
+            "begin potion_instrument:enter(?MODULE, 1), ?MODULE:counter__potion_impl((Count + Amount)) end",
+            erlang_code,
+        )
+
+    def test_upgrade_hooks_hand_loop_state_to_code_change(self):
+        erlang_code = ErlangCodegen(Parser(tokenize(self.HOT_RELOAD_LOOP)).parse(), upgrade_hooks=True).generate()
+
+        self.assertIn("-export([counter/1, main/0, helper/0, potion_code_change/2]).", erlang_code)
+        self.assertIn("    #{potion_upgrade := PotionUpgradeFrom} ->", erlang_code)
+        self.assertIn("        PotionUpgradeFrom ! #{potion_upgraded => self()},", erlang_code)
+        self.assertIn("?MODULE:potion_code_change(counter, [Count]);", erlang_code)
+        self.assertIn("?MODULE:counter((Count + Amount))", erlang_code)
+        self.assertIn("potion_code_change(Function, Args) ->\n    erlang:apply(?MODULE, Function, Args).", erlang_code)
+
+        with_code_change = self.HOT_RELOAD_LOOP + """
+        fn code_change(function, args) {
+            {function, args}
+        }
+        """
+        erlang_code = ErlangCodegen(Parser(tokenize(with_code_change)).parse(), upgrade_hooks=True).generate()
+        self.assertIn("    {NewFunction, NewArgs} = code_change(Function, Args),", erlang_code)
+
+    def test_optimization_levels_emit_compile_attributes(self):
+        code = "fn double(x) {\n    x * 2\n}\n\nfn main() {\n    double(2)\n}\n"
+        default_code = ErlangCodegen(Parser(tokenize(code)).parse()).generate()
+        self.assertNotIn("-compile(", default_code)
+
+        lines = ErlangCodegen(Parser(tokenize(code)).parse(), optimize=2).generate().split("\n")
+        export_index = lines.index("-export([double/1, main/0]).")
+        self.assertEqual(lines[export_index + 1], "-compile([inline, {inline_size, 48}, inline_list_funcs]).")
+        self.assertEqual(lines[export_index + 2], "")
+
+        with self.assertRaises(Exception):
+            ErlangCodegen(Parser(tokenize(code)).parse(), optimize=4)
+
+    VISIBILITY_MODULE = """
+        pub fn greet(name) {
+            print(format(name))
+        }
+
+        fn format(name) {
+            "Hello " + name
+        }
+
+        fn unused() {
+            print(to_string(1))
+        }
+
+        fn main() {
+            greet("Bruce")
+        }
+        """
+
+    def test_pub_functions_limit_exports_and_drop_unreachable_private_functions(self):
+        codegen = ErlangCodegen(Parser(tokenize(self.VISIBILITY_MODULE)).parse())
+        erlang_code = codegen.generate()
+
+        self.assertIn("-export([greet/1, main/0]).", erlang_code)
+        self.assertIn("format(Name) ->", erlang_code)
+        self.assertNotIn("unused()", erlang_code)
+        # Helpers usados só pela função descartada também somem.
+        self.assertNotIn("to_string(", erlang_code)
+        self.assertEqual(codegen.dropped_functions, ["unused"])
+
+    def test_call_instrumentation_only_registers_emitted_functions(self):
+        erlang_code = ErlangCodegen(Parser(tokenize(self.VISIBILITY_MODULE)).parse(), instrument=("calls",)).generate()
+
+        self.assertIn("potion_instrument:register_module(?MODULE, [{greet, 1}, {format, 1}, {main, 0}]).", erlang_code)
+        self.assertNotIn("unused", erlang_code)
+
+    def test_dropped_functions_are_still_validated(self):
+        code = "pub fn main() {}\n\nfn unused() {\n    val x = 1\n    x = 2\n}\n"
+
+        with self.assertRaises(Exception):
+            ErlangCodegen(Parser(tokenize(code)).parse()).generate()
+
+    def test_modules_without_pub_export_every_function(self):
+        code = "fn helper() {\n    1\n}\n\nfn main() {}\n"
+        codegen = ErlangCodegen(Parser(tokenize(code)).parse())
+
+        self.assertIn("-export([helper/0, main/0]).", codegen.generate())
+        self.assertEqual(codegen.dropped_functions, [])
+
+    def test_upgrade_hooks_keep_private_code_change(self):
+        code = self.HOT_RELOAD_LOOP.replace("fn main()", "pub fn main()") + """
+        fn code_change(function, args) {
+            {function, args}
+        }
+        """
+        erlang_code = ErlangCodegen(Parser(tokenize(code)).parse(), upgrade_hooks=True).generate()
+
+        self.assertIn("-export([main/0, potion_code_change/2, counter/1]).", erlang_code)
+        self.assertIn("code_change(Function, Args) ->", erlang_code)
+
+    def test_unknown_instrumentation_is_rejected(self):
+        with self.assertRaises(Exception):
+            ErlangCodegen(Parser(tokenize("fn main() {}")).parse(), instrument=("memory",))
@@ -0,0 +1,30 @@
+import unittest
+
+from cli.import_scanner import scan_import_header
+
+
+class TestImportScanner(unittest.TestCase):
+    def test_scans_leading_imports(self):
+        source = """
+        // helpers first
+        import helpers
+        import erlang lists
+
+        import erlang_utils
+        fn main() {
+            import_helper()
+        }
+        """
+        header = scan_import_header(source)
+
+        self.assertEqual(header.imports, ["helpers", "erlang_utils"])
+        self.assertEqual(header.erlang_imports, ["lists"])
+
+    def test_stops_at_first_declaration(self):
+        header = scan_import_header("val x = 1\nimport helpers\n")
+
+        self.assertEqual(header.imports, [])
+        self.assertEqual(header.erlang_imports, [])
+
+    def test_bare_import_erlang_is_left_to_the_parser(self):
+        self.assertEqual(scan_import_header("import erlang").imports, [])
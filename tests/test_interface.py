@@ -0,0 +1,123 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from cli.interface import InterfaceStore, build_interface, interface_hash
+from cli.module_loader import load_module_graph
+from cli.potionc import compile_file, emit_erlang_modules
+from codegen.potion_codegen import ErlangCodegen
+
+HELPERS = """
+pub fn double(x: int) {
+    x * 2
+}
+
+pub fn describe(x: int) {
+    if x > 0 {
+        "positive"
+    } else {
+        0
+    }
+}
+
+pub fn greeting() {
+    "hello " + name()
+}
+
+fn name() {
+    "potion"
+}
+"""
+
+MAIN = """
+import helpers
+
+fn main() {
+    val doubled = double(21)
+    print(doubled)
+}
+"""
+
+
+def write_program(tmpdir, helpers=HELPERS, main=MAIN):
+    with open(os.path.join(tmpdir, "helpers.potion"), "w", encoding="utf-8") as f:
+        f.write(helpers)
+    main_path = os.path.join(tmpdir, "main.potion")
+    with open(main_path, "w", encoding="utf-8") as f:
+        f.write(main)
+    return main_path
+
+
+def compile_quietly(main_path, outdir, **options):
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        compile_file(main_path, outdir=outdir, beam=False, **options)
+    return output.getvalue()
+
+
+class TestInterface(unittest.TestCase):
+    def test_interface_lists_public_functions_with_return_types(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            _, loaded_modules = load_module_graph(write_program(tmpdir))
+        helpers = loaded_modules[1]
+        codegen = ErlangCodegen(helpers.ast, module_name=helpers.module_name)
+        codegen.generate()
+
+        interface = build_interface(helpers, codegen)
+
+        self.assertEqual(
+            [(function["name"], function["return_type"]) for function in interface["functions"]],
+            [("double", "int"), ("describe", "dynamic"), ("greeting", "dynamic")],
+        )
+        self.assertEqual(interface["functions"][0]["params"], [{"name": "x", "type": "int"}])
+        self.assertEqual(interface["hash"], interface_hash(interface))
+
+    def test_importers_use_interface_return_types(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            _, loaded_modules = load_module_graph(write_program(tmpdir))
+            with contextlib.redirect_stdout(io.StringIO()):
+                sources, _ = emit_erlang_modules(loaded_modules)
+            self.assertIn("Doubled = helpers:double(21)", sources[0][1])
+
+            wrong_type = MAIN.replace("val doubled = double(21)", "val doubled: str = double(21)")
+            _, loaded_modules = load_module_graph(write_program(tmpdir, main=wrong_type))
+            with self.assertRaisesRegex(Exception, "esperado str, mas recebeu int"):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    emit_erlang_modules(loaded_modules)
+
+    def test_importers_are_reused_until_an_interface_changes(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            outdir = os.path.join(tmpdir, "out")
+            main_path = write_program(tmpdir)
+            first = compile_quietly(main_path, outdir)
+            self.assertIn("Erlang file generated", first)
+            with open(os.path.join(outdir, "helpers.potioni"), encoding="utf-8") as f:
+                stored = json.load(f)
+            self.assertEqual(stored["stamp"]["imports"], {})
+
+            second = compile_quietly(main_path, outdir)
+            self.assertIn("♻️ main is up to date", second)
+            self.assertIn("♻️ helpers is up to date", second)
+
+            # Mudança só na implementação: main continua valendo.
+            write_program(tmpdir, helpers=HELPERS.replace('"potion"', '"beam"'))
+            third = compile_quietly(main_path, outdir)
+            self.assertIn("♻️ main is up to date", third)
+            self.assertIn("helpers.erl", third)
+
+            # Mudança na interface: main é gerado de novo.
+            write_program(tmpdir, helpers=HELPERS.replace("x * 2", '"twice"'))
+            fourth = compile_quietly(main_path, outdir)
+            self.assertNotIn("up to date", fourth)
+
+            self.assertNotIn("up to date", compile_quietly(main_path, outdir, incremental=False))
+            self.assertIn("up to date", compile_quietly(main_path, outdir, optimize=0))
+            self.assertNotIn("main is up to date", compile_quietly(main_path, outdir, optimize=1))
+
+    def test_in_memory_store_never_reuses(self):
+        store = InterfaceStore()
+        self.assertFalse(store.reuse)
+        self.assertIsNone(store.reusable(None, {}))
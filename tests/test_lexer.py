@@ -1,3 +1,4 @@
+import pickle
 import unittest
 from parser.potion_parser import tokenize
 
@@ -75,3 +76,22 @@ class TestLexer(unittest.TestCase):
 
         thin_arrow_tokens = tokenize('match value { 0 -> "zero" }')
         self.assertNotIn("ARROW", [kind for kind, _ in thin_arrow_tokens])
+
+    def test_tokens_record_line_and_column(self):
+        tokens = tokenize('fn main() {\n    // comment\n    val x = "a"\n}')
+        val_token = tokens[5]
+        self.assertEqual(val_token, ("VAL", "val"))
+        self.assertEqual((val_token.line, val_token.column), (3, 5))
+        self.assertEqual((tokens[0].line, tokens[0].column), (1, 1))
+        self.assertEqual((tokens[-1].line, tokens[-1].column), (4, 1))
+
+    def test_tokens_survive_pickling(self):
+        token = tokenize("fn main() {\n    val x = 1\n}")[5]
+        restored = pickle.loads(pickle.dumps(token))
+        self.assertEqual(restored, ("VAL", "val"))
+        self.assertEqual((restored.line, restored.column), (2, 5))
+
+    def test_pub_keyword_token(self):
+        tokens = tokenize("pub fn greet() {}")
+        self.assertEqual(tokens[:2], [("PUB", "pub"), ("FN", "fn")])
+        self.assertEqual(tokenize("pub_sub")[0], ("ID", "pub_sub"))
@@ -0,0 +1,153 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from cli.interface import InterfaceStore, ast_interface
+from cli.module_index import INDEX_FILE, ModuleIndex, SearchPaths, hash_source, module_search_paths
+from cli.module_loader import load_module_graph
+from cli.potionc import (
+    emit_erlang_modules,
+    install_library_modules,
+    load_program,
+    module_codegen_options,
+    precompiled_library_modules,
+)
+
+
+def write_file(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+    return path
+
+
+class TestModuleIndex(unittest.TestCase):
+    def test_search_paths_combine_cli_project_file_and_environment(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            write_file(os.path.join(tmpdir, "potion.json"), json.dumps({"paths": ["src"], "libs": ["lib"]}))
+            entry = write_file(os.path.join(tmpdir, "app", "main.potion"), "fn main() {}\n")
+
+            search_paths = module_search_paths(
+                entry,
+                include_dirs=["vendor"],
+                lib_dirs=["/opt/potion"],
+                environ={"POTION_PATH": os.pathsep.join(["/shared", ""])},
+            )
+
+        self.assertEqual(
+            search_paths.paths,
+            [os.path.abspath("vendor"), os.path.join(tmpdir, "src"), os.path.abspath("/shared")],
+        )
+        self.assertEqual(search_paths.libs, [os.path.abspath("/opt/potion"), os.path.join(tmpdir, "lib")])
+
+    def test_index_is_persisted_and_relisted_when_a_directory_changes(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            src = os.path.join(tmpdir, "src")
+            helper = write_file(os.path.join(src, "helpers.potion"), "fn greet() {}\n")
+            index_path = os.path.join(tmpdir, "target", ".potion_index.json")
+
+            index = ModuleIndex.load(index_path)
+            self.assertEqual(index.find("helpers", [src]), (helper, src))
+            index.save()
+
+            reloaded = ModuleIndex.load(index_path)
+            self.assertEqual(reloaded.find("helpers", [src]), (helper, src))
+            self.assertFalse(reloaded.changed)
+
+            time.sleep(0.01)
+            extra = write_file(os.path.join(src, "extra.potion"), "fn extra() {}\n")
+            self.assertEqual(reloaded.find("extra", [src]), (extra, src))
+            self.assertIsNone(reloaded.find("missing", [src])[0])
+
+    def test_load_module_graph_uses_search_paths_and_marks_libraries(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            entry = write_file(os.path.join(tmpdir, "app", "main.potion"), "import text\nimport json_lib\nfn main() {}\n")
+            write_file(os.path.join(tmpdir, "src", "text.potion"), "fn shout() {}\n")
+            write_file(os.path.join(tmpdir, "lib", "json_lib.potion"), "fn encode() {}\n")
+            search_paths = SearchPaths(paths=[os.path.join(tmpdir, "src")], libs=[os.path.join(tmpdir, "lib")])
+
+            _, loaded_modules = load_module_graph(entry, search_paths=search_paths)
+            with self.assertRaisesRegex(Exception, "Módulo não encontrado: text.potion"):
+                load_module_graph(entry)
+
+        self.assertEqual([module.source_name for module in loaded_modules], ["main", "text", "json_lib"])
+        self.assertEqual([module.library for module in loaded_modules], [False, False, True])
+        self.assertTrue(all(len(module.source_hash) == 64 for module in loaded_modules))
+
+    def test_load_program_without_save_index_writes_nothing(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            entry = write_file(os.path.join(tmpdir, "main.potion"), "import text\nfn main() {}\n")
+            write_file(os.path.join(tmpdir, "text.potion"), "fn shout() {}\n")
+            outdir = os.path.join(tmpdir, "out")
+
+            load_program(entry, outdir, save_index=False)
+            self.assertFalse(os.path.exists(outdir))
+            load_program(entry, outdir)
+            self.assertTrue(os.path.isfile(os.path.join(outdir, INDEX_FILE)))
+
+    def test_source_hash_follows_content_when_mtime_is_unchanged(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            entry = write_file(os.path.join(tmpdir, "main.potion"), "fn main() {}\n")
+            stat = os.stat(entry)
+            index = ModuleIndex()
+            first, _ = load_module_graph(entry, index=index)
+
+            write_file(entry, "fn main() {\n    1\n}\n")
+            os.utime(entry, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+            second, _ = load_module_graph(entry, index=index)
+
+        self.assertNotEqual(first.source_hash, second.source_hash)
+        self.assertEqual(second.source_hash, hash_source("fn main() {\n    1\n}\n"))
+
+    def test_precompiled_library_modules_are_reused(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            entry = write_file(os.path.join(tmpdir, "app", "main.potion"), "import json_lib\nfn main() {\n    encode()\n}\n")
+            write_file(os.path.join(tmpdir, "lib", "json_lib.potion"), "fn encode() {}\n")
+            search_paths = SearchPaths(libs=[os.path.join(tmpdir, "lib")])
+            _, loaded_modules = load_module_graph(entry, search_paths=search_paths)
+            build_key = {"beam": True, "erlc_flags": [], "compiler": "test"}
+            options = {"optimize": 0, "source_root": tmpdir}
+            self.assertEqual(precompiled_library_modules(loaded_modules, options, build_key), [])
+
+            library_beam = write_file(os.path.join(tmpdir, "lib", "json_lib.beam"), "beam")
+            self.assertEqual(precompiled_library_modules(loaded_modules, options, build_key), [])
+
+            library_module = next(module for module in loaded_modules if module.library)
+            stamp = InterfaceStore(build_key=build_key).stamp(library_module, module_codegen_options(library_module, **options))
+            write_file(
+                os.path.join(tmpdir, "lib", "json_lib.potioni"),
+                json.dumps({**ast_interface(library_module), "stamp": stamp}),
+            )
+            precompiled = precompiled_library_modules(loaded_modules, options, build_key)
+            self.assertEqual([module.source_name for module in precompiled], ["json_lib"])
+            # Outras opções de codegen ou outras flags do erlc não reaproveitam o .beam guardado por outro programa.
+            for other_options in (
+                {"optimize": 1},
+                {"instrument": ["calls"]},
+                {"hot_reload": True},
+                {"upgrade_hooks": True},
+                {"file_attributes": False},
+            ):
+                self.assertEqual(precompiled_library_modules(loaded_modules, {**options, **other_options}, build_key), [])
+            self.assertEqual(precompiled_library_modules(loaded_modules, options, {**build_key, "erlc_flags": ["+debug_info"]}), [])
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                sources, _ = emit_erlang_modules(loaded_modules, precompiled={"json_lib"})
+            self.assertEqual([module.source_name for module, _ in sources], ["main"])
+            self.assertIn("json_lib:encode()", sources[0][1])
+
+            outdir = os.path.join(tmpdir, "out")
+            write_file(os.path.join(outdir, "main.beam"), "main")
+            installed = install_library_modules(loaded_modules, precompiled, outdir, store=True)
+            self.assertEqual(installed, [os.path.join(outdir, "json_lib.beam")])
+            with open(installed[0], encoding="utf-8") as f:
+                self.assertEqual(f.read(), "beam")
+
+            os.remove(library_beam)
+            with contextlib.redirect_stdout(io.StringIO()):
+                install_library_modules(loaded_modules, [], outdir, store=True)
+            self.assertTrue(os.path.isfile(library_beam))
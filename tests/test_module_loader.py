@@ -1,8 +1,29 @@
+import contextlib
+import io
 import os
 import tempfile
 import unittest
+from unittest import mock
 
-from cli.module_loader import build_external_function_map, load_module_graph
+from cli.build_report import BuildReport
+from cli.module_loader import build_external_function_map, load_module_graph, reachable_module_functions
+from cli.potionc import compile_file
+
+
+def write_tree_shake_modules(tmpdir):
+    sources = {
+        "main": "import text\nimport unused\n\nfn main() {\n    shout(\"hi\")\n}\n",
+        "text": (
+            "fn shout(value) {\n    print(loud(value))\n}\n\n"
+            "fn loud(value) {\n    value + \"!\"\n}\n\n"
+            "fn whisper(value) {\n    print(value)\n}\n"
+        ),
+        "unused": "fn helper() {\n    1\n}\n",
+    }
+    for name, source in sources.items():
+        with open(os.path.join(tmpdir, f"{name}.potion"), "w", encoding="utf-8") as f:
+            f.write(source)
+    return os.path.join(tmpdir, "main.potion")
 
 
 class TestModuleLoader(unittest.TestCase):
@@ -38,3 +59,123 @@ class TestModuleLoader(unittest.TestCase):
             external_map = build_external_function_map(entry_module, modules_by_source_name)
             self.assertIn(("greet", 1), external_map)
             self.assertEqual(external_map[("greet", 1)]["module_name"], "helpers")
+
+    def test_external_map_only_contains_pub_functions(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with open(os.path.join(tmpdir, "helpers.potion"), "w", encoding="utf-8") as f:
+                f.write("pub fn greet() {\n    secret()\n}\n\nfn secret() {}\n")
+            main_path = os.path.join(tmpdir, "main.potion")
+            with open(main_path, "w", encoding="utf-8") as f:
+                f.write("import helpers\nfn main() {\n    greet()\n}\n")
+
+            entry_module, loaded_modules = load_module_graph(main_path)
+            modules_by_source_name = {module.source_name: module for module in loaded_modules}
+            external_map = build_external_function_map(entry_module, modules_by_source_name)
+
+            self.assertIn(("greet", 0), external_map)
+            self.assertNotIn(("secret", 0), external_map)
+
+    def test_reachable_module_functions_follow_calls_across_modules(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            entry_module, loaded_modules = load_module_graph(write_tree_shake_modules(tmpdir))
+
+        reachable = reachable_module_functions(entry_module, loaded_modules)
+        self.assertEqual(reachable, {"main": {"main"}, "text": {"shout", "loud"}})
+
+    def test_reachable_module_functions_requires_main(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            main_path = os.path.join(tmpdir, "main.potion")
+            with open(main_path, "w", encoding="utf-8") as f:
+                f.write("fn start() {}\n")
+            entry_module, loaded_modules = load_module_graph(main_path)
+
+        with self.assertRaises(Exception):
+            reachable_module_functions(entry_module, loaded_modules)
+
+    def test_compile_file_tree_shake_skips_unreachable_code(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            outdir = os.path.join(tmpdir, "out")
+            report = BuildReport(trace_memory=False)
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                result = compile_file(
+                    write_tree_shake_modules(tmpdir), outdir=outdir, beam=False, report=report, tree_shake=True
+                )
+
+            erlang_files = [name for name in sorted(os.listdir(outdir)) if name.endswith(".erl")]
+            self.assertEqual(erlang_files, ["main.erl", "text.erl"])
+            with open(os.path.join(outdir, "text.erl"), encoding="utf-8") as f:
+                text_code = f.read()
+
+        self.assertEqual(len(result.modules), 3)
+        self.assertIn("-export([shout/1, loud/1]).", text_code)
+        self.assertNotIn("whisper", text_code)
+        self.assertIn("🌳 Tree shaking removed module unused", output.getvalue())
+        self.assertIn("🌳 Tree shaking removed from text: whisper/1", output.getvalue())
+        self.assertTrue(report.modules["unused"]["removed"])
+        self.assertEqual(report.modules["text"]["dropped_functions"], ["whisper"])
+
+    def write_sources(self, tmpdir, sources):
+        for name, source in sources.items():
+            with open(os.path.join(tmpdir, f"{name}.potion"), "w", encoding="utf-8") as f:
+                f.write(source)
+        return os.path.join(tmpdir, "main.potion")
+
+    def test_load_module_graph_keeps_import_order_and_late_imports(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            main_path = self.write_sources(tmpdir, {
+                "main": "import a\nimport b\nfn main() {}\n",
+                "a": "fn a() {}\nimport c\n",
+                "b": "fn b() {}\n",
+                "c": "fn c() {}\n",
+            })
+            entry_module, loaded_modules = load_module_graph(main_path)
+
+        self.assertIs(entry_module, loaded_modules[0])
+        self.assertEqual([module.source_name for module in loaded_modules], ["main", "a", "c", "b"])
+        self.assertEqual(loaded_modules[1].imports, ["c"])
+
+    def test_load_module_graph_detects_cycles(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            main_path = self.write_sources(tmpdir, {
+                "main": "import a\nfn main() {}\n",
+                "a": "import b\n",
+                "b": "import a\n",
+            })
+
+            with self.assertRaisesRegex(Exception, "Import cíclico detectado"):
+                load_module_graph(main_path)
+
+    def test_load_module_graph_handles_deep_import_chains(self):
+        depth = 1200
+        sources = {"main": "import m1\nfn main() {}\n"}
+        for index in range(1, depth):
+            sources[f"m{index}"] = f"import m{index + 1}\n"
+        sources[f"m{depth}"] = "fn leaf() {}\n"
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            _, loaded_modules = load_module_graph(self.write_sources(tmpdir, sources))
+
+        self.assertEqual(len(loaded_modules), depth + 1)
+        self.assertEqual(loaded_modules[-1].source_name, f"m{depth}")
+
+    def test_parallel_parse_matches_serial_parse(self):
+        sources = {"main": "".join(f"import m{index}\n" for index in range(6)) + "fn main() {}\n"}
+        for index in range(6):
+            sources[f"m{index}"] = f"fn f{index}(x: int) {{\n    x + {index}\n}}\n"
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            main_path = self.write_sources(tmpdir, sources)
+            _, serial = load_module_graph(main_path)
+            # Fontes pequenas não passam do limite do pool; zerá-lo força o caminho paralelo.
+            with mock.patch("cli.module_loader.PARALLEL_PARSE_MIN_BYTES", 0):
+                _, parallel = load_module_graph(main_path, jobs=2)
+
+        self.assertEqual(
+            [(module.source_name, module.imports) for module in parallel],
+            [(module.source_name, module.imports) for module in serial],
+        )
+        self.assertEqual(
+            [[stmt.name for stmt in module.ast.statements if hasattr(stmt, "params")] for module in parallel],
+            [[stmt.name for stmt in module.ast.statements if hasattr(stmt, "params")] for module in serial],
+        )
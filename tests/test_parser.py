@@ -213,3 +213,26 @@ class TestParser(unittest.TestCase):
 
         with self.assertRaises(SyntaxError):
             Parser(tokenize(source)).parse()
+
+    def test_statements_record_source_lines(self):
+        source = "import helpers\n\nfn main() {\n    val x = 1\n\n    print(x)\n}\n"
+        program = Parser(tokenize(source)).parse()
+        import_stmt, function = program.statements
+
+        self.assertEqual(import_stmt.line, 1)
+        self.assertIsInstance(function, FunctionDef)
+        self.assertEqual(function.line, 3)
+        self.assertEqual([stmt.line for stmt in function.body], [4, 6])
+
+    def test_syntax_errors_report_line(self):
+        with self.assertRaisesRegex(SyntaxError, "at line 2"):
+            Parser(tokenize("fn main() {\n    val = 1\n}")).parse()
+
+    def test_pub_function_definition(self):
+        program = Parser(tokenize("pub fn greet() {}\nfn helper() {}")).parse()
+        public, private = program.statements
+
+        self.assertIsInstance(public, FunctionDef)
+        self.assertTrue(public.public)
+        self.assertEqual(public.line, 1)
+        self.assertFalse(private.public)
@@ -0,0 +1,73 @@
+import contextlib
+import io
+import os
+import pstats
+import tempfile
+import unittest
+from unittest import mock
+
+from cli.potionc import compile_file
+from cli.profiling import CompilerProfile, classify_subsystem
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestCompilerProfile(unittest.TestCase):
+    def test_classify_subsystem(self):
+        self.assertEqual(classify_subsystem(os.path.join(ROOT, "lexer", "potion_lexer.py")), "lexer")
+        self.assertEqual(classify_subsystem(os.path.join(ROOT, "semantic", "potion_semantic.py")), "semantic")
+        self.assertEqual(classify_subsystem(os.path.join(ROOT, "cli", "module_loader.py")), "loader")
+        self.assertEqual(classify_subsystem(os.path.join(ROOT, "cli", "potionc.py")), "cli")
+        self.assertEqual(classify_subsystem("~"), "other")
+        self.assertEqual(classify_subsystem("<string>"), "other")
+
+    def test_compile_file_under_profile(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            source_path = os.path.join(tmpdir, "main.potion")
+            with open(source_path, "w", encoding="utf-8") as f:
+                f.write(
+                    """
+                    fn main() {
+                        val total = 1 + 2
+                        print(total)
+                    }
+                    """
+                )
+
+            profile = CompilerProfile()
+            with contextlib.redirect_stdout(io.StringIO()):
+                compile_file(source_path, outdir=os.path.join(tmpdir, "out"), beam=False, profile=profile)
+
+            stats_path = os.path.join(tmpdir, "out.prof")
+            profile.dump(stats_path)
+            self.assertTrue(pstats.Stats(stats_path).stats)
+
+        summary = profile.summary(top=2)
+        for subsystem in ("lexer", "parser", "codegen", "loader"):
+            self.assertIn(subsystem, summary)
+            self.assertLessEqual(len(summary[subsystem]["functions"]), 2)
+        self.assertIn("lexer:", profile.format_summary(top=2))
+
+    def test_profiled_compile_parses_in_process(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for index in range(4):
+                with open(os.path.join(tmpdir, f"m{index}.potion"), "w", encoding="utf-8") as f:
+                    f.write(f"pub fn f{index}() {{\n    {index}\n}}\n")
+            source_path = os.path.join(tmpdir, "main.potion")
+            with open(source_path, "w", encoding="utf-8") as f:
+                f.write("".join(f"import m{index}\n" for index in range(4)) + "fn main() {}\n")
+
+            profile = CompilerProfile()
+            with mock.patch("cli.module_loader.PARALLEL_PARSE_MIN_BYTES", 0):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    compile_file(source_path, outdir=os.path.join(tmpdir, "out"), beam=False, profile=profile, jobs=4)
+
+        parse_calls = [
+            calls for (filename, _, function), (_, calls, _, _, _) in profile.stats().stats.items()
+            if function == "parse" and filename.endswith("potion_parser.py")
+        ]
+        self.assertEqual(parse_calls, [5])
+
+
+if __name__ == "__main__":
+    unittest.main()
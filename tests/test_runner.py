@@ -0,0 +1,81 @@
+import os
+import socket
+import struct
+import tempfile
+import threading
+import unittest
+
+from cli.runner import RunnerClient, RunnerError, port_file_path, read_port
+
+
+def serve_replies(listener, replies, requests):
+    connection, _ = listener.accept()
+    with connection:
+        for reply in replies:
+            (size,) = struct.unpack(">I", connection.recv(4, socket.MSG_WAITALL))
+            requests.append(connection.recv(size, socket.MSG_WAITALL).decode("utf-8"))
+            connection.sendall(struct.pack(">I", len(reply)) + reply)
+
+
+class TestRunnerClient(unittest.TestCase):
+    def client_with_replies(self, replies):
+        listener = socket.create_server(("127.0.0.1", 0))
+        self.addCleanup(listener.close)
+        requests = []
+        thread = threading.Thread(target=serve_replies, args=(listener, replies, requests), daemon=True)
+        thread.start()
+        client = RunnerClient(listener.getsockname()[1], timeout=5)
+        self.addCleanup(client.close)
+        return client, requests
+
+    def test_run_splits_value_and_output(self):
+        client, requests = self.client_with_replies([b'ok\t2\tok"Potion"\n'])
+        result = client.run([("demo", "main"), ("potion_instrument", "report")], timeout_ms=500)
+        self.assertEqual(requests, ["run\t500\tdemo:main\tpotion_instrument:report"])
+        self.assertEqual(result.value, "ok")
+        self.assertEqual(result.output, '"Potion"\n')
+
+    def test_error_reply_raises_with_output(self):
+        client, _ = self.client_with_replies([b"error\t7\ttimeoutpartial"])
+        with self.assertRaises(RunnerError) as raised:
+            client.run([("demo", "main")])
+        self.assertEqual(raised.exception.reason, "timeout")
+        self.assertEqual(raised.exception.output, "partial")
+
+    def test_load_directory_reports_changed_modules(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for name in ("a", "b", "potion_runner"):
+                open(os.path.join(tmpdir, f"{name}.beam"), "wb").close()
+            client, requests = self.client_with_replies([b"ok\t6\tloaded", b"ok\t9\tunchanged"])
+            self.assertEqual(client.load_directory(tmpdir), ["a"])
+            self.assertEqual([request.split("\t")[:2] for request in requests], [["load", "a"], ["load", "b"]])
+
+    def test_read_port(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            self.assertIsNone(read_port(port_file_path(tmpdir)))
+            with open(port_file_path(tmpdir), "w", encoding="utf-8") as f:
+                f.write("4370")
+            self.assertEqual(read_port(port_file_path(tmpdir)), 4370)
+
+    def test_connect_drops_stale_port_file(self):
+        with socket.create_server(("127.0.0.1", 0)) as listener:
+            port = listener.getsockname()[1]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with open(port_file_path(tmpdir), "w", encoding="utf-8") as f:
+                f.write(str(port))
+            self.assertIsNone(RunnerClient.connect(tmpdir))
+            self.assertFalse(os.path.exists(port_file_path(tmpdir)))
+
+    def test_connect_drops_port_file_when_handshake_fails(self):
+        listener = socket.create_server(("127.0.0.1", 0))
+        self.addCleanup(listener.close)
+        threading.Thread(target=serve_replies, args=(listener, [], []), daemon=True).start()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with open(port_file_path(tmpdir), "w", encoding="utf-8") as f:
+                f.write(str(listener.getsockname()[1]))
+            self.assertIsNone(RunnerClient.connect(tmpdir))
+            self.assertFalse(os.path.exists(port_file_path(tmpdir)))
+
+
+if __name__ == "__main__":
+    unittest.main()
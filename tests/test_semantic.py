@@ -1,7 +1,7 @@
 import unittest
 
 from parser.potion_parser import Parser, tokenize
-from semantic.potion_semantic import SemanticAnalyzer
+from semantic.potion_semantic import SemanticAnalyzer, TypedUnknown
 
 
 class TestSemanticAnalyzer(unittest.TestCase):
@@ -122,3 +122,41 @@ class TestSemanticAnalyzer(unittest.TestCase):
         with self.assertRaises(Exception) as ctx:
             analyzer.evaluate_expression(ast.statements[1])
         self.assertIn("Variável 'value' não declarada", str(ctx.exception))
+
+    def test_table_new_infers_table_type(self):
+        ast = Parser(tokenize("val cache = table_new(:cache, {read_concurrency: true})")).parse()
+        analyzer = SemanticAnalyzer()
+        analyzer.type_checking(ast.statements[0])
+        self.assertEqual(analyzer.type_env["Cache"], "table")
+
+    def test_table_builtin_rejects_non_table_argument(self):
+        ast = Parser(tokenize('table_get("cache", :key)')).parse()
+        analyzer = SemanticAnalyzer()
+        with self.assertRaises(Exception) as ctx:
+            analyzer.evaluate_expression(ast.statements[0])
+        self.assertIn("espera table ou atom, mas recebeu str", str(ctx.exception))
+
+    def test_table_fold_requires_known_callback(self):
+        ast = Parser(tokenize("table_fold(:cache, :missing, 0)")).parse()
+        analyzer = SemanticAnalyzer()
+        with self.assertRaises(Exception) as ctx:
+            analyzer.evaluate_expression(ast.statements[0])
+        self.assertIn("'missing/3' não definida para table_fold", str(ctx.exception))
+
+    def test_literal_division_by_zero_is_an_error(self):
+        ast = Parser(tokenize("10 / 0")).parse()
+        with self.assertRaisesRegex(Exception, "Divisão por zero"):
+            SemanticAnalyzer().evaluate_expression(ast.statements[0])
+
+    def test_annotated_params_and_imported_returns_only_carry_a_type(self):
+        analyzer = SemanticAnalyzer()
+        analyzer.external_functions = {("count", 0): {"params": [], "return_type": "int"}}
+        analyzer.inside_function = True
+        analyzer.local_vars = {"total"}
+        analyzer.bind_function_params(Parser(tokenize("fn f(total: int) {}")).parse().statements[0].params)
+
+        average = analyzer.evaluate_expression(Parser(tokenize("total / count()")).parse().statements[0])
+        self.assertIsInstance(average, TypedUnknown)
+        self.assertEqual(analyzer.infer_type(average), "int")
+        with self.assertRaisesRegex(Exception, "tipos incompatíveis \\(int e str\\)"):
+            analyzer.evaluate_expression(Parser(tokenize('count() + "!"')).parse().statements[0])
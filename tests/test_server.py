@@ -0,0 +1,125 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from cli.server import INTERNAL_ERROR, INVALID_PARAMS, METHOD_NOT_FOUND, PARSE_ERROR, CompilerServer, serve
+
+HELPERS = """
+pub fn double(x: int) {
+    x * 2
+}
+
+fn unused() {
+    1
+}
+"""
+
+MAIN = """
+import helpers
+
+fn main() {
+    print(double(21))
+}
+"""
+
+
+def write_file(path, content):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+    return path
+
+
+class TestCompilerServer(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.helpers = write_file(os.path.join(self.tmpdir.name, "helpers.potion"), HELPERS)
+        self.main = write_file(os.path.join(self.tmpdir.name, "main.potion"), MAIN)
+        self.server = CompilerServer()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def request(self, method, **params):
+        return self.server.handle({"jsonrpc": "2.0", "id": 1, "method": method, "params": params})
+
+    def test_check_only_regenerates_changed_modules(self):
+        first = self.request("check", path=self.main)["result"]
+        self.assertTrue(first["ok"])
+        self.assertEqual(first["modules"], {"main": "generated", "helpers": "generated"})
+        self.assertEqual(
+            first["diagnostics"],
+            [{
+                "severity": "warning",
+                "path": self.helpers,
+                "line": None,
+                "message": "⚠️ Unused private functions removed from helpers: unused/0",
+            }],
+        )
+        helpers_ast = self.server.parsed[self.helpers][1]
+
+        write_file(self.main, MAIN.replace("21", "4"))
+        second = self.request("check", path=self.main)["result"]
+        self.assertEqual(second["modules"], {"main": "generated", "helpers": "reused"})
+        self.assertIs(self.server.parsed[self.helpers][1], helpers_ast)
+        self.assertEqual(len(second["diagnostics"]), 1)
+
+    def test_diagnostics_use_the_unsaved_buffer(self):
+        broken = self.request("diagnostics", path=self.helpers, text="pub fn double( {")["result"]
+        self.assertEqual([(d["severity"], d["path"], d["line"]) for d in broken], [("error", self.helpers, 1)])
+
+        mistyped = MAIN.replace("print(double(21))", 'print(double("a"))')
+        errors = self.request("diagnostics", path=self.main, text=mistyped)["result"]
+        self.assertEqual(errors[0]["path"], self.main)
+        self.assertIn("Erro de tipo em chamada de função 'double'", errors[0]["message"])
+
+        # O arquivo em disco continua valendo para as próximas requisições.
+        self.assertTrue(self.request("check", path=self.main)["result"]["ok"])
+
+    def test_compile_and_emit_ast(self):
+        outdir = os.path.join(self.tmpdir.name, "out")
+        result = self.request("compile", path=self.main, outdir=outdir, beam=False)["result"]
+        self.assertEqual(
+            sorted(result["outputs"]),
+            [os.path.join(outdir, "helpers.erl"), os.path.join(outdir, "main.erl")],
+        )
+        self.assertIn("Erlang file generated", result["log"])
+        again = self.request("compile", path=self.main, outdir=outdir, beam=False)["result"]
+        self.assertEqual([module["status"] for module in again["modules"]], ["reused", "reused"])
+
+        error = self.request("compile", path=self.main, colour=True)["error"]
+        self.assertIn("Unknown compile options: colour", error["message"])
+        ast = self.request("emit-ast", path=self.main)["result"]["ast"]
+        self.assertEqual([statement["node"] for statement in ast["statements"]], ["ImportStatement", "FunctionDef"])
+        self.assertEqual(ast["statements"][1]["name"], "main")
+
+    def test_handler_errors_are_internal_not_invalid_params(self):
+        self.assertEqual(self.request("check", file=self.main)["error"]["code"], INVALID_PARAMS)
+
+        def broken(path):
+            raise TypeError("bug")
+
+        self.server.methods["check"] = broken
+        error = self.request("check", path=self.main)["error"]
+        self.assertEqual(error["code"], INTERNAL_ERROR)
+        self.assertIn("TypeError: bug", error["message"])
+
+    def test_serve_reads_one_request_per_line(self):
+        requests = [
+            json.dumps({"jsonrpc": "2.0", "id": 1, "method": "check", "params": {"path": self.main}}),
+            json.dumps({"jsonrpc": "2.0", "method": "check", "params": {"path": self.main}}),
+            "not json",
+            json.dumps({"jsonrpc": "2.0", "id": 2, "method": "missing"}),
+            json.dumps({"jsonrpc": "2.0", "id": 3, "method": "shutdown"}),
+            json.dumps({"jsonrpc": "2.0", "id": 4, "method": "check", "params": {"path": self.main}}),
+        ]
+        output = io.StringIO()
+        serve(self.server, io.StringIO("\n".join(requests) + "\n"), output)
+
+        responses = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual([response["id"] for response in responses], [1, None, 2, 3])
+        self.assertTrue(responses[0]["result"]["ok"])
+        self.assertEqual(responses[1]["error"]["code"], PARSE_ERROR)
+        self.assertEqual(responses[2]["error"]["code"], METHOD_NOT_FOUND)
+        self.assertIsNone(responses[3]["result"])